@@ -6,6 +6,13 @@ import time
 import sys
 from pathlib import Path
 from main import run_complete_generation_and_judging # Updated import
+from utilities.mock_lm import add_mock_arguments, mock_lm_from_args
+from utilities.streaming import add_streaming_arguments
+from utilities.model_tiers import add_tier_arguments, model_tiers_from_args
+from utilities.cassette import add_cassette_arguments, recorder_from_args, replay_lm_from_args
+from utilities.structured_output import add_structured_output_arguments
+from utilities.permutations import add_seed_arguments
+from utilities.llm_scheduler import add_scheduler_arguments, scheduler_from_args
 
 
 def main():
@@ -56,6 +63,7 @@ Examples:
   python -m generator.cli --first-order-only         # Skip higher-order groups
   python -m generator.cli --bypass-cache             # Disable caching
   python -m generator.cli --jokespace large          # Generate more jokes
+  python -m generator.cli --mock-llm --mock-list-size 100 --bypass-cache   # Offline load test (~10k jokes)
         """
     )
     
@@ -102,7 +110,7 @@ Examples:
     parser.add_argument(
         '--bypass-cache',
         action='store_true',
-        help='Bypass DSPy caching mechanism'
+        help='Bypass the LLM response cache (fresh responses still refresh the cache)'
     )
     
     parser.add_argument(
@@ -113,6 +121,46 @@ Examples:
         help='Jokespace size: small (10-15 jokes), medium (25-50 jokes), large (50+ jokes) (default: medium)'
     )
     
+    add_mock_arguments(parser)
+    
+    parser.add_argument(
+        '--hedge',
+        action='store_true',
+        help='Duplicate unusually slow LLM calls to a secondary backend (ANTHROPIC_API_KEY_SECONDARY or OPENROUTER_API_KEY)'
+    )
+    
+    add_streaming_arguments(parser)
+    
+    add_tier_arguments(parser)
+    
+    add_cassette_arguments(parser)
+    
+    add_structured_output_arguments(parser)
+    
+    add_seed_arguments(parser)
+    
+    add_scheduler_arguments(parser)
+    
+    parser.add_argument(
+        '--lean',
+        action='store_true',
+        help='Rate without reasoning fields and with small output budgets; only the top jokes are re-rated '
+             'with reasoning before the tournament'
+    )
+    
+    parser.add_argument(
+        '--combined-admissibility',
+        action='store_true',
+        help='Run the five admissibility checks of a joke as one LLM call instead of five'
+    )
+    
+    parser.add_argument(
+        '--prefilter',
+        action='store_true',
+        help='Pass or reject clear-cut jokes with local heuristics; only ambiguous ones get the LLM '
+             'admissibility checks'
+    )
+    
     return parser.parse_args()
 
 
@@ -125,8 +173,13 @@ def run_pipeline_with_args(args: argparse.Namespace) -> dict:
     except Exception as e:
         raise ValueError(f"Cannot create output directory: {e}")
     
+    # A recorded cassette (--replay) or the offline mock instead of the API
+    replay_lm = replay_lm_from_args(args)
+    if args.record or args.replay:
+        args.bypass_cache = True  # Every call must reach the (recorded) LLM
+    
     # Run pipeline
-    return run_complete_generation_and_judging(
+    results = run_complete_generation_and_judging(
         topic_input=args.topic,
         first_order_only=args.first_order_only,
         generation_only=args.generation_only,
@@ -134,8 +187,24 @@ def run_pipeline_with_args(args: argparse.Namespace) -> dict:
         batch_size=args.batch_size,
         retries=args.retries,
         bypass_cache=args.bypass_cache,
-        jokespace_size=args.jokespace
+        jokespace_size=args.jokespace,
+        hedge=args.hedge,
+        backend_lm=replay_lm or mock_lm_from_args(args),
+        stream=args.stream,
+        keep_reasoning=args.keep_reasoning,
+        tiers=model_tiers_from_args(args),
+        recorder=recorder_from_args(args),
+        structured_output=args.structured_output,
+        lean=args.lean,
+        seed=args.seed,
+        scheduler=scheduler_from_args(args),
+        job_weight=args.job_weight,
+        combined_admissibility=args.combined_admissibility,
+        prefilter=args.prefilter
     )
+    if replay_lm is not None:
+        print(f"\033[92mReplay: {replay_lm.stats()}\033[0m")
+    return results
 
 
 def display_results(results: dict, elapsed_time: float) -> None:
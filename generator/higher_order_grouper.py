@@ -1,9 +1,8 @@
 # ./generator/higher_order_grouper.py
 """Create higher-order groups from hook-template-context combinations using DSPy"""
 
-import asyncio
 import dspy
-from typing import List, Set
+from typing import List, Optional, Set
 from generator.models import FirstOrderTriplet, HigherOrderGroup, HookTemplatePair
 from generator.signatures import HigherOrderGroupingSignature
 from utilities.dspy_client import ClaudeClient
@@ -27,7 +26,8 @@ async def generate_higher_order_groups(
     topic_set: set, 
     client: ClaudeClient, 
     retries: int = 3,
-    jokespace_size: str = 'medium'
+    jokespace_size: str = 'medium',
+    lm: Optional[dspy.BaseLM] = None
 ) -> List[HigherOrderGroup]:
     """Create synergistic groups from hook-template-context triplets"""
     
@@ -72,28 +72,25 @@ async def generate_higher_order_groups(
         for i, ctx in enumerate(first_order_triplets)
     ])
     
-    # Retry logic
-    for attempt in range(retries + 1):
-        try:
-            # Make LLM call
-            result = predictor(
-                task_description=task_description,
-                topic=formatted_topics,
-                available_contexts=first_order_triplets  # Pass the actual list of FirstOrderTriplet objects
-            )
-            
-            # Validate result
-            if hasattr(result, 'list_of_groups') and result.list_of_groups:
-                print(f"Generated {len(result.list_of_groups)} higher-order groups")
-                return result.list_of_groups  # Return List[HigherOrderGroup] directly
-            else:
-                raise ValueError("No valid higher-order groups in LLM response")
-                
-        except Exception as e:
-            if attempt < retries:
-                print(f"Attempt {attempt + 1} failed: {str(e)[:100]}... Retrying in 2s")
-                await asyncio.sleep(2)
-            else:
-                raise Exception(f"Failed to generate higher-order groups after {retries + 1} attempts: {str(e)}")
+    async def attempt():
+        # Make LLM call
+        result = await client.apredict(
+            predictor,
+            stage="grouping",
+            lm=lm,
+            task_description=task_description,
+            topic=formatted_topics,
+            available_contexts=first_order_triplets  # Pass the actual list of FirstOrderTriplet objects
+        )
+        
+        # Validate result
+        if hasattr(result, 'list_of_groups') and result.list_of_groups:
+            print(f"Generated {len(result.list_of_groups)} higher-order groups")
+            return result.list_of_groups  # Return List[HigherOrderGroup] directly
+        else:
+            raise ValueError("No valid higher-order groups in LLM response")
     
-    return []
\ No newline at end of file
+    # Retries (including unparseable responses) go through the client's shared retry policy, which
+    # re-raises the last error once it gives up (at once for FATAL errors or a spent retry budget)
+    return await client.retry_policy.call(attempt, max_retries=retries, label="Higher-order groups",
+                                          stage="grouping")
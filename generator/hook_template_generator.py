@@ -1,8 +1,7 @@
 """Generate hook-template pairs with explanatory contexts using DSPy"""
 
-import asyncio
 import dspy
-from typing import List, Set
+from typing import List, Optional, Set
 from generator.models import FirstOrderTriplet
 from generator.signatures import HookTemplateGenerationSignature
 from utilities.dspy_client import ClaudeClient
@@ -21,7 +20,8 @@ def get_num_of_jokes(jokespace_size: str) -> str:
         raise ValueError(f"Invalid jokespace size: {jokespace_size}")
 
 
-async def generate_hook_template_contexts(topic_set: set, client: ClaudeClient, retries: int = 3, jokespace_size: str = 'medium') -> List[FirstOrderTriplet]:
+async def generate_hook_template_contexts(topic_set: set, client: ClaudeClient, retries: int = 3, jokespace_size: str = 'medium',
+                                          lm: Optional[dspy.BaseLM] = None) -> List[FirstOrderTriplet]:
     """Generate hook-template-explanation triplets"""
     
     # Get number of jokes based on jokespace size
@@ -58,27 +58,24 @@ async def generate_hook_template_contexts(topic_set: set, client: ClaudeClient,
                         Focus on combinations that offer clear paths to creating the funniest joke.
                         """
     
-    # Retry logic
-    for attempt in range(retries + 1):
-        try:
-            # Make LLM call with Pydantic model
-            result = predictor(
-                task_description=task_description,
-                topic=formatted_topics
-            )
-            
-            # DSPy handles Pydantic validation automatically
-            if hasattr(result, 'hook_template_context_list') and result.hook_template_context_list:
-                print(f"Generated {len(result.hook_template_context_list)} hook-template-explanation triplets")
-                return result.hook_template_context_list  # Return FirstOrderTriplet objects directly
-            else:
-                raise ValueError("No valid hook-template-explanation triplets in LLM response")
-                
-        except Exception as e:
-            if attempt < retries:
-                print(f"Attempt {attempt + 1} failed: {str(e)[:100]}... Retrying in 2s")
-                await asyncio.sleep(2)
-            else:
-                raise Exception(f"Failed to generate hook-template-explanation triplets after {retries + 1} attempts: {str(e)}")
+    async def attempt():
+        # Make LLM call with Pydantic model
+        result = await client.apredict(
+            predictor,
+            stage="hook_generation",
+            lm=lm,
+            task_description=task_description,
+            topic=formatted_topics
+        )
+        
+        # DSPy handles Pydantic validation automatically
+        if hasattr(result, 'hook_template_context_list') and result.hook_template_context_list:
+            print(f"Generated {len(result.hook_template_context_list)} hook-template-explanation triplets")
+            return result.hook_template_context_list  # Return FirstOrderTriplet objects directly
+        else:
+            raise ValueError("No valid hook-template-explanation triplets in LLM response")
     
-    return []
\ No newline at end of file
+    # Retries (including unparseable responses) go through the client's shared retry policy, which
+    # re-raises the last error once it gives up (at once for FATAL errors or a spent retry budget)
+    return await client.retry_policy.call(attempt, max_retries=retries, label="Hook-template-explanation triplets",
+                                          stage="hook_generation")
@@ -2,7 +2,7 @@
 
 import asyncio
 import dspy
-from typing import List, Union, Dict
+from typing import List, Optional, Union, Dict
 from utilities.dspy_client import ClaudeClient
 from utilities.generator_utils import format_topic_set_for_prompt
 from generator.models import (
@@ -29,7 +29,8 @@ async def generate_jokes_from_context(
     topic_set: set,
     client: ClaudeClient,
     retries: int = 3,
-    jokespace_size: str = 'medium'
+    jokespace_size: str = 'medium',
+    lm: Optional[dspy.BaseLM] = None
 ) -> List[GeneratedJoke]:
     """Generate jokes from either first-order triplet or higher-order group"""
     
@@ -92,42 +93,32 @@ async def generate_jokes_from_context(
                             Use the group explanation as a guide for creating sophisticated, funny jokes.
                             Generate {num_of_jokes} distinct jokes that showcase the synergistic potential."""
     
-    # Define synchronous function for DSPy call
-    def sync_joke_generation():
-        # Retry logic within the synchronous function
-        for attempt in range(retries + 1):
-            try:
-                # Make LLM call (synchronous DSPy predictor)
-                result = predictor(
-                    task_description=task_description,
-                    topic=formatted_topics,
-                    context_guidance=context  # Pass the actual FirstOrderTriplet or HigherOrderGroup object
-                )
-                
-                # Convert JokeOutput objects to GeneratedJoke objects
-                if hasattr(result, 'generated_jokes') and result.generated_jokes:
-                    jokes = []
-                    for joke_output in result.generated_jokes:
-                        jokes.append(GeneratedJoke(text=joke_output.text))
-                    
-                    print(f"Generated {len(jokes)} jokes from {'first-order' if isinstance(context, FirstOrderTriplet) else 'higher-order'} context")
-                    return jokes
-                else:
-                    raise ValueError("No valid jokes in LLM response")
-                    
-            except Exception as e:
-                if attempt < retries:
-                    print(f"Attempt {attempt + 1} failed: {str(e)[:100]}... Retrying in 2s")
-                    import time
-                    time.sleep(2)  # Use synchronous sleep within the sync function
-                else:
-                    raise Exception(f"Failed to generate jokes after {retries + 1} attempts: {str(e)}")
+    async def attempt():
+        # Make LLM call (awaited directly, no worker thread needed)
+        result = await client.apredict(
+            predictor,
+            stage="joke_generation",
+            lm=lm,
+            task_description=task_description,
+            topic=formatted_topics,
+            context_guidance=context  # Pass the actual FirstOrderTriplet or HigherOrderGroup object
+        )
         
-        return []
+        # Convert JokeOutput objects to GeneratedJoke objects
+        if hasattr(result, 'generated_jokes') and result.generated_jokes:
+            jokes = []
+            for joke_output in result.generated_jokes:
+                jokes.append(GeneratedJoke(text=joke_output.text))
+            
+            print(f"Generated {len(jokes)} jokes from {'first-order' if isinstance(context, FirstOrderTriplet) else 'higher-order'} context")
+            return jokes
+        else:
+            raise ValueError("No valid jokes in LLM response")
     
-    # Run the synchronous DSPy call in a thread pool to avoid blocking the event loop
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(None, sync_joke_generation)
+    # Retries (including unparseable responses) go through the client's shared retry policy, which
+    # re-raises the last error once it gives up (at once for FATAL errors or a spent retry budget)
+    return await client.retry_policy.call(attempt, max_retries=retries, label="Jokes",
+                                          stage="joke_generation")
 
 
 async def generate_full_joke_set(
@@ -137,7 +128,8 @@ async def generate_full_joke_set(
     client: ClaudeClient,
     jokespace_size: str = 'medium',
     jokes_per_first_order: int = 2,
-    jokes_per_higher_order: int = 3
+    jokes_per_higher_order: int = 3,
+    lm: Optional[dspy.BaseLM] = None
 ) -> List[GeneratedJoke]:
     """Generate jokes from all contexts (both first-order and higher-order)"""
     
@@ -146,7 +138,7 @@ async def generate_full_joke_set(
     # Generate jokes from first-order triplets
     print(f"Generating jokes from {len(first_order_triplets)} first-order contexts...")
     first_order_tasks = [
-        generate_jokes_from_context(triplet, topic_set, client, jokespace_size=jokespace_size)
+        generate_jokes_from_context(triplet, topic_set, client, jokespace_size=jokespace_size, lm=lm)
         for triplet in first_order_triplets
     ]
     
@@ -161,7 +153,7 @@ async def generate_full_joke_set(
     # Generate jokes from higher-order groups
     print(f"Generating jokes from {len(higher_order_groups)} higher-order groups...")
     higher_order_tasks = [
-        generate_jokes_from_context(group, topic_set, client, jokespace_size=jokespace_size)
+        generate_jokes_from_context(group, topic_set, client, jokespace_size=jokespace_size, lm=lm)
         for group in higher_order_groups
     ]
     
@@ -1,214 +1,191 @@
 import asyncio
 import dspy
-from typing import List
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 
 from utilities.dspy_client import ClaudeClient
 from judges.models import AdmissibilityResults, AdmissibilityCheck
-from judges.dspy_signatures import AdmissibilitySignature
+from judges.prefilter import AdmissibilityPrefilter
+from judges.dspy_signatures import (
+    AdmissibilitySignature, LeanAdmissibilitySignature, DecisionFirstAdmissibilitySignature,
+    CombinedAdmissibilitySignature, LeanCombinedAdmissibilitySignature
+)
 
 
-class AdmissibilityChecker:
-    """Handles all admissibility checks for jokes"""
-    
-    def __init__(self, client: ClaudeClient, max_retries: int = 5):
-        self.client = client
-        self.max_retries = max_retries
-        self.admissibility_predictor = dspy.Predict(AdmissibilitySignature)
-    
-    def _retry_on_error(self, func, *args, **kwargs):
-        """Generic retry wrapper for sync functions with retries"""
-        for attempt in range(self.max_retries + 1):  # +1 for initial attempt
-            try:
-                return func(*args, **kwargs)
-            except Exception as e:
-                if attempt == self.max_retries:
-                    # No more retries
-                    raise e
-                else:
-                    # Log retry attempt
-                    print(f"\033[93m⚠️  Error: {str(e)[:50]}..., retrying in 2s\033[0m")
-                    import time
-                    time.sleep(2)
-    
-    async def check_all_admissibility_async(self, joke_text: str) -> AdmissibilityResults:
-        """Run 5 admissibility checks in parallel"""
-        # Define check functions
-        check_tasks = [
-            self._check_intent_async(joke_text),
-            self._check_completeness_async(joke_text),
-            self._check_appropriateness_async(joke_text),
-            self._check_coherence_async(joke_text),
-            self._check_accessibility_async(joke_text)
-        ]
-        
-        # Run all checks in parallel
-        results = await asyncio.gather(*check_tasks)
-        
-        # Compile results
-        return AdmissibilityResults(
-            intent_check=results[0],
-            completeness_check=results[1],
-            appropriateness_check=results[2],
-            coherence_check=results[3],
-            accessibility_check=results[4],
-            is_admissible=all(r.passed for r in results)
-        )
-    
-    async def _check_intent_async(self, joke_text: str) -> AdmissibilityCheck:
-        """Check comedic intent with liberal evaluation"""
-        instructions = """Focus only on comedic intent. Do not let joke length, complexity, or writing style influence your decision.
+# Check type -> (liberal evaluation instructions, PASS/FAIL examples), in AdmissibilityResults order.
+# Only the instructions reach the LLM, in both the per-check and the combined mode; the examples are the
+# reference cases the prefilter is measured against (judges.prefilter.rubric_examples).
+ADMISSIBILITY_CHECKS: Dict[str, Tuple[str, str]] = {
+    # Check comedic intent with liberal evaluation
+    "intent": (
+        """Focus only on comedic intent. Do not let joke length, complexity, or writing style influence your decision.
 
 Liberal evaluation: Only reject if there is ABSOLUTELY NO comedic intent. When in doubt, PASS. This check should only fail obvious violations. Borderline cases should PASS.
 
-Accept if there's ANY attempt at humor, wordplay, irony, or comedic structure. Even bad jokes or failed attempts at humor should PASS this check."""
-        
-        examples = """PASS (Clear): "Why don't scientists trust atoms? Because they make up everything!" - Clear pun with setup and punchline.
+Accept if there's ANY attempt at humor, wordplay, irony, or comedic structure. Even bad jokes or failed attempts at humor should PASS this check.""",
+        """PASS (Clear): "Why don't scientists trust atoms? Because they make up everything!" - Clear pun with setup and punchline.
 
 FAIL (Clear): "The quarterly sales report shows a 15% increase in revenue." - Pure factual statement with no comedic intent.
 
 PASS (Borderline): "My programming skills are so bad, I once spent three hours debugging a semicolon." - Self-deprecating attempt at humor about programming, even if not particularly funny, shows clear comedic intent."""
-        
-        def check():
-            result = self.admissibility_predictor(
-                joke_text=joke_text,
-                check_type="intent",
-                instruction_prompt=instructions,
-                examples=examples
-            )
-            passed = result.passed.lower() == 'true'
-            return AdmissibilityCheck(passed=passed, reasoning=result.reasoning)
-        
-        try:
-            # Run synchronous DSPy call in thread pool to avoid blocking
-            loop = asyncio.get_event_loop()
-            return await loop.run_in_executor(None, lambda: self._retry_on_error(check))
-        except Exception as e:
-            # If all retries fail, be liberal and pass
-            return AdmissibilityCheck(passed=True, reasoning=f"Check failed after {self.max_retries} retries: {str(e)}")
-    
-    async def _check_completeness_async(self, joke_text: str) -> AdmissibilityCheck:
-        """Check if joke is complete"""
-        instructions = """Focus only on completeness of the joke structure. Do not let joke length, complexity, or writing style influence your decision.
+    ),
+    # Check if joke is complete
+    "completeness": (
+        """Focus only on completeness of the joke structure. Do not let joke length, complexity, or writing style influence your decision.
 
 Liberal evaluation: Only reject if SEVERELY incomplete. When in doubt, PASS. This check should only fail obvious violations. Borderline cases should PASS.
 
-Accept if there's a setup and any form of conclusion, even if weak. One-liners, puns, and short jokes should PASS."""
-        
-        examples = """PASS (Clear): "I told my wife she was drawing her eyebrows too high. She looked surprised." - Complete setup and punchline.
+Accept if there's a setup and any form of conclusion, even if weak. One-liners, puns, and short jokes should PASS.""",
+        """PASS (Clear): "I told my wife she was drawing her eyebrows too high. She looked surprised." - Complete setup and punchline.
 
 FAIL (Clear): "So there was this guy and he went to the store and" - Obviously incomplete, cuts off mid-sentence.
 
 PASS (Borderline): "Parallel lines have so much in common. Too bad they'll never meet." - Simple but complete one-liner, has both premise and conclusion."""
-        
-        def check():
-            result = self.admissibility_predictor(
-                joke_text=joke_text,
-                check_type="completeness",
-                instruction_prompt=instructions,
-                examples=examples
-            )
-            passed = result.passed.lower() == 'true'
-            return AdmissibilityCheck(passed=passed, reasoning=result.reasoning)
-        
-        try:
-            # Run synchronous DSPy call in thread pool to avoid blocking
-            loop = asyncio.get_event_loop()
-            return await loop.run_in_executor(None, lambda: self._retry_on_error(check))
-        except Exception as e:
-            return AdmissibilityCheck(passed=True, reasoning=f"Check failed after {self.max_retries} retries: {str(e)}")
-    
-    async def _check_appropriateness_async(self, joke_text: str) -> AdmissibilityCheck:
-        """Check appropriateness"""
-        instructions = """Focus only on extremely harmful content. Do not let joke length, complexity, or writing style influence your decision.
+    ),
+    # Check appropriateness
+    "appropriateness": (
+        """Focus only on extremely harmful content. Do not let joke length, complexity, or writing style influence your decision.
 
 Liberal evaluation: Only reject EXTREMELY offensive content. When in doubt, PASS. This check should only fail obvious violations. Borderline cases should PASS.
 
-Accept edgy humor, dark humor, adult humor, political humor. Only reject if promoting hate, violence, or extreme harm."""
-        
-        examples = """PASS (Clear): "Why don't cannibals eat clowns? Because they taste funny." - Dark humor but not promoting harm.
+Accept edgy humor, dark humor, adult humor, political humor. Only reject if promoting hate, violence, or extreme harm.""",
+        """PASS (Clear): "Why don't cannibals eat clowns? Because they taste funny." - Dark humor but not promoting harm.
 
 FAIL (Clear): "All Pakistani people should be eliminated from society." - Promotes hate and violence against a group.
 
 PASS (Borderline): "My ex is like a software update. Whenever I see the notification, I think 'not now'." - Mildly edgy relationship humor but not harmful."""
-        
-        def check():
-            result = self.admissibility_predictor(
-                joke_text=joke_text,
-                check_type="appropriateness",
-                instruction_prompt=instructions,
-                examples=examples
-            )
-            passed = result.passed.lower() == 'true'
-            return AdmissibilityCheck(passed=passed, reasoning=result.reasoning)
-        
-        try:
-            # Run synchronous DSPy call in thread pool to avoid blocking
-            loop = asyncio.get_event_loop()
-            return await loop.run_in_executor(None, lambda: self._retry_on_error(check))
-        except Exception as e:
-            return AdmissibilityCheck(passed=True, reasoning=f"Check failed after {self.max_retries} retries: {str(e)}")
-    
-    async def _check_coherence_async(self, joke_text: str) -> AdmissibilityCheck:
-        """Check logical coherence"""
-        instructions = """Focus only on internal logical consistency. Do not let joke length, complexity, or writing style influence your decision.
+    ),
+    # Check logical coherence
+    "coherence": (
+        """Focus only on internal logical consistency. Do not let joke length, complexity, or writing style influence your decision.
 
 Liberal evaluation: Only reject if COMPLETELY incoherent. When in doubt, PASS. This check should only fail obvious violations. Borderline cases should PASS.
 
-Accept if there's any logical thread, even if absurd or surreal. Abstract humor and non-sequiturs can still PASS if intentional."""
-        
-        examples = """PASS (Clear): "I haven't slept for ten days, because that would be too long." - Logical wordplay on different meanings of 'for ten days'.
+Accept if there's any logical thread, even if absurd or surreal. Abstract humor and non-sequiturs can still PASS if intentional.""",
+        """PASS (Clear): "I haven't slept for ten days, because that would be too long." - Logical wordplay on different meanings of 'for ten days'.
 
 FAIL (Clear): "Purple banana telephone mathematics seventeen." - Random words with no logical connection or comedic structure.
 
 PASS (Borderline): "Time flies like an arrow. Fruit flies like a banana." - Surreal but has intentional logical structure playing with word meanings."""
-        
-        def check():
-            result = self.admissibility_predictor(
-                joke_text=joke_text,
-                check_type="coherence",
-                instruction_prompt=instructions,
-                examples=examples
-            )
-            passed = result.passed.lower() == 'true'
-            return AdmissibilityCheck(passed=passed, reasoning=result.reasoning)
-        
-        try:
-            # Run synchronous DSPy call in thread pool to avoid blocking
-            loop = asyncio.get_event_loop()
-            return await loop.run_in_executor(None, lambda: self._retry_on_error(check))
-        except Exception as e:
-            return AdmissibilityCheck(passed=True, reasoning=f"Check failed after {self.max_retries} retries: {str(e)}")
-    
-    async def _check_accessibility_async(self, joke_text: str) -> AdmissibilityCheck:
-        """Check language accessibility"""
-        instructions = """Focus only on basic understandability. Do not let joke length, complexity, or writing style influence your decision.
+    ),
+    # Check language accessibility
+    "accessibility": (
+        """Focus only on basic understandability. Do not let joke length, complexity, or writing style influence your decision.
 
 Liberal evaluation: Only reject if IMPOSSIBLE to understand. When in doubt, PASS. This check should only fail obvious violations. Borderline cases should PASS.
 
-Accept specialized humor, cultural references, wordplay in any language. Technical or niche jokes should still PASS."""
-        
-        examples = """PASS (Clear): "Why do programmers prefer dark mode? Because light attracts bugs!" - Uses technical terms but meaning is clear.
+Accept specialized humor, cultural references, wordplay in any language. Technical or niche jokes should still PASS.""",
+        """PASS (Clear): "Why do programmers prefer dark mode? Because light attracts bugs!" - Uses technical terms but meaning is clear.
 
 FAIL (Clear): "Xlqpz frwm nhtg vjkl zxcv!" - Incomprehensible random letters, impossible to understand.
 
 PASS (Borderline): "TCP jokes aren't funny because you have to keep repeating them until someone gets them." - Technical networking joke that may not be universally understood but is clearly structured."""
+    )
+}
+
+
+def combined_guidelines() -> str:
+    """Every check's instructions, for the single-call CombinedAdmissibilitySignature"""
+    return "\n\n".join(f"{check_type.upper()} CHECK\n{instructions}"
+                        for check_type, (instructions, _) in ADMISSIBILITY_CHECKS.items())
+
+
+class AdmissibilityChecker:
+    """Handles all admissibility checks for jokes"""
+    
+    def __init__(self, client: ClaudeClient, max_retries: int = 5, lm: Optional[dspy.BaseLM] = None,
+                 lean: bool = False, combined: bool = False, prefilter: Optional[AdmissibilityPrefilter] = None):
+        """combined=True runs the five checks as one LLM call (CombinedAdmissibilitySignature) instead of five;
+        prefilter settles clear passes and failures locally, so only ambiguous jokes reach the LLM"""
+        self.client = client
+        self.max_retries = max_retries
+        self.lm = lm  # LM handle for this component's calls, None = the client's default
+        self.combined = combined
+        self.prefilter = prefilter
+        # Lean mode: decision only, within a small output budget. Streaming without --keep-reasoning
+        # asks for the decision first so the stream can stop before the reasoning.
+        if lean:
+            self.admissibility_predictor = dspy.Predict(LeanAdmissibilitySignature,
+                                                        max_tokens=LeanAdmissibilitySignature.max_output_tokens)
+        elif client.stream and not client.keep_reasoning:
+            self.admissibility_predictor = dspy.Predict(DecisionFirstAdmissibilitySignature)
+        else:
+            self.admissibility_predictor = dspy.Predict(AdmissibilitySignature)
+        self.combined_predictor = (
+            dspy.Predict(LeanCombinedAdmissibilitySignature,
+                         max_tokens=LeanCombinedAdmissibilitySignature.max_output_tokens)
+            if lean else dspy.Predict(CombinedAdmissibilitySignature)
+        )
+        self.check_guidelines = combined_guidelines()
+    
+    async def _retry_on_error_async(self, func, *args, **kwargs):
+        """Retry through the client's shared policy (jittered backoff, run-wide budget, circuit breaker)"""
+        return await self.client.retry_policy.call(lambda: func(*args, **kwargs), max_retries=self.max_retries,
+                                                   label="Admissibility check", stage="admissibility")
+    
+    async def check_all_admissibility_async(self, joke_text: str) -> AdmissibilityResults:
+        """Run the 5 admissibility checks: in parallel, or as one combined call"""
+        if self.prefilter is not None:
+            prefiltered = self.prefilter.results(self.prefilter.screen(joke_text))
+            if prefiltered is not None:
+                return prefiltered
+        
+        if self.combined:
+            results = await self._check_combined_async(joke_text)
+        else:
+            # Run all checks in parallel
+            results = await asyncio.gather(*[self._check_async(joke_text, check_type)
+                                             for check_type in ADMISSIBILITY_CHECKS])
         
-        def check():
-            result = self.admissibility_predictor(
+        # Compile results
+        return AdmissibilityResults(
+            intent_check=results[0],
+            completeness_check=results[1],
+            appropriateness_check=results[2],
+            coherence_check=results[3],
+            accessibility_check=results[4],
+            is_admissible=all(r.passed for r in results)
+        )
+    
+    async def _check_async(self, joke_text: str, check_type: str) -> AdmissibilityCheck:
+        """Run one check with its liberal evaluation instructions"""
+        instructions, _ = ADMISSIBILITY_CHECKS[check_type]
+        
+        async def check():
+            result = await self.client.apredict(
+                self.admissibility_predictor,
+                stage="admissibility",
+                lm=self.lm,
                 joke_text=joke_text,
-                check_type="accessibility",
-                instruction_prompt=instructions,
-                examples=examples
+                check_type=check_type,
+                instruction_prompt=instructions
             )
-            passed = result.passed.lower() == 'true'
-            return AdmissibilityCheck(passed=passed, reasoning=result.reasoning)
+            return AdmissibilityCheck(passed=result.passed, reasoning=getattr(result, 'reasoning', ''))
         
         try:
-            # Run synchronous DSPy call in thread pool to avoid blocking
-            loop = asyncio.get_event_loop()
-            return await loop.run_in_executor(None, lambda: self._retry_on_error(check))
+            # Await the DSPy call directly on the native async path
+            return await self._retry_on_error_async(check)
         except Exception as e:
+            # If all retries fail, be liberal and pass
             return AdmissibilityCheck(passed=True, reasoning=f"Check failed after {self.max_retries} retries: {str(e)}")
-
-    
\ No newline at end of file
+    
+    async def _check_combined_async(self, joke_text: str) -> List[AdmissibilityCheck]:
+        """Run all checks in one call; per-check verdicts and reasoning in ADMISSIBILITY_CHECKS order"""
+        async def check():
+            result = await self.client.apredict(
+                self.combined_predictor,
+                stage="admissibility",
+                lm=self.lm,
+                check_guidelines=self.check_guidelines,
+                joke_text=joke_text
+            )
+            return [AdmissibilityCheck(passed=getattr(result, f"{check_type}_passed"),
+                                       reasoning=getattr(result, f"{check_type}_reasoning", ''))
+                    for check_type in ADMISSIBILITY_CHECKS]
+        
+        try:
+            return await self._retry_on_error_async(check)
+        except Exception as e:
+            # If all retries fail, be liberal and pass every check
+            return [AdmissibilityCheck(passed=True, reasoning=f"Check failed after {self.max_retries} retries: {str(e)}")
+                    for _ in ADMISSIBILITY_CHECKS]
@@ -25,7 +25,7 @@ class BatchProcessor:
         total_jokes = len(jokes)
         all_results = []
         
-        print(f"\nProcessing {total_jokes} jokes in batches of {self.batch_size}")
+        print(f"\nProcessing {total_jokes} jokes in batches of {min(self.batch_size, total_jokes)}")
         print(f"Estimated batches: {(total_jokes + self.batch_size - 1) // self.batch_size}")
         
         # Process in batches
@@ -45,10 +45,7 @@ class BatchProcessor:
             # Update progress
             self.processed_count = len(all_results) + len(self.failed_jokes)
             self._display_progress(total_jokes)
-            
-            # Small delay between batches to avoid rate limiting
-            if batch_end < total_jokes:
-                await asyncio.sleep(1)
+            # No fixed delay between batches: the client's rate governor paces all LLM traffic
         
         # Assign original ranks based on overall rating (highest rating gets rank 1)
         all_results = self._assign_original_ranks(all_results)
@@ -125,45 +122,30 @@ class BatchProcessor:
         return valid_results
     
     async def _evaluate_joke_with_retry(self, joke: JokeData, joke_index: int, 
-                                      max_retries: int = 10) -> Optional[RatingResult]:
-        """Evaluate a single joke with retry logic"""
-        for attempt in range(max_retries):
-            try:
-                # Show processing indicator
-                if attempt == 0:
-                    print(f"\n📝 Processing joke {joke_index + 1} (ID: {joke.id})...", end='', flush=True)
-                else:
-                    print(f"\n🔄 Retry {attempt} for joke {joke_index + 1}...", end='', flush=True)
-                
-                # Evaluate joke
-                result = await self.rating_judge.evaluate_joke_async(joke)
-                
-                # Successful evaluation
-                print(" ✓", flush=True)
-                return result
-                
-            except Exception as e:
-                error_msg = str(e)
-                
-                # Check for specific error types
-                if "rate limit" in error_msg.lower():
-                    wait_time = min(2 ** attempt, 60)  # Exponential backoff, max 60s
-                    print(f"\n⏳ Rate limit hit, waiting {wait_time}s...", flush=True)
-                    await asyncio.sleep(wait_time)
-                elif "timeout" in error_msg.lower():
-                    wait_time = 5
-                    print(f"\n⏱️  Timeout, waiting {wait_time}s...", flush=True)
-                    await asyncio.sleep(wait_time)
-                else:
-                    wait_time = 2
-                    print(f"\n⚠️  Error: {error_msg[:50]}..., retrying in {wait_time}s", flush=True)
-                    await asyncio.sleep(wait_time)
-                
-                # If this was the last attempt, return None
-                if attempt == max_retries - 1:
-                    return None
+                                      max_retries: int = 1) -> Optional[RatingResult]:
+        """Evaluate a single joke with retry logic.
+        
+        Individual LLM calls already retry under the client's retry policy, so the
+        whole-joke retry is kept small and draws on the same run-wide budget. It
+        runs outside the circuit breaker: errors reaching this level are not
+        provider outages.
+        """
+        print(f"\n📝 Processing joke {joke_index + 1} (ID: {joke.id})...", end='', flush=True)
+        
+        async def evaluate():
+            return await self.rating_judge.evaluate_joke_async(joke)
+        
+        try:
+            result = await self.rating_judge.client.retry_policy.call(
+                evaluate, max_retries=max_retries, label=f"Joke {joke_index + 1}", stage="rating", breaker=False
+            )
+        except Exception as e:
+            print(f"\n❌ Joke {joke_index + 1} failed: {str(e)[:50]}...", flush=True)
+            return None
         
-        return None
+        # Successful evaluation
+        print(" ✓", flush=True)
+        return result
     
     def _display_joke_result(self, result: RatingResult, joke_index: int):
         """Display brief result for a processed joke"""
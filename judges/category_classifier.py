@@ -1,42 +1,44 @@
-import asyncio
 import dspy
-import random
-from typing import List, Tuple
+from typing import List, Optional, Tuple
 
 from utilities.dspy_client import ClaudeClient
+from utilities.permutations import DEFAULT_SEED, seeded_choice, seeded_permutation
 from judges.models import CategoryInfo
-from judges.dspy_signatures import CategoryAssignmentSignature
+from judges.dspy_signatures import CategoryAssignmentSignature, LeanCategoryAssignmentSignature
+
+# Number of shuffled category orders shared by all jokes. Each joke gets one of them (fixed by its text and
+# the run seed), which still spreads position bias across jokes while letting the provider cache each
+# ordering's prompt prefix, and gives the same prompt when the joke is evaluated again.
+CATEGORY_ORDERINGS = 4
 
 
 class CategoryClassifier:
     """Handles category assignment for jokes"""
     
-    def __init__(self, client: ClaudeClient, category_info_list: List[CategoryInfo], max_retries: int = 5):
+    def __init__(self, client: ClaudeClient, category_info_list: List[CategoryInfo], max_retries: int = 5,
+                 lm: Optional[dspy.BaseLM] = None, lean: bool = False, seed: int = DEFAULT_SEED):
         self.client = client
         self.category_info_list = category_info_list
         self.max_retries = max_retries
-        self.category_predictor = dspy.Predict(CategoryAssignmentSignature)
+        self.lm = lm  # LM handle for this component's calls, None = the client's default
+        # Lean mode: categories only, within a small output budget
+        self.category_predictor = (
+            dspy.Predict(LeanCategoryAssignmentSignature, max_tokens=LeanCategoryAssignmentSignature.max_output_tokens)
+            if lean else dspy.Predict(CategoryAssignmentSignature)
+        )
+        self.seed = seed
+        self.category_orderings = [seeded_permutation(category_info_list, seed, "category_ordering", index)
+                                   for index in range(CATEGORY_ORDERINGS)]
     
-    def _retry_on_error(self, func, *args, **kwargs):
-        """Generic retry wrapper for sync functions with retries"""
-        for attempt in range(self.max_retries + 1):  # +1 for initial attempt
-            try:
-                return func(*args, **kwargs)
-            except Exception as e:
-                if attempt == self.max_retries:
-                    # No more retries
-                    raise e
-                else:
-                    # Log retry attempt
-                    print(f"\033[93m⚠️  Error: {str(e)[:50]}..., retrying in 2s\033[0m")
-                    import time
-                    time.sleep(2)
+    async def _retry_on_error_async(self, func, *args, **kwargs):
+        """Retry through the client's shared policy (jittered backoff, run-wide budget, circuit breaker)"""
+        return await self.client.retry_policy.call(lambda: func(*args, **kwargs), max_retries=self.max_retries,
+                                                   label="Category classification", stage="categories")
     
     async def classify_categories_async(self, joke_text: str) -> Tuple[List[str], bool]:
         """Assign joke to categories with enhanced prompt"""
         # Randomize category order to reduce position bias
-        randomized_category_info = self.category_info_list.copy()
-        random.shuffle(randomized_category_info)
+        randomized_category_info = seeded_choice(self.category_orderings, self.seed, "category_ordering", joke_text)
         
         instruction = """
 You are an expert comedy analyst tasked with categorizing jokes. Your goal is to identify ALL relevant categories that apply to this joke.
@@ -57,15 +59,18 @@ AVOID THESE BIASES:
 - Consider less common but accurate categories
 """
         
-        def classify():
-            result = self.category_predictor(
+        async def classify():
+            result = await self.client.apredict(
+                self.category_predictor,
+                stage="categories",
+                lm=self.lm,
                 joke_text=joke_text,
                 available_categories=str(randomized_category_info),
                 instruction=instruction
             )
             
             # Parse categories
-            is_independent = result.is_independent.lower() == 'true'
+            is_independent = result.is_independent
             
             if is_independent:
                 categories = ["Independent"]
@@ -84,9 +89,8 @@ AVOID THESE BIASES:
             return categories, is_independent
         
         try:
-            # Run synchronous DSPy call in thread pool to avoid blocking
-            loop = asyncio.get_event_loop()
-            return await loop.run_in_executor(None, lambda: self._retry_on_error(classify))
+            # Await the DSPy call directly on the native async path
+            return await self._retry_on_error_async(classify)
         except Exception as e:
             # Default to Independent on error
             return ["Independent"], True
@@ -5,6 +5,16 @@ from pathlib import Path
 from datetime import datetime
 from typing import Tuple, Optional, List
 
+from utilities.cassette import add_cassette_arguments, recorder_from_args, replay_lm_from_args
+from utilities.dspy_client import ClaudeClient
+from utilities.hedging import HedgePolicy
+from utilities.llm_scheduler import LLMScheduler, add_scheduler_arguments, llm_job, scheduler_from_args
+from utilities.rate_governor import RateGovernor
+from utilities.mock_lm import add_mock_arguments, mock_lm_from_args
+from utilities.model_tiers import add_tier_arguments, model_tiers_from_args
+from utilities.permutations import DEFAULT_SEED, add_seed_arguments
+from utilities.streaming import add_streaming_arguments
+from utilities.structured_output import add_structured_output_arguments
 from judges.main_judge import JokeJudgeSystem
 from judges.models import RatingResult
 
@@ -15,7 +25,13 @@ async def evaluate_jokes_programmatic(
     top_count: int = 20,
     bypass_cache: bool = False,
     rating_only: bool = False,
-    retries: int = 5
+    retries: int = 5,
+    client: Optional[ClaudeClient] = None,
+    hedge: bool = False,
+    lean: bool = False,
+    seed: int = DEFAULT_SEED,
+    combined_admissibility: bool = False,
+    prefilter: bool = False
 ):
     """
     Programmatic interface for joke evaluation system.
@@ -24,9 +40,15 @@ async def evaluate_jokes_programmatic(
         jokes_file: Path to XML file containing jokes
         batch_size: Number of jokes to process in parallel (default: 20)
         top_count: Number of top jokes to advance to tournament (default: 20)
-        bypass_cache: Bypass DSPy caching mechanism (default: False)
+        bypass_cache: Bypass the LLM response cache (default: False)
         rating_only: Only run rating phase without tournament (default: False)
         retries: Number of retry attempts for LLM calls (default: 5)
+        client: Existing ClaudeClient to reuse instead of creating a new one (default: None)
+        hedge: Hedge slow LLM calls to a secondary backend, ignored when client is given (default: False)
+        lean: Rate without reasoning, re-rate only the top jokes with reasoning (default: False)
+        seed: Run seed for the category/factor order shuffles (default: 0)
+        combined_admissibility: Run the five admissibility checks as one LLM call per joke (default: False)
+        prefilter: Decide clearly (in)admissible jokes with local heuristics before the LLM checks (default: False)
     
     Returns:
         List[RatingResult] if rating_only=True
@@ -48,7 +70,13 @@ async def evaluate_jokes_programmatic(
             batch_size, 
             top_count,
             bypass_cache,
-            retries
+            retries,
+            client,
+            hedge,
+            lean,
+            seed,
+            combined_admissibility,
+            prefilter
         )
         return best_jokes
     else:
@@ -58,7 +86,13 @@ async def evaluate_jokes_programmatic(
             batch_size, 
             top_count,
             bypass_cache,
-            retries
+            retries,
+            client,
+            hedge,
+            lean,
+            seed,
+            combined_admissibility,
+            prefilter
         )
         return winner
 
@@ -66,7 +100,46 @@ def main():
     """Entry point for: python -m judges.cli <jokes_file.xml> [options]"""
     args = parse_arguments()
     
-    # Run the evaluation
+    # Offline mock backend for load testing, a recorded cassette, message batches for the rating phase,
+    # or the Anthropic API
+    mock_lm = mock_lm_from_args(args)
+    replay_lm = replay_lm_from_args(args)
+    if args.record or args.replay:
+        args.bypass_cache = True  # Every call must reach the (recorded) LLM
+    backend_lm, governor, scheduler = replay_lm or mock_lm, None, scheduler_from_args(args)
+    if args.batch_api:
+        # Rating requests are queued into message batches (built by the client on its model and key),
+        # so there is no live rate limit to respect. All jokes form one batch so each rating stage is
+        # submitted together.
+        governor, scheduler = RateGovernor.unbounded(), LLMScheduler.unbounded()
+        args.batch_size = sys.maxsize
+    client = ClaudeClient(
+        cache=not args.bypass_cache,
+        governor=governor,
+        hedge=HedgePolicy() if args.hedge else None,
+        backend_lm=backend_lm,
+        batch_api=args.batch_api,
+        batch_idle_window=args.batch_idle_window,
+        stream=args.stream,
+        keep_reasoning=args.keep_reasoning,
+        tiers=model_tiers_from_args(args),
+        recorder=recorder_from_args(args),
+        structured_output=args.structured_output,
+        scheduler=scheduler
+    )
+    
+    # Run the evaluation as one job of the process-wide LLM scheduler
+    try:
+        with llm_job(f"judge:{Path(args.jokes_file).stem}", args.job_weight):
+            run_evaluation(args, client)
+    finally:
+        if client.recorder is not None:
+            client.recorder.close()
+        if replay_lm is not None:
+            print(f"\033[92mReplay: {replay_lm.stats()}\033[0m")
+
+def run_evaluation(args: argparse.Namespace, client: ClaudeClient):
+    """Run the rating phase (and tournament) selected on the command line and display the results"""
     if args.rating_only:
         # Rating-only mode
         best_jokes = asyncio.run(run_rating_only_evaluation(
@@ -74,7 +147,12 @@ def main():
             args.batch_size, 
             args.top_count,
             args.bypass_cache,
-            args.retries
+            args.retries,
+            client,
+            lean=args.lean,
+            seed=args.seed,
+            combined_admissibility=args.combined_admissibility,
+            prefilter=args.prefilter
         ))
         
         if best_jokes:
@@ -89,7 +167,12 @@ def main():
             args.batch_size, 
             args.top_count,
             args.bypass_cache,
-            args.retries
+            args.retries,
+            client,
+            lean=args.lean,
+            seed=args.seed,
+            combined_admissibility=args.combined_admissibility,
+            prefilter=args.prefilter
         ))
         
         # Display results
@@ -132,7 +215,7 @@ def parse_arguments():
     parser.add_argument(
         '--bypass-cache',
         action='store_true',
-        help='Bypass DSPy caching mechanism'
+        help='Bypass the LLM response cache (fresh responses still refresh the cache)'
     )
     
     parser.add_argument(
@@ -148,26 +231,87 @@ def parse_arguments():
         help='Number of retry attempts for LLM calls (default: 5, 0 = no retries)'
     )
     
+    add_mock_arguments(parser)
+    
+    parser.add_argument(
+        '--hedge',
+        action='store_true',
+        help='Duplicate unusually slow LLM calls to a secondary backend (ANTHROPIC_API_KEY_SECONDARY or OPENROUTER_API_KEY)'
+    )
+    
+    add_streaming_arguments(parser)
+    
+    add_tier_arguments(parser)
+    
+    add_cassette_arguments(parser)
+    
+    add_structured_output_arguments(parser)
+    
+    add_seed_arguments(parser)
+    
+    add_scheduler_arguments(parser)
+    
+    parser.add_argument(
+        '--lean',
+        action='store_true',
+        help='Rate without reasoning fields and with small output budgets; only the top jokes are re-rated '
+             'with reasoning before the tournament'
+    )
+    
+    parser.add_argument(
+        '--combined-admissibility',
+        action='store_true',
+        help='Run the five admissibility checks of a joke as one LLM call instead of five'
+    )
+    
+    parser.add_argument(
+        '--prefilter',
+        action='store_true',
+        help='Pass or reject clear-cut jokes with local heuristics; only ambiguous ones get the LLM '
+             'admissibility checks'
+    )
+    
+    parser.add_argument(
+        '--batch-api',
+        action='store_true',
+        help='Submit the rating phase as message batches (half price, results can take hours; duels stay live)'
+    )
+    
+    parser.add_argument(
+        '--batch-idle-window',
+        type=float,
+        default=2.0,
+        help='Seconds without new rating requests before a batch is submitted (default: 2.0)'
+    )
+    
     return parser.parse_args()
 
 async def run_batch_evaluation(jokes_file_path: str, batch_size: int = 20, 
                               top_count: int = 20, bypass_cache: bool = False,
-                              max_retries: int = 5) -> Tuple[Optional[Tuple[int, str]], Optional[str]]:
+                              max_retries: int = 5,
+                              client: Optional[ClaudeClient] = None,
+                              hedge: bool = False, lean: bool = False,
+                              seed: int = DEFAULT_SEED,
+                              combined_admissibility: bool = False,
+                              prefilter: bool = False) -> Tuple[Optional[Tuple[int, str]], Optional[str]]:
     """Run complete evaluation pipeline"""
     # Extract filename for output directory
     filename = Path(jokes_file_path).stem
     timestamp = datetime.now().strftime("%Y_%m_%d_%H_%M_%S")
     output_dir = f"logs/{filename}_{timestamp}"
     
-    # Initialize system with bypass_cache and max_retries
-    judge_system = JokeJudgeSystem(output_dir, bypass_cache=bypass_cache, max_retries=max_retries)
+    # Initialize system with bypass_cache, max_retries and the caller's client (if any)
+    judge_system = JokeJudgeSystem(output_dir, bypass_cache=bypass_cache, max_retries=max_retries,
+                                   client=client, hedge=hedge, lean=lean, seed=seed,
+                                   combined_admissibility=combined_admissibility, prefilter=prefilter)
     
-    # Run evaluation
-    result = await judge_system.run_complete_evaluation(
-        jokes_file_path, 
-        batch_size, 
-        top_count
-    )
+    # Run evaluation (its own scheduler job unless the caller's run already is one)
+    with llm_job(f"judge:{filename}"):
+        result = await judge_system.run_complete_evaluation(
+            jokes_file_path, 
+            batch_size, 
+            top_count
+        )
     
     if result[0] is None:
         return (None, None)
@@ -176,22 +320,30 @@ async def run_batch_evaluation(jokes_file_path: str, batch_size: int = 20,
 
 async def run_rating_only_evaluation(jokes_file_path: str, batch_size: int = 20,
                                     top_count: int = 20, bypass_cache: bool = False,
-                                    max_retries: int = 5) -> Optional[List[RatingResult]]:
+                                    max_retries: int = 5,
+                                    client: Optional[ClaudeClient] = None,
+                                    hedge: bool = False, lean: bool = False,
+                                    seed: int = DEFAULT_SEED,
+                                    combined_admissibility: bool = False,
+                                    prefilter: bool = False) -> Optional[List[RatingResult]]:
     """Run only the rating phase and return top jokes"""
     # Extract filename for output directory
     filename = Path(jokes_file_path).stem
     timestamp = datetime.now().strftime("%Y_%m_%d_%H_%M_%S")
     output_dir = f"logs/{filename}_{timestamp}_rating_only"
     
-    # Initialize system with bypass_cache and max_retries
-    judge_system = JokeJudgeSystem(output_dir, bypass_cache=bypass_cache, max_retries=max_retries)
+    # Initialize system with bypass_cache, max_retries and the caller's client (if any)
+    judge_system = JokeJudgeSystem(output_dir, bypass_cache=bypass_cache, max_retries=max_retries,
+                                   client=client, hedge=hedge, lean=lean, seed=seed,
+                                   combined_admissibility=combined_admissibility, prefilter=prefilter)
     
-    # Run rating-only evaluation
-    top_jokes = await judge_system.run_rating_only_evaluation(
-        jokes_file_path,
-        batch_size,
-        top_count
-    )
+    # Run rating-only evaluation (its own scheduler job unless the caller's run already is one)
+    with llm_job(f"judge:{filename}"):
+        top_jokes = await judge_system.run_rating_only_evaluation(
+            jokes_file_path,
+            batch_size,
+            top_count
+        )
     
     return top_jokes
 
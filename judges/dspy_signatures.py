@@ -1,51 +1,147 @@
 import dspy
-from typing import List
+from typing import ClassVar, List, Literal, Tuple
 from judges.models import CategoryFactor, FactorData
 
+# Static inputs (instructions, category lists, examples) come first and the per-call inputs listed in
+# dynamic_inputs last, so utilities.prompt_caching.PromptCachingAdapter can cache the shared prefix.
+# Decision fields are typed, so they reach the judges parsed and can be sent as a JSON schema.
+
 class AdmissibilitySignature(dspy.Signature):
     """Check if text is admissible as a joke"""
+    dynamic_inputs: ClassVar[Tuple[str, ...]] = ("joke_text",)
+    check_type = dspy.InputField(desc="Type of admissibility check: intent/completeness/appropriateness/coherence/accessibility")
+    instruction_prompt = dspy.InputField(desc="Liberal evaluation instructions for this check")
     joke_text = dspy.InputField(desc="The joke text to evaluate")
+    
+    reasoning = dspy.OutputField(desc="Brief explanation for the decision")
+    passed: bool = dspy.OutputField(desc="true or false")
+
+class DecisionFirstAdmissibilitySignature(dspy.Signature):
+    """Check if text is admissible as a joke"""
+    dynamic_inputs: ClassVar[Tuple[str, ...]] = ("joke_text",)
     check_type = dspy.InputField(desc="Type of admissibility check: intent/completeness/appropriateness/coherence/accessibility")
     instruction_prompt = dspy.InputField(desc="Liberal evaluation instructions for this check")
+    joke_text = dspy.InputField(desc="The joke text to evaluate")
     
+    # Decision first: in streaming mode (--stream) the response is cut before the reasoning
+    passed: bool = dspy.OutputField(desc="true or false")
     reasoning = dspy.OutputField(desc="Brief explanation for the decision")
-    passed = dspy.OutputField(desc="true or false")
+
+class CombinedAdmissibilitySignature(dspy.Signature):
+    """Run all five admissibility checks on a joke in one answer, each judged only by its own guidelines"""
+    dynamic_inputs: ClassVar[Tuple[str, ...]] = ("joke_text",)
+    check_guidelines = dspy.InputField(desc="Liberal evaluation instructions for each check: intent, completeness, appropriateness, coherence, accessibility")
+    joke_text = dspy.InputField(desc="The joke text to evaluate")
+    
+    # Every decision before any reasoning: in streaming mode the response is cut after the decisions
+    intent_passed: bool = dspy.OutputField(desc="true or false")
+    completeness_passed: bool = dspy.OutputField(desc="true or false")
+    appropriateness_passed: bool = dspy.OutputField(desc="true or false")
+    coherence_passed: bool = dspy.OutputField(desc="true or false")
+    accessibility_passed: bool = dspy.OutputField(desc="true or false")
+    intent_reasoning = dspy.OutputField(desc="Brief explanation for the intent decision")
+    completeness_reasoning = dspy.OutputField(desc="Brief explanation for the completeness decision")
+    appropriateness_reasoning = dspy.OutputField(desc="Brief explanation for the appropriateness decision")
+    coherence_reasoning = dspy.OutputField(desc="Brief explanation for the coherence decision")
+    accessibility_reasoning = dspy.OutputField(desc="Brief explanation for the accessibility decision")
 
 class CategoryAssignmentSignature(dspy.Signature):
     """Assign joke to relevant categories based on analysis of joke content against available category definitions"""
-    joke_text = dspy.InputField(desc="The joke text to categorize")
-    available_categories = dspy.InputField(desc="List of CategoryInfo objects containing name, description, and examples for all available categories")
+    dynamic_inputs: ClassVar[Tuple[str, ...]] = ("joke_text",)
     instruction = dspy.InputField(desc="Detailed instructions for categorization analysis and bias avoidance")
+    available_categories = dspy.InputField(desc="List of CategoryInfo objects containing name, description, and examples for all available categories")
+    joke_text = dspy.InputField(desc="The joke text to categorize")
     
     reasoning = dspy.OutputField(desc="Analysis of which categories the joke should fit into and why")
     selected_categories = dspy.OutputField(desc="List of applicable category names only (do not include descriptions or examples)")
-    is_independent = dspy.OutputField(desc="true if no existing categories fit well, false otherwise")
+    is_independent: bool = dspy.OutputField(desc="true if no existing categories fit well, false otherwise")
 
 class FactorSelectionSignature(dspy.Signature):
     """Select relevant factors from randomized categories for joke evaluation with enhanced bias mitigation"""
-    joke_text = dspy.InputField(desc="The joke text to evaluate")
-    relevant_categories = dspy.InputField(desc="List[CategoryFactor] - Randomized categories with their associated factor descriptions (name and description only) to prevent position bias")
+    dynamic_inputs: ClassVar[Tuple[str, ...]] = ("relevant_categories", "joke_text")
     instruction = dspy.InputField(desc="Comprehensive instructions for factor selection with explicit bias mitigation guidelines and validation questions")
+    relevant_categories = dspy.InputField(desc="List[CategoryFactor] - Randomized categories with their associated factor descriptions (name and description only) to prevent position bias")
+    joke_text = dspy.InputField(desc="The joke text to evaluate")
     
     reasoning = dspy.OutputField(desc="Detailed explanation for factor selection including validation against bias mitigation criteria")
     relevant_factors = dspy.OutputField(desc="List of relevant factor names chosen from the factors that would be application to rate a the joke. Please select one or more options.")
 
 class FactorScoringSignature(dspy.Signature):
     """Score joke on specific factor"""
-    joke_text = dspy.InputField(desc="The joke text to score")
-    factor_data = dspy.InputField(desc="FactorData object containing factor name, description, positive examples, and negative examples")
+    dynamic_inputs: ClassVar[Tuple[str, ...]] = ("joke_text",)
     instruction = dspy.InputField(desc="Detailed instructions for objective factor-based scoring with bias mitigation guidelines")
+    factor_data = dspy.InputField(desc="FactorData object containing factor name, description, positive examples, and negative examples")
+    joke_text = dspy.InputField(desc="The joke text to score")
     
     reasoning = dspy.OutputField(desc="Explanation for the score")
-    score = dspy.OutputField(desc="Integer score from 0 to 5")
+    score: int = dspy.OutputField(desc="Integer score from 0 to 5")
 
 class DuelComparisonSignature(dspy.Signature):
     """Compare two jokes to determine which is funnier with bias mitigation"""
-    joke_a = dspy.InputField(desc="First joke text")
-    joke_b = dspy.InputField(desc="Second joke text")
+    dynamic_inputs: ClassVar[Tuple[str, ...]] = ("joke_a", "joke_b")
+    instruction = dspy.InputField(desc="Comprehensive instructions for bias-free humor evaluation and comparison")
     good_examples = dspy.InputField(desc="Examples of good jokes for reference")
     bad_examples = dspy.InputField(desc="Examples of bad jokes for reference")
-    instruction = dspy.InputField(desc="Comprehensive instructions for bias-free humor evaluation and comparison")
+    joke_a = dspy.InputField(desc="First joke text")
+    joke_b = dspy.InputField(desc="Second joke text")
+    
+    winner: Literal["joke_a", "joke_b"] = dspy.OutputField(desc="Either 'joke_a' or 'joke_b'")
+    confidence_level: float = dspy.OutputField(desc="Float between 1.0 and 5.0 representing confidence in the decision. Use descriptive ranges: 1.0-2.0=Tie/Equal, 2.0-3.0=Slightly funnier, 3.0-4.0=Moderately funnier, 4.0-5.0=Significantly funnier")
+
+
+# Lean variants (--lean): the same decisions without a reasoning field, each with an output budget in
+# max_output_tokens. Output tokens dominate latency; reasoning is only requested for top-rated jokes.
+
+class LeanAdmissibilitySignature(dspy.Signature):
+    """Check if text is admissible as a joke. Answer only with the decision."""
+    dynamic_inputs: ClassVar[Tuple[str, ...]] = ("joke_text",)
+    max_output_tokens: ClassVar[int] = 32
+    check_type = dspy.InputField(desc="Type of admissibility check: intent/completeness/appropriateness/coherence/accessibility")
+    instruction_prompt = dspy.InputField(desc="Liberal evaluation instructions for this check")
+    joke_text = dspy.InputField(desc="The joke text to evaluate")
+    
+    passed: bool = dspy.OutputField(desc="true or false")
+
+class LeanCombinedAdmissibilitySignature(dspy.Signature):
+    """Run all five admissibility checks on a joke in one answer, each judged only by its own guidelines. Answer only with the decisions."""
+    dynamic_inputs: ClassVar[Tuple[str, ...]] = ("joke_text",)
+    max_output_tokens: ClassVar[int] = 96
+    check_guidelines = dspy.InputField(desc="Liberal evaluation instructions for each check: intent, completeness, appropriateness, coherence, accessibility")
+    joke_text = dspy.InputField(desc="The joke text to evaluate")
+    
+    intent_passed: bool = dspy.OutputField(desc="true or false")
+    completeness_passed: bool = dspy.OutputField(desc="true or false")
+    appropriateness_passed: bool = dspy.OutputField(desc="true or false")
+    coherence_passed: bool = dspy.OutputField(desc="true or false")
+    accessibility_passed: bool = dspy.OutputField(desc="true or false")
+
+class LeanCategoryAssignmentSignature(dspy.Signature):
+    """Assign joke to relevant categories based on the available category definitions. Answer only with the categories."""
+    dynamic_inputs: ClassVar[Tuple[str, ...]] = ("joke_text",)
+    max_output_tokens: ClassVar[int] = 200
+    instruction = dspy.InputField(desc="Detailed instructions for categorization analysis and bias avoidance")
+    available_categories = dspy.InputField(desc="List of CategoryInfo objects containing name, description, and examples for all available categories")
+    joke_text = dspy.InputField(desc="The joke text to categorize")
+    
+    selected_categories = dspy.OutputField(desc="List of applicable category names only (do not include descriptions or examples)")
+    is_independent: bool = dspy.OutputField(desc="true if no existing categories fit well, false otherwise")
+
+class LeanFactorSelectionSignature(dspy.Signature):
+    """Select relevant factors from randomized categories for joke evaluation. Answer only with the factor names."""
+    dynamic_inputs: ClassVar[Tuple[str, ...]] = ("relevant_categories", "joke_text")
+    max_output_tokens: ClassVar[int] = 200
+    instruction = dspy.InputField(desc="Comprehensive instructions for factor selection with explicit bias mitigation guidelines and validation questions")
+    relevant_categories = dspy.InputField(desc="List[CategoryFactor] - Randomized categories with their associated factor descriptions (name and description only) to prevent position bias")
+    joke_text = dspy.InputField(desc="The joke text to evaluate")
+    
+    relevant_factors = dspy.OutputField(desc="List of relevant factor names chosen from the factors that would be application to rate a the joke. Please select one or more options.")
+
+class LeanFactorScoringSignature(dspy.Signature):
+    """Score joke on specific factor. Answer only with the score."""
+    dynamic_inputs: ClassVar[Tuple[str, ...]] = ("joke_text",)
+    max_output_tokens: ClassVar[int] = 32
+    instruction = dspy.InputField(desc="Detailed instructions for objective factor-based scoring with bias mitigation guidelines")
+    factor_data = dspy.InputField(desc="FactorData object containing factor name, description, positive examples, and negative examples")
+    joke_text = dspy.InputField(desc="The joke text to score")
     
-    winner = dspy.OutputField(desc="Either 'joke_a' or 'joke_b'")
-    confidence_level = dspy.OutputField(desc="Float between 1.0 and 5.0 representing confidence in the decision. Use descriptive ranges: 1.0-2.0=Tie/Equal, 2.0-3.0=Slightly funnier, 3.0-4.0=Moderately funnier, 4.0-5.0=Significantly funnier")
\ No newline at end of file
+    score: int = dspy.OutputField(desc="Integer score from 0 to 5")
@@ -1,5 +1,5 @@
 import asyncio
-from typing import Dict, Tuple
+from typing import Dict, Optional, Tuple
 import dspy
 
 from utilities.dspy_client import ClaudeClient
@@ -8,11 +8,13 @@ from judges.models import RatingResult, DuelResult
 from judges.dspy_signatures import DuelComparisonSignature
 
 class DuelJudge:
-    def __init__(self, client: ClaudeClient, examples: ExampleData, max_retries: int = 5):
+    def __init__(self, client: ClaudeClient, examples: ExampleData, max_retries: int = 5,
+                 lm: Optional[dspy.BaseLM] = None):
         """Initialize with good/bad joke examples"""
         self.client = client
         self.examples = examples
         self.max_retries = max_retries
+        self.lm = lm  # LM handle for this component's calls, None = the client's default
         self.duel_predictor = dspy.Predict(DuelComparisonSignature)
         
         # Enhanced bias-free humor evaluation instruction
@@ -81,26 +83,21 @@ You can use any decimal value between 1.0 and 5.0 (e.g., 2.3, 3.7, 4.1) to preci
         # Resolve the comparison with joke metadata for tiebreaking
         return self._resolve_comparison(ab_result, ba_result, joke_a, joke_b)
     
-    def _retry_on_error(self, func, *args, **kwargs):
-        """Generic retry wrapper for sync functions with retries"""
-        for attempt in range(self.max_retries + 1):
-            try:
-                return func(*args, **kwargs)
-            except Exception as e:
-                if attempt == self.max_retries:
-                    raise e
-                else:
-                    print(f"\033[93m⚠️  Duel comparison error: {str(e)[:50]}..., retrying in 2s\033[0m")
-                    import time
-                    time.sleep(2)
+    async def _retry_on_error_async(self, func, *args, **kwargs):
+        """Retry through the client's shared policy (jittered backoff, run-wide budget, circuit breaker)"""
+        return await self.client.retry_policy.call(lambda: func(*args, **kwargs), max_retries=self.max_retries,
+                                                   label="Duel comparison", stage="duel")
    
     async def _compare_ab_async(self, joke_a_text: str, joke_b_text: str) -> Dict:
         """Compare A vs B with enhanced bias-free evaluation"""
         good_examples = "\n".join(f"Good: {ex}" for ex in self.examples.good_jokes)
         bad_examples = "\n".join(f"Bad: {ex}" for ex in self.examples.bad_jokes)
         
-        def compare():
-            result = self.duel_predictor(
+        async def compare():
+            result = await self.client.apredict(
+                self.duel_predictor,
+                stage="duel",
+                lm=self.lm,
                 joke_a=joke_a_text,
                 joke_b=joke_b_text,
                 good_examples=good_examples,
@@ -108,23 +105,17 @@ You can use any decimal value between 1.0 and 5.0 (e.g., 2.3, 3.7, 4.1) to preci
                 instruction=self.evaluation_instruction
             )
             
-            winner = result.winner.lower().strip()
-            try:
-                confidence_level = float(result.confidence_level)
-                confidence_level = max(1.0, min(5.0, confidence_level))  # Ensure 1.0-5.0 range
-            except:
-                confidence_level = 1.0  # Default to tie
+            confidence_level = max(1.0, min(5.0, result.confidence_level))  # Ensure 1.0-5.0 range
             
             return {
-                'winner': 'a' if 'joke_a' in winner else 'b',
+                'winner': 'a' if result.winner == 'joke_a' else 'b',
                 'confidence_level': confidence_level,
                 'confidence': confidence_level  # Keep for compatibility
             }
         
         try:
-            # Run synchronous DSPy call in thread pool to avoid blocking
-            loop = asyncio.get_event_loop()
-            return await loop.run_in_executor(None, lambda: self._retry_on_error(compare))
+            # Await the DSPy call directly on the native async path
+            return await self._retry_on_error_async(compare)
         except Exception as e:
             # Default to A with tie confidence on error after all retries
             return {
@@ -138,8 +129,11 @@ You can use any decimal value between 1.0 and 5.0 (e.g., 2.3, 3.7, 4.1) to preci
         good_examples = "\n".join(f"Good: {ex}" for ex in self.examples.good_jokes)
         bad_examples = "\n".join(f"Bad: {ex}" for ex in self.examples.bad_jokes)
        
-        def compare():
-            result = self.duel_predictor(
+        async def compare():
+            result = await self.client.apredict(
+                self.duel_predictor,
+                stage="duel",
+                lm=self.lm,
                 joke_a=joke_b_text,
                 joke_b=joke_a_text,
                 good_examples=good_examples,
@@ -147,18 +141,9 @@ You can use any decimal value between 1.0 and 5.0 (e.g., 2.3, 3.7, 4.1) to preci
                 instruction=self.evaluation_instruction
             )
            
-            winner = result.winner.lower().strip()
             # Reverse the result since we swapped inputs
-            if 'joke_a' in winner:
-                actual_winner = 'b'
-            else:
-                actual_winner = 'a'
-           
-            try:
-                confidence_level = float(result.confidence_level)
-                confidence_level = max(1.0, min(5.0, confidence_level))
-            except:
-                confidence_level = 1.0
+            actual_winner = 'b' if result.winner == 'joke_a' else 'a'
+            confidence_level = max(1.0, min(5.0, result.confidence_level))
            
             return {
                 'winner': actual_winner,
@@ -167,9 +152,8 @@ You can use any decimal value between 1.0 and 5.0 (e.g., 2.3, 3.7, 4.1) to preci
             }
        
         try:
-            # Run synchronous DSPy call in thread pool to avoid blocking
-            loop = asyncio.get_event_loop()
-            return await loop.run_in_executor(None, lambda: self._retry_on_error(compare))
+            # Await the DSPy call directly on the native async path
+            return await self._retry_on_error_async(compare)
         except Exception as e:
             return {
                 'winner': 'a',
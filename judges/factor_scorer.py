@@ -1,19 +1,25 @@
 import asyncio
 import dspy
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 from utilities.dspy_client import ClaudeClient
 from judges.models import FactorData
-from judges.dspy_signatures import FactorScoringSignature
+from judges.dspy_signatures import FactorScoringSignature, LeanFactorScoringSignature
 
 
 class FactorScorer:
     """Handles factor scoring for jokes"""
     
-    def __init__(self, client: ClaudeClient, max_retries: int = 5):
+    def __init__(self, client: ClaudeClient, max_retries: int = 5, lm: Optional[dspy.BaseLM] = None,
+                 lean: bool = False):
         self.client = client
         self.max_retries = max_retries
-        self.factor_scorer = dspy.Predict(FactorScoringSignature)
+        self.lm = lm  # LM handle for this component's calls, None = the client's default
+        # Lean mode: the score only, within a small output budget
+        self.factor_scorer = (
+            dspy.Predict(LeanFactorScoringSignature, max_tokens=LeanFactorScoringSignature.max_output_tokens)
+            if lean else dspy.Predict(FactorScoringSignature)
+        )
         
         # Define the comprehensive scoring instructions
         self.scoring_instructions = """
@@ -71,20 +77,10 @@ You are an expert joke evaluator with high professional standards. Your role is
 Use the full range thoughtfully. Recognize that good execution deserves recognition (scores 2-3), while exceptional work should be rewarded (scores 4-5), and poor execution should be honestly assessed (scores 0-1). Create meaningful distinctions between performance levels.
 """
     
-    def _retry_on_error(self, func, *args, **kwargs):
-        """Generic retry wrapper for sync functions with retries"""
-        for attempt in range(self.max_retries + 1):  # +1 for initial attempt
-            try:
-                return func(*args, **kwargs)
-            except Exception as e:
-                if attempt == self.max_retries:
-                    # No more retries
-                    raise e
-                else:
-                    # Log retry attempt
-                    print(f"\033[93m⚠️  Error: {str(e)[:50]}..., retrying in 2s\033[0m")
-                    import time
-                    time.sleep(2)
+    async def _retry_on_error_async(self, func, *args, **kwargs):
+        """Retry through the client's shared policy (jittered backoff, run-wide budget, circuit breaker)"""
+        return await self.client.retry_policy.call(lambda: func(*args, **kwargs), max_retries=self.max_retries,
+                                                   label="Factor scoring", stage="factor_scoring")
     
     async def score_factors_async(self, joke_text: str, factors: List[str], 
                                   factor_objects: Dict[str, FactorData]) -> Dict[str, int]:
@@ -124,24 +120,20 @@ Use the full range thoughtfully. Recognize that good execution deserves recognit
     async def _score_single_factor_async(self, joke_text: str, factor: FactorData) -> int:
         """Score joke on a single factor"""
         
-        def score():
-            result = self.factor_scorer(
+        async def score():
+            result = await self.client.apredict(
+                self.factor_scorer,
+                stage="factor_scoring",
+                lm=self.lm,
                 joke_text=joke_text,
                 factor_data=factor,
                 instruction=self.scoring_instructions
             )
-            
-            # Parse score
-            try:
-                score_val = int(result.score)
-                return max(0, min(5, score_val))  # Ensure 0-5 range
-            except:
-                return 3  # Default middle score on parse error
+            return max(0, min(5, result.score))  # Ensure 0-5 range (parsed as int by the adapter)
         
         try:
-            # Run synchronous DSPy call in thread pool to avoid blocking
-            loop = asyncio.get_event_loop()
-            return await loop.run_in_executor(None, lambda: self._retry_on_error(score))
+            # Await the DSPy call directly on the native async path
+            return await self._retry_on_error_async(score)
         except Exception as e:
             return 3  # Default middle score on API error
 
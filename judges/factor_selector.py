@@ -1,37 +1,33 @@
-import asyncio
-import random
 import copy
 import dspy
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 from utilities.dspy_client import ClaudeClient
+from utilities.permutations import DEFAULT_SEED, seeded_permutation
 from judges.models import CategoryFactor, FactorData, FactorDescription, CategoryFactorForDSPy
-from judges.dspy_signatures import FactorSelectionSignature
+from judges.dspy_signatures import FactorSelectionSignature, LeanFactorSelectionSignature
 
 
 class FactorSelector:
     """Handles factor selection for jokes based on categories with bias mitigation"""
     
-    def __init__(self, client: ClaudeClient, category_factors: Dict[str, CategoryFactor], max_retries: int = 5):
+    def __init__(self, client: ClaudeClient, category_factors: Dict[str, CategoryFactor], max_retries: int = 5,
+                 lm: Optional[dspy.BaseLM] = None, lean: bool = False, seed: int = DEFAULT_SEED):
         self.client = client
         self.category_factors = category_factors
         self.max_retries = max_retries
-        self.factor_selector = dspy.Predict(FactorSelectionSignature)
+        self.seed = seed  # Run seed for the order shuffles
+        self.lm = lm  # LM handle for this component's calls, None = the client's default
+        # Lean mode: factor names only, within a small output budget
+        self.factor_selector = (
+            dspy.Predict(LeanFactorSelectionSignature, max_tokens=LeanFactorSelectionSignature.max_output_tokens)
+            if lean else dspy.Predict(FactorSelectionSignature)
+        )
     
-    def _retry_on_error(self, func, *args, **kwargs):
-        """Generic retry wrapper for sync functions with retries"""
-        for attempt in range(self.max_retries + 1):  # +1 for initial attempt
-            try:
-                return func(*args, **kwargs)
-            except Exception as e:
-                if attempt == self.max_retries:
-                    # No more retries
-                    raise e
-                else:
-                    # Log retry attempt
-                    print(f"\033[93m⚠️  Error: {str(e)[:50]}..., retrying in 2s\033[0m")
-                    import time
-                    time.sleep(2)
+    async def _retry_on_error_async(self, func, *args, **kwargs):
+        """Retry through the client's shared policy (jittered backoff, run-wide budget, circuit breaker)"""
+        return await self.client.retry_policy.call(lambda: func(*args, **kwargs), max_retries=self.max_retries,
+                                                   label="Factor selection", stage="factor_selection")
     
     def _convert_to_dspy_format(self, relevant_categories: List[CategoryFactor]) -> List[CategoryFactorForDSPy]:
         """
@@ -59,22 +55,23 @@ class FactorSelector:
         
         return dspy_categories
     
-    def _randomize_categories_and_factors(self, relevant_categories: List[CategoryFactorForDSPy]) -> List[CategoryFactorForDSPy]:
+    def _randomize_categories_and_factors(self, relevant_categories: List[CategoryFactorForDSPy],
+                                          joke_text: str) -> List[CategoryFactorForDSPy]:
         """
         Randomize the order of categories and factors within each category to prevent position bias.
+        The orders are fixed by the joke text and run seed, so a re-run sends the same prompt.
         Creates deep copies to avoid modifying original data structures.
         """
         try:
             # Create deep copies to avoid modifying original data
-            randomized_categories = copy.deepcopy(relevant_categories)
-            
-            # Randomize the order of categories
-            random.shuffle(randomized_categories)
+            randomized_categories = seeded_permutation(copy.deepcopy(relevant_categories), self.seed,
+                                                       "categories", joke_text)
             
             # Randomize the order of factors within each category
             for category in randomized_categories:
                 if category.factors:
-                    random.shuffle(category.factors)
+                    category.factors = seeded_permutation(category.factors, self.seed, "factors", category.name,
+                                                          joke_text)
             
             return randomized_categories
             
@@ -142,14 +139,17 @@ Your factor selection should enable a thorough, unbiased evaluation of this spec
             dspy_categories = self._convert_to_dspy_format(relevant_categories)
             
             # Randomize categories and factors to prevent position bias
-            randomized_categories = self._randomize_categories_and_factors(dspy_categories)
+            randomized_categories = self._randomize_categories_and_factors(dspy_categories, joke_text)
             
             # Create enhanced instruction with bias mitigation
             enhanced_instruction = self._create_enhanced_instruction()
             
             # Make the DSPy call to select factors
-            def select():
-                result = self.factor_selector(
+            async def select():
+                result = await self.client.apredict(
+                    self.factor_selector,
+                    stage="factor_selection",
+                    lm=self.lm,
                     joke_text=joke_text,
                     relevant_categories=randomized_categories,
                     instruction=enhanced_instruction
@@ -182,9 +182,8 @@ Your factor selection should enable a thorough, unbiased evaluation of this spec
                     for factor_data in category_factor.factors:
                         factor_lookup[factor_data.name.lower()] = factor_data
                 
-                # Run synchronous DSPy call in thread pool to avoid blocking
-                loop = asyncio.get_event_loop()
-                selected_factors = await loop.run_in_executor(None, lambda: self._retry_on_error(select))
+                # Await the DSPy call directly on the native async path
+                selected_factors = await self._retry_on_error_async(select)
                 
                 # Build factor objects mapping and all_factors list using lookup
                 for factor_name in selected_factors:
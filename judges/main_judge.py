@@ -1,26 +1,46 @@
 import asyncio
+import dspy
 from typing import Tuple, Optional, List
 from pathlib import Path
 
 from utilities.dspy_client import ClaudeClient
+from utilities.hedging import HedgePolicy
+from utilities.llm_scheduler import llm_priority
+from utilities.permutations import DEFAULT_SEED
 from utilities.xml_parser import XMLConfigParser
 from utilities.xml_logger import XMLLogger
-from judges.models import RatingResult
+from judges.models import JokeData, RatingResult
 from judges.rating_judge import RatingJudge
 from judges.duel_judge import DuelJudge
 from judges.batch_processor import BatchProcessor
 from judges.tournament_manager import TournamentManager
 
 class JokeJudgeSystem:
-    def __init__(self, output_dir: str, bypass_cache: bool = False, max_retries: int = 5):
-        """Initialize all components"""
+    def __init__(self, output_dir: str, bypass_cache: bool = False, max_retries: int = 5,
+                 client: Optional[ClaudeClient] = None, hedge: bool = False,
+                 rating_lm: Optional[dspy.BaseLM] = None, duel_lm: Optional[dspy.BaseLM] = None,
+                 lean: bool = False, seed: int = DEFAULT_SEED, combined_admissibility: bool = False,
+                 prefilter: bool = False):
+        """Initialize all components; rating_lm / duel_lm are LM handles (e.g. client.make_lm(...)) per phase.
+        
+        lean=True rates every joke without reasoning fields and small output budgets, then re-rates
+        only the top jokes with the full judge (reasoning included) before they are ranked. seed is the
+        run seed for the bias shuffles: the same seed and jokes give the same prompts.
+        combined_admissibility=True runs the five admissibility checks of a joke as one LLM call.
+        prefilter=True decides clearly (in)admissible jokes locally; the lean top-joke re-rating
+        always runs the LLM checks so the finalists keep their reasoning.
+        """
         self.output_dir = output_dir
         self.bypass_cache = bypass_cache
         self.max_retries = max_retries
         self.logger = None  # Initialize later if needed
         
-        # Initialize DSPy client with bypass_cache parameter
-        self.client = ClaudeClient(cache = not bypass_cache)
+        # Reuse the caller's client (one per run); otherwise create one here. Its
+        # health probe runs in the background while the XML configs are parsed.
+        self.client = client or ClaudeClient(cache = not bypass_cache, hedge=HedgePolicy() if hedge else None)
+        # A caller's client also counts the caller's calls: report only those made during a judge run
+        self.shared_client = client is not None
+        self.usage_baseline = None
         
         # Load XML configurations
         self.parser = XMLConfigParser()
@@ -36,17 +56,29 @@ class JokeJudgeSystem:
             category_factors=self.category_factors,
             examples=self.examples,
             category_info_list=self.category_info_list,
-            max_retries=max_retries
+            max_retries=max_retries,
+            lm=rating_lm,
+            lean=lean,
+            seed=seed,
+            combined_admissibility=combined_admissibility,
+            prefilter=prefilter
         )
+        self.lean = lean
+        self.seed = seed
+        self.combined_admissibility = combined_admissibility
+        self.rating_lm = rating_lm
+        self.full_rating_judge = None  # Lean mode: created for re-rating the top jokes
         # Duel judge will be initialized only if needed (not in rating-only mode)
         self.duel_judge = None
+        self.duel_lm = duel_lm
     
     async def run_complete_evaluation(self, jokes_file_path: str, batch_size: int = 20, 
                                     top_count: int = 20) -> Tuple[Optional[Tuple[int, str]], Optional[str]]:
         """Main pipeline with configurable parameters"""
+        self._start_usage_window()
         # Initialize duel judge for full evaluation
         if self.duel_judge is None:
-            self.duel_judge = DuelJudge(self.client, self.examples, max_retries=self.max_retries)
+            self.duel_judge = DuelJudge(self.client, self.examples, max_retries=self.max_retries, lm=self.duel_lm)
         
         # Step 1: Load and validate jokes
         jokes = self._load_jokes(jokes_file_path)
@@ -76,10 +108,13 @@ class JokeJudgeSystem:
         
         if not admissible_jokes:
             print("\033[91mNo admissible jokes found!\033[0m")
+            self._write_usage_report()
             return (None, self.output_dir)
         
         # Get top N jokes
         top_jokes = sorted(admissible_jokes, key=lambda x: x.overall_rating, reverse=True)[:top_count]
+        if self.lean:
+            top_jokes = await self._rerate_with_reasoning(top_jokes, batch_size)
         print(f"Selected top {len(top_jokes)} jokes for tournament")
         
         # Log top jokes
@@ -95,6 +130,9 @@ class JokeJudgeSystem:
         # Step 5: Log tournament results
         await self._log_tournament_results(tournament_result)
         
+        self._display_cache_stats()
+        self._write_usage_report()
+        
         # Return winner
         winner = tournament_result.winner_joke
         return ((winner.joke_id, winner.joke_text), self.output_dir)
@@ -102,6 +140,7 @@ class JokeJudgeSystem:
     async def run_rating_only_evaluation(self, jokes_file_path: str, batch_size: int = 20, 
                                        top_count: int = 20) -> Optional[List[RatingResult]]:
         """Run only the rating phase and return top jokes"""
+        self._start_usage_window()
         # Step 1: Load and validate jokes
         jokes = self._load_jokes(jokes_file_path)
         
@@ -135,6 +174,8 @@ class JokeJudgeSystem:
         
         # Get top N jokes
         top_jokes = sorted(admissible_jokes, key=lambda x: x.overall_rating, reverse=True)[:top_count]
+        if self.lean:
+            top_jokes = await self._rerate_with_reasoning(top_jokes, batch_size)
         print(f"\nSelected top {len(top_jokes)} jokes")
         
         # Log top jokes as final results for rating-only mode
@@ -145,6 +186,9 @@ class JokeJudgeSystem:
         # Create a summary file for rating-only mode
         await self._log_rating_only_summary(top_jokes, len(jokes), len(admissible_jokes))
         
+        self._display_cache_stats()
+        self._write_usage_report()
+        
         return top_jokes
     
     def _load_jokes(self, jokes_file_path: str) -> List:
@@ -154,13 +198,68 @@ class JokeJudgeSystem:
     async def _run_rating_phase(self, jokes: List, batch_size: int) -> List[RatingResult]:
         """Run batch rating evaluation"""
         processor = BatchProcessor(self.rating_judge, batch_size)
-        return await processor.process_all_jokes(jokes)
+        results = await processor.process_all_jokes(jokes)
+        if self.rating_judge.prefilter is not None:
+            self.rating_judge.prefilter.print_summary(calls_per_joke=1 if self.combined_admissibility else 5)
+        return results
+    
+    async def _rerate_with_reasoning(self, top_jokes: List[RatingResult], batch_size: int) -> List[RatingResult]:
+        """Lean mode: rate the top jokes again with the full judge (reasoning included) and re-rank them"""
+        if self.full_rating_judge is None:
+            self.full_rating_judge = RatingJudge(
+                client=self.client,
+                categories=self.categories,
+                category_factors=self.category_factors,
+                examples=self.examples,
+                category_info_list=self.category_info_list,
+                max_retries=self.max_retries,
+                lm=self.rating_lm,
+                seed=self.seed,
+                combined_admissibility=self.combined_admissibility
+            )
+        print(f"\nLean mode: re-rating the top {len(top_jokes)} jokes with reasoning")
+        jokes = [JokeData(id=rating.joke_id, text=rating.joke_text) for rating in top_jokes]
+        # The tournament waits on these few calls, serve them ahead of other jobs' bulk rating
+        with llm_priority("final"):
+            rerated = await BatchProcessor(self.full_rating_judge, batch_size).process_all_jokes(jokes)
+        admissible = [r for r in rerated if r.admissibility_results.is_admissible]
+        if not admissible:
+            print("\033[93mNo top joke passed the full admissibility checks, keeping the lean ratings\033[0m")
+            return top_jokes
+        if len(admissible) < len(rerated):
+            print(f"\033[93m{len(rerated) - len(admissible)} top jokes failed the full admissibility checks\033[0m")
+        return sorted(admissible, key=lambda x: x.overall_rating, reverse=True)
     
     async def _run_tournament_phase(self, top_jokes: List[RatingResult]):
         """Run tournament with lives and bye system"""
         manager = TournamentManager(self.duel_judge)
         return await manager.run_tournament(top_jokes)
     
+    def _start_usage_window(self):
+        if self.shared_client:
+            self.usage_baseline = self.client.usage_report()
+    
+    def _write_usage_report(self):
+        """run_usage.json of this judge run only, even when the client also served generation"""
+        self.client.write_usage_report(self.output_dir, since=self.usage_baseline)
+    
+    def _display_cache_stats(self):
+        """Print per-stage LLM response cache hits/misses and coalesced duplicates"""
+        stats = self.client.cache_stats()
+        coalesced = self.client.single_flight.stats()
+        if not stats:
+            return
+        print(f"\nLLM response cache:")
+        for stage, counters in sorted(stats.items()):
+            total = counters['hits'] + counters['misses']
+            hit_rate = (counters['hits'] / total * 100) if total else 0.0
+            print(f"   {stage}: {counters['hits']} hits / {counters['misses']} misses ({hit_rate:.0f}% hit rate), "
+                  f"{coalesced.get(stage, 0)} coalesced")
+        if self.client.hedge is not None:
+            hedging = self.client.hedge.stats()
+            print(f"   hedged: {hedging['hedged']} of {hedging['calls']} calls, "
+                  f"{hedging['secondary_wins']} won by the secondary backend")
+    
     async def _log_rating_results(self, all_ratings: List[RatingResult]):
         """Log rating results progressively"""
         if self.logger:
@@ -1,4 +1,4 @@
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Literal, Optional, Tuple
 from pydantic import BaseModel
 
 class CategoryInfo(BaseModel):
@@ -52,6 +52,12 @@ class AdmissibilityResults(BaseModel):
     accessibility_check: AdmissibilityCheck
     is_admissible: bool
 
+class PrefilterDecision(BaseModel):
+    verdict: Literal["pass", "fail", "ambiguous"]  # ambiguous = ask the LLM admissibility checks
+    failed_check: Optional[str] = None  # Admissibility check a clear failure is attributed to
+    reason: str
+    signals: Dict[str, float]
+
 class RatingResult(BaseModel):
     joke_id: int
     joke_text: str
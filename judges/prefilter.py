@@ -0,0 +1,293 @@
+"""Local heuristic prefilter ahead of the LLM admissibility checks
+
+Cheap CPU-only signals sort each joke into one of three verdicts:
+- fail: clearly inadmissible (empty, truncated mid-sentence, gibberish, or a
+  blocklisted call to hate/violence), rejected without an LLM call
+- pass: plainly well-formed joke prose, sent straight to categorization
+- ambiguous: everything else, checked by the AdmissibilityChecker as usual
+
+Both clear verdicts are deliberately narrow, so the LLM checks still decide
+anything borderline. Run `python -m judges.prefilter [rating_results.xml ...]`
+to measure the verdicts against the LLM decisions stored in judge logs.
+"""
+
+import argparse
+import glob
+import math
+import re
+import sys
+import threading
+import unicodedata
+import xml.etree.ElementTree as ET
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from judges.models import AdmissibilityCheck, AdmissibilityResults, PrefilterDecision
+
+
+MIN_WORDS = 4  # Shorter texts are left to the LLM
+MAX_WORDS = 80
+MIN_LETTER_SHARE = 0.6  # Below this the text is mostly digits/symbols
+# Shannon entropy (bits) over character classes; joke prose sits between these
+MIN_CLASS_ENTROPY = 0.7
+MAX_CLASS_ENTROPY = 1.9
+MIN_WORDLIKE_RATIO = 0.9  # Clear pass
+MAX_GIBBERISH_WORDLIKE_RATIO = 0.5  # Clear fail
+MIN_FUNCTION_WORD_RATIO = 0.15  # Clear pass: real sentences carry articles, pronouns, prepositions
+
+# Common English function words, standing in for a dictionary (no system word list is assumed)
+FUNCTION_WORDS = frozenset("""
+a an the this that these those some any every each no all both either neither
+i me my mine we us our ours you your yours he him his she her hers it its they them their theirs
+myself yourself himself herself itself ourselves themselves one ones someone something anyone anything
+everyone everything nobody nothing who whom whose which what where when why how whatever whenever
+is am are was were be been being do does did done have has had having
+can could will would shall should may might must ought
+and or but nor so yet for because if then than though although unless until while since as
+of in on at to from by with about into onto over under after before between through during without
+within against among around up down out off away back again just only also too very not never
+there here now still even more most less much many such own same other another
+don't doesn't didn't can't won't isn't aren't wasn't weren't it's that's there's i'm you're they're
+we're he's she's let's what's who's i'll you'll i've you've i'd you'd
+""".split())
+# Words a sentence cannot end on; a text ending on one without punctuation was cut off
+CONNECTORS = frozenset("""
+a an the and or but nor so because if than that which who whom whose when while as of in on at to
+from by with about into onto over under after before between through without my your his her its our
+their is are was were be been has have had do does did can could will would should may might must
+very more most some any every each no not
+""".split())
+TERMINAL_PUNCTUATION = ".!?…\"'”’)*"
+# Calls for violence or elimination aimed at groups of people, and dehumanizing phrases; no slurs are
+# listed, so this catches only the blatant cases and the LLM still judges everything else. Verbs with
+# harmless idiomatic uses ("die laughing", "killed it", "eliminated in the semifinal") are left out.
+_GROUPS = (r"(people|race|races|immigrants|refugees|foreigners|minorities|women|men|jews|muslims|christians|"
+           r"gays|blacks|whites|asians)")
+BLOCKLIST = [re.compile(pattern, re.IGNORECASE) for pattern in (
+    rf"\b{_GROUPS}\b[^.!?]{{0,40}}\b(should|must|need to|deserve to|ought to)\s+(all\s+)?(be\s+)?"
+    r"(exterminated|wiped out|gassed|lynched|eradicated|purged"
+    r"|eliminated from (society|the (country|earth|planet)))\b",
+    rf"\b(exterminate|gas|lynch|eradicate)\s+all\s+(the\s+)?(\w+\s+)?{_GROUPS}\b",
+    r"\bethnic\s+cleansing\b",
+    r"\b(inferior|subhuman|sub-human)\s+(race|races|people)\b",
+)]
+
+_TOKEN = re.compile(r"[^\W_]+(?:['’\-][^\W_]+)*")
+_SENTENCE_END = re.compile(r"[.!?…]+[\"'”’)]*(\s+|$)")
+_CONSONANT_RUN = re.compile(r"[bcdfghjklmnpqrstvwxz]{5,}")
+
+
+def _char_class(char: str) -> str:
+    if char.islower():
+        return "lower"
+    if char.isupper():
+        return "upper"
+    if char.isdigit():
+        return "digit"
+    if char.isspace():
+        return "space"
+    if char in ".,;:!?'\"-—–()…’”“":
+        return "punct"
+    return "other"
+
+
+def class_entropy(text: str) -> float:
+    """Shannon entropy in bits of the character-class distribution of a text"""
+    counts = Counter(_char_class(char) for char in text)
+    total = sum(counts.values())
+    return -sum(count / total * math.log2(count / total) for count in counts.values()) if total else 0.0
+
+
+def is_wordlike(token: str) -> bool:
+    """A token shaped like an English word, number or acronym: has a vowel (or y) and no long consonant run"""
+    word = unicodedata.normalize("NFKD", token.lower().strip("'’-")).encode("ascii", "ignore").decode()
+    if not word or word in FUNCTION_WORDS or word.isdigit():
+        return True
+    if token.isupper() and len(token) <= 5:
+        return True  # Acronyms: TCP, SQL
+    letters = re.sub(r"[^a-z]", "", word)
+    if not letters:
+        return False
+    return bool(re.search(r"[aeiouy]", letters)) and not _CONSONANT_RUN.search(letters) and len(letters) <= 20
+
+
+def text_signals(text: str) -> Dict[str, float]:
+    """Every heuristic signal of a joke text, as used by AdmissibilityPrefilter.screen"""
+    stripped = text.strip()
+    tokens = _TOKEN.findall(stripped)
+    non_space = [char for char in stripped if not char.isspace()]
+    words = len(tokens)
+    last = tokens[-1].lower() if tokens else ""
+    sentences = [s for s in _SENTENCE_END.split(stripped) if s and s.strip()]
+    return {
+        "words": float(words),
+        "letter_share": sum(char.isalpha() for char in non_space) / len(non_space) if non_space else 0.0,
+        "class_entropy": class_entropy(stripped),
+        "wordlike_ratio": sum(is_wordlike(token) for token in tokens) / words if words else 0.0,
+        "function_word_ratio": sum(token.lower() in FUNCTION_WORDS for token in tokens) / words if words else 0.0,
+        "terminal_punctuation": float(stripped.endswith(tuple(TERMINAL_PUNCTUATION))),
+        "truncated": float(bool(tokens) and not stripped.endswith(tuple(TERMINAL_PUNCTUATION))
+                           and last in CONNECTORS),
+        "sentences": float(len(sentences)),
+        # Setup/punchline shape: a question followed by more text, a dash/colon split, or an exclamation
+        "joke_structure": float(bool(re.search(r"\?\s*\S", stripped) or re.search(r"\s[-—–]\s|:\s", stripped)
+                                     or "!" in stripped or len(sentences) >= 2)),
+        "blocklisted": float(any(pattern.search(stripped) for pattern in BLOCKLIST)),
+    }
+
+
+class AdmissibilityPrefilter:
+    """Heuristic verdicts on joke texts, with a running count of verdicts for the run"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts: Counter = Counter()
+
+    def screen(self, joke_text: str) -> PrefilterDecision:
+        """Verdict on one joke: a clear pass or fail, or ambiguous (ask the LLM)"""
+        signals = text_signals(joke_text)
+        decision = self._decide(signals)
+        with self._lock:
+            self.counts[decision.verdict] += 1
+        return decision
+
+    @staticmethod
+    def _decide(signals: Dict[str, float]) -> PrefilterDecision:
+        def verdict(kind: str, reason: str, failed_check: Optional[str] = None) -> PrefilterDecision:
+            return PrefilterDecision(verdict=kind, failed_check=failed_check, reason=reason, signals=signals)
+
+        words = signals["words"]
+        # Clear failures
+        if words == 0:
+            return verdict("fail", "empty text", "completeness")
+        if signals["blocklisted"]:
+            return verdict("fail", "matches the hate/violence blocklist", "appropriateness")
+        if signals["truncated"]:
+            return verdict("fail", "ends mid-sentence without punctuation", "completeness")
+        if words >= 3 and (signals["wordlike_ratio"] <= MAX_GIBBERISH_WORDLIKE_RATIO
+                           or signals["letter_share"] < MIN_LETTER_SHARE / 2):
+            return verdict("fail", f"mostly non-words ({signals['wordlike_ratio']:.0%} word-like)", "accessibility")
+        # Clear pass: every signal inside the range of ordinary joke prose
+        checks = (
+            (MIN_WORDS <= words <= MAX_WORDS, f"{words:.0f} words"),
+            (signals["letter_share"] >= MIN_LETTER_SHARE, "low letter share"),
+            (MIN_CLASS_ENTROPY <= signals["class_entropy"] <= MAX_CLASS_ENTROPY, "unusual character mix"),
+            (signals["wordlike_ratio"] >= MIN_WORDLIKE_RATIO, "some non-words"),
+            (signals["function_word_ratio"] >= MIN_FUNCTION_WORD_RATIO, "few function words"),
+            (bool(signals["terminal_punctuation"]), "no terminal punctuation"),
+            (bool(signals["joke_structure"]), "no setup/punchline shape"),
+        )
+        misses = [reason for ok, reason in checks if not ok]
+        if misses:
+            return verdict("ambiguous", ", ".join(misses))
+        return verdict("pass", "well-formed joke prose")
+
+    def results(self, decision: PrefilterDecision) -> Optional[AdmissibilityResults]:
+        """AdmissibilityResults for a clear verdict, None when the LLM checks must decide"""
+        if decision.verdict == "ambiguous":
+            return None
+        checks = {}
+        for check_type in ("intent", "completeness", "appropriateness", "coherence", "accessibility"):
+            if decision.verdict == "pass":
+                checks[check_type] = AdmissibilityCheck(passed=True, reasoning=f"Prefilter: {decision.reason}")
+            elif check_type == decision.failed_check:
+                checks[check_type] = AdmissibilityCheck(passed=False, reasoning=f"Prefilter: {decision.reason}")
+            else:
+                checks[check_type] = AdmissibilityCheck(passed=True, reasoning="Prefilter: not checked")
+        return AdmissibilityResults(**{f"{check_type}_check": check for check_type, check in checks.items()},
+                                    is_admissible=decision.verdict == "pass")
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return {verdict: self.counts[verdict] for verdict in ("pass", "fail", "ambiguous")}
+
+    def print_summary(self, calls_per_joke: int = 5):
+        """Verdict counts and the admissibility LLM calls they saved"""
+        counts = self.snapshot()
+        decided = counts["pass"] + counts["fail"]
+        if not sum(counts.values()):
+            return
+        print(f"\033[96mPrefilter: {counts['pass']} clear pass, {counts['fail']} clear fail, "
+              f"{counts['ambiguous']} sent to the LLM checks "
+              f"({decided * calls_per_joke} admissibility calls saved)\033[0m")
+
+
+def load_logged_decisions(paths: List[str]) -> List[Tuple[str, bool]]:
+    """(joke text, LLM admissibility verdict) pairs from rating_results.xml logs"""
+    decisions = []
+    for path in paths:
+        try:
+            root = ET.parse(path).getroot()
+        except (OSError, ET.ParseError) as e:
+            print(f"\033[93mSkipping {path}: {e}\033[0m")
+            continue
+        for joke in root.iter("joke"):
+            admissibility = joke.find("admissibility")
+            if admissibility is None:
+                continue
+            decisions.append((joke.findtext("text") or "", admissibility.get("overall") == "True"))
+    return decisions
+
+
+def rubric_examples() -> List[Tuple[str, bool]]:
+    """(joke text, expected verdict) pairs from the PASS/FAIL examples of the admissibility checks"""
+    from judges.admissibility_checker import ADMISSIBILITY_CHECKS
+    examples = []
+    for _, check_examples in ADMISSIBILITY_CHECKS.values():
+        for label, text in re.findall(r'^(PASS|FAIL) \([^)]*\): "(.*)" - ', check_examples, re.MULTILINE):
+            examples.append((text, label == "PASS"))
+    return examples
+
+
+def evaluate(decisions: List[Tuple[str, bool]], show_misses: bool = False) -> Dict[str, int]:
+    """Confusion counts of prefilter verdict against the logged LLM verdict, printed with precision/recall"""
+    prefilter = AdmissibilityPrefilter()
+    table = Counter()
+    for text, admissible in decisions:
+        decision = prefilter.screen(text)
+        table[(admissible, decision.verdict)] += 1
+        if show_misses and decision.verdict != "ambiguous" and (decision.verdict == "pass") != admissible:
+            print(f"\033[91m  {decision.verdict}: {text!r} ({decision.reason})\033[0m")
+
+    def ratio(numerator: int, denominator: int) -> str:
+        return f"{numerator / denominator:.1%}" if denominator else "n/a"
+
+    positives = sum(count for (admissible, _), count in table.items() if admissible)
+    negatives = len(decisions) - positives
+    passed = table[(True, "pass")] + table[(False, "pass")]
+    failed = table[(True, "fail")] + table[(False, "fail")]
+    print(f"{'LLM verdict':<14}{'pass':>8}{'ambiguous':>11}{'fail':>8}")
+    for admissible, label in ((True, "admissible"), (False, "inadmissible")):
+        print(f"{label:<14}" + "".join(f"{table[(admissible, verdict)]:>{width}}"
+                                      for verdict, width in (("pass", 8), ("ambiguous", 11), ("fail", 8))))
+    print(f"Coverage (decided locally): {ratio(passed + failed, len(decisions))} of {len(decisions)} jokes")
+    print(f"Pass precision {ratio(table[(True, 'pass')], passed)}, recall {ratio(table[(True, 'pass')], positives)}")
+    print(f"Fail precision {ratio(table[(False, 'fail')], failed)}, recall {ratio(table[(False, 'fail')], negatives)}")
+    print(f"Admissibility LLM calls saved: {(passed + failed) * 5} of {len(decisions) * 5} "
+          f"({passed + failed} with combined checks)")
+    return {f"{'admissible' if admissible else 'inadmissible'}/{verdict}": count
+            for (admissible, verdict), count in table.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the admissibility prefilter against logged LLM verdicts")
+    parser.add_argument('paths', nargs='*', help='rating_results.xml files (default: logs/*/rating_results.xml)')
+    parser.add_argument('--show-misses', action='store_true',
+                        help='Print the jokes whose clear verdict disagrees with the LLM')
+    parser.add_argument('--with-examples', action='store_true',
+                        help='Also score the PASS/FAIL examples of the admissibility checks, which include '
+                             'inadmissible jokes the logs may lack')
+    args = parser.parse_args()
+    paths = args.paths or sorted(glob.glob("logs/*/rating_results.xml"))
+    decisions = load_logged_decisions(paths)
+    if args.with_examples:
+        decisions += rubric_examples()
+    if not decisions:
+        print("\033[91mNo logged admissibility verdicts found\033[0m")
+        sys.exit(1)
+    print(f"Logged verdicts from {len(paths)} file(s)")
+    evaluate(decisions, show_misses=args.show_misses)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,17 @@
 import asyncio
 import time
-from typing import List, Dict
+from typing import List, Dict, Optional
+import dspy
 from datetime import datetime
 
 from utilities.dspy_client import ClaudeClient
+from utilities.permutations import DEFAULT_SEED
 from judges.models import (
     RatingResult, CategoryInfo, CategoryFactor, 
     ExampleData, JokeData
 )
 from judges.admissibility_checker import AdmissibilityChecker
+from judges.prefilter import AdmissibilityPrefilter
 from judges.category_classifier import CategoryClassifier
 from judges.factor_selector import FactorSelector
 from judges.factor_scorer import FactorScorer
@@ -24,20 +27,36 @@ class RatingJudge:
                  category_factors: Dict[str, CategoryFactor],
                  examples: ExampleData,
                  category_info_list: List[CategoryInfo],
-                 max_retries: int = 5):
-        """Initialize rating judge with parsed XML data"""
+                 max_retries: int = 5,
+                 lm: Optional[dspy.BaseLM] = None,
+                 lean: bool = False,
+                 seed: int = DEFAULT_SEED,
+                 combined_admissibility: bool = False,
+                 prefilter: bool = False):
+        """Initialize rating judge with parsed XML data; lm = LM handle for every rating call.
+        
+        lean=True uses the reasoning-free signature variants with small output budgets; seed fixes
+        the category and factor orders shown for each joke (utilities.permutations);
+        combined_admissibility=True runs the five admissibility checks as one LLM call; prefilter=True
+        settles clearly (in)admissible jokes with local heuristics (judges.prefilter) before any LLM check.
+        """
         self.client = client
         self.categories = categories
         self.category_factors = category_factors
         self.examples = examples
         self.category_info_list = category_info_list
         self.max_retries = max_retries
+        self.lean = lean
+        
+        self.prefilter = AdmissibilityPrefilter() if prefilter else None
         
         # Initialize specialized components
-        self.admissibility_checker = AdmissibilityChecker(client, max_retries)
-        self.category_classifier = CategoryClassifier(client, category_info_list, max_retries)
-        self.factor_selector = FactorSelector(client, category_factors, max_retries)
-        self.factor_scorer = FactorScorer(client, max_retries)
+        self.admissibility_checker = AdmissibilityChecker(client, max_retries, lm=lm, lean=lean,
+                                                          combined=combined_admissibility, prefilter=self.prefilter)
+        self.category_classifier = CategoryClassifier(client, category_info_list, max_retries, lm=lm, lean=lean,
+                                                      seed=seed)
+        self.factor_selector = FactorSelector(client, category_factors, max_retries, lm=lm, lean=lean, seed=seed)
+        self.factor_scorer = FactorScorer(client, max_retries, lm=lm, lean=lean)
     
     def evaluate_joke(self, joke: JokeData) -> RatingResult:
         """Synchronous wrapper for async evaluation"""
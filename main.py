@@ -7,6 +7,9 @@ from datetime import datetime
 from pathlib import Path
 from typing import Dict, Optional, Tuple
 from utilities.dspy_client import ClaudeClient
+from utilities.hedging import HedgePolicy
+from utilities.llm_scheduler import DEFAULT_JOB_WEIGHT, llm_job
+from utilities.permutations import DEFAULT_SEED
 from utilities.xml_logger import XMLLogger
 from utilities.generator_utils import ensure_directory_exists
 from generator.topic_processor import process_user_input
@@ -21,15 +24,24 @@ from judges.cli import evaluate_jokes_programmatic
 def run_complete_generation_and_judging(topic_input: str = None, first_order_only: bool = False,
                                       generation_only: bool = False, output_dir: str = "output/",
                                       batch_size: int = 5, retries: int = 3, 
-                                      bypass_cache: bool = False, jokespace_size: str = 'medium') -> Dict:
+                                      bypass_cache: bool = False, jokespace_size: str = 'medium',
+                                      hedge: bool = False, backend_lm=None, stream: bool = False,
+                                      keep_reasoning: bool = False, tiers: Optional[Dict] = None,
+                                      recorder=None, structured_output: bool = False, lean: bool = False,
+                                      seed: int = DEFAULT_SEED, scheduler=None,
+                                      job_weight: float = DEFAULT_JOB_WEIGHT,
+                                      combined_admissibility: bool = False, prefilter: bool = False) -> Dict:
     """Main orchestration function"""
     
     # Validate jokespace_size
     if jokespace_size not in ['small', 'medium', 'large']:
         raise ValueError(f"Invalid jokespace size: {jokespace_size}")
     
-    # Create client with cache setting
-    client = ClaudeClient(cache=not bypass_cache)
+    # Create the one client for the whole run (generation and judging). Its health
+    # probe runs in the background while topics are processed.
+    client = ClaudeClient(cache=not bypass_cache, hedge=HedgePolicy() if hedge else None, backend_lm=backend_lm,
+                          stream=stream, keep_reasoning=keep_reasoning, tiers=tiers, recorder=recorder,
+                          structured_output=structured_output, scheduler=scheduler)
     
     # Process topics
     topic_set = process_user_input(topic_input)
@@ -39,34 +51,43 @@ def run_complete_generation_and_judging(topic_input: str = None, first_order_onl
     log_dir = create_timestamped_log_directory()
     print(f"Log directory: {log_dir}")
     
-    # Run generation pipeline
-    portfolio = asyncio.run(execute_generation_pipeline(
-        topic_set, client, first_order_only, log_dir, output_dir, batch_size, retries, jokespace_size
-    ))
-    
-    # Format output
-    output_file = format_jokes_to_xml(portfolio, "generated_jokes.xml", output_dir)
-    
-    results = {
-        'total_jokes': len(portfolio),
-        'output_file': output_file,
-        'log_dir': log_dir,
-        'topics': list(topic_set),
-        'jokespace_size': jokespace_size
-    }
-    
-    # Run judge system if not generation-only
-    if not generation_only:
-        judge_results = asyncio.run(integrate_with_judge_system(
-            output_file, len(portfolio), batch_size, retries, bypass_cache
+    # Generation and judging form one job of the process-wide LLM scheduler, sharing its slots
+    # fairly with other runs in the process
+    with llm_job(f"generate:{','.join(sorted(topic_set))}", job_weight):
+        # Run generation pipeline
+        portfolio = asyncio.run(execute_generation_pipeline(
+            topic_set, client, first_order_only, log_dir, output_dir, batch_size, retries, jokespace_size
         ))
-        results.update(judge_results)
         
-        # Get winner joke text from portfolio
-        if 'winner_id' in judge_results and judge_results['winner_id']:
-            winner_joke = portfolio.get_joke_by_id(judge_results['winner_id'])
-            if winner_joke:
-                results['winner_text'] = winner_joke.text
+        # Format output
+        output_file = format_jokes_to_xml(portfolio, "generated_jokes.xml", output_dir)
+        
+        results = {
+            'total_jokes': len(portfolio),
+            'output_file': output_file,
+            'log_dir': log_dir,
+            'topics': list(topic_set),
+            'jokespace_size': jokespace_size
+        }
+        
+        # Run judge system if not generation-only
+        if not generation_only:
+            judge_results = asyncio.run(integrate_with_judge_system(
+                output_file, len(portfolio), batch_size, retries, bypass_cache, client, lean, seed,
+                combined_admissibility, prefilter
+            ))
+            results.update(judge_results)
+        
+            # Get winner joke text from portfolio
+            if 'winner_id' in judge_results and judge_results['winner_id']:
+                winner_joke = portfolio.get_joke_by_id(judge_results['winner_id'])
+                if winner_joke:
+                    results['winner_text'] = winner_joke.text
+    
+    # Tokens, cost and latency per stage for the whole run, next to the generator logs
+    results['usage_file'] = client.write_usage_report(log_dir)
+    if recorder is not None:
+        recorder.close()
     
     return results
 
@@ -110,7 +131,10 @@ async def execute_generation_pipeline(topic_set: set, client: ClaudeClient, firs
 
 
 async def integrate_with_judge_system(xml_output_file: str, joke_count: int, batch_size: int, 
-                                    retries: int, bypass_cache: bool) -> Dict:
+                                    retries: int, bypass_cache: bool,
+                                    client: Optional[ClaudeClient] = None, lean: bool = False,
+                                    seed: int = DEFAULT_SEED, combined_admissibility: bool = False,
+                                    prefilter: bool = False) -> Dict:
     """Call judge system using the programmatic interface"""
     
     # Adjust parameters based on joke count
@@ -128,7 +152,12 @@ async def integrate_with_judge_system(xml_output_file: str, joke_count: int, bat
             top_count=adjusted_top_count,
             bypass_cache=bypass_cache,
             rating_only=False,  # We want the full tournament
-            retries=retries
+            retries=retries,
+            client=client,  # Reuse the generation client: no second probe or DSPy configuration
+            lean=lean,
+            seed=seed,
+            combined_admissibility=combined_admissibility,
+            prefilter=prefilter
         )
         
         if result is None:
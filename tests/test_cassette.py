@@ -0,0 +1,45 @@
+"""Order-independent request matching of replay cassettes (utilities/cassette.py)"""
+
+from judges.dspy_signatures import CategoryAssignmentSignature, FactorScoringSignature
+from judges.models import CategoryInfo
+from utilities.cassette import request_inputs
+from utilities.lm_response import current_request
+
+CATEGORIES = [CategoryInfo(name="Puns", description="Wordplay, e.g. 'bear with me'", example1="A", example2=""),
+              CategoryInfo(name="Workplace", description="Office life, meetings", example1="B", example2=""),
+              CategoryInfo(name="Animals", description="Cats, dogs", example1="C", example2="")]
+
+
+def inputs_key(signature, **inputs) -> str:
+    token = current_request.set((signature, inputs))
+    try:
+        return request_inputs("prompt", [])
+    finally:
+        current_request.reset(token)
+
+
+def test_shuffled_lists_match():
+    key = inputs_key(CategoryAssignmentSignature, joke_text="Why did the cat sit on the laptop?",
+                     available_categories=CATEGORIES)
+    assert key == inputs_key(CategoryAssignmentSignature, joke_text="Why did the cat sit on the laptop?",
+                             available_categories=CATEGORIES[::-1])
+
+
+def test_shuffled_rendered_lists_match():
+    key = inputs_key(CategoryAssignmentSignature, joke_text="Why did the cat sit on the laptop?",
+                     available_categories=str(CATEGORIES))
+    assert key == inputs_key(CategoryAssignmentSignature, joke_text="Why did the cat sit on the laptop?",
+                             available_categories=str(CATEGORIES[1:] + CATEGORIES[:1]))
+
+
+def test_anagram_inputs_do_not_match():
+    assert inputs_key(FactorScoringSignature, joke_text="Dormitory") != inputs_key(FactorScoringSignature,
+                                                                                  joke_text="Dirty room")
+    assert (inputs_key(FactorScoringSignature, joke_text="The cat ate a rat.")
+            != inputs_key(FactorScoringSignature, joke_text="The rat ate a cat."))
+    assert (inputs_key(CategoryAssignmentSignature, joke_text="x", available_categories=["listen", "tea"])
+            != inputs_key(CategoryAssignmentSignature, joke_text="x", available_categories=["silent", "eat"]))
+
+
+def test_different_signatures_do_not_match():
+    assert inputs_key(FactorScoringSignature, joke_text="x") != inputs_key(CategoryAssignmentSignature, joke_text="x")
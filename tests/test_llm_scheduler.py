@@ -0,0 +1,125 @@
+"""Priority classes and weighted fair queuing of LLM calls (utilities/llm_scheduler.py)"""
+
+import asyncio
+import contextlib
+from typing import List, Optional
+
+import pytest
+
+from utilities.llm_scheduler import LLMScheduler, current_job, llm_job, llm_priority, request_priority
+from utilities.usage_tracker import current_stage
+
+
+async def served_order(requests: List[tuple], scheduler: Optional[LLMScheduler] = None) -> List[str]:
+    """Names of (name, job, weight, priority, stage) requests in the order one slot serves them.
+
+    All requests queue behind a held slot before it is released, so the order
+    comes from the scheduler alone.
+    """
+    scheduler = scheduler or LLMScheduler(max_concurrent=1)
+    order = []
+
+    async def request(name: str):
+        async with scheduler.slot():
+            order.append(name)
+
+    await scheduler.acquire()
+    tasks = []
+    for name, job, weight, priority, stage in requests:
+        token = current_stage.set(stage or "default")
+        with llm_job(job, weight) if job else contextlib.nullcontext():
+            with llm_priority(priority) if priority else contextlib.nullcontext():
+                tasks.append(asyncio.create_task(request(name)))
+        current_stage.reset(token)
+        await asyncio.sleep(0)  # Queue in this order
+    scheduler.release()
+    await asyncio.gather(*tasks)
+    return order
+
+
+def test_priority_classes_before_arrival_order():
+    order = asyncio.run(served_order([
+        ("bulk", None, 1.0, "bulk", None),
+        ("normal", None, 1.0, None, None),
+        ("final", None, 1.0, "final", None),
+    ]))
+    assert order == ["final", "normal", "bulk"]
+
+
+def test_stage_default_priority():
+    order = asyncio.run(served_order([
+        ("rating", None, 1.0, None, "rating"),
+        ("generation", None, 1.0, None, "generation"),
+        ("duel", None, 1.0, None, "duel"),
+    ]))
+    assert order == ["duel", "generation", "rating"]
+
+
+def test_explicit_priority_overrides_stage():
+    token = current_stage.set("rating")
+    try:
+        assert request_priority() == "bulk"
+        with llm_priority("final"):
+            assert request_priority() == "final"
+    finally:
+        current_stage.reset(token)
+    with pytest.raises(ValueError):
+        with llm_priority("urgent"):
+            pass
+
+
+def test_one_job_is_first_in_first_out():
+    requests = [(f"a{i}", "a", 1.0, None, None) for i in range(5)]
+    assert asyncio.run(served_order(requests)) == ["a0", "a1", "a2", "a3", "a4"]
+
+
+def test_equal_weights_interleave_jobs():
+    requests = ([(f"big{i}", "big", 1.0, None, None) for i in range(6)]
+                + [(f"small{i}", "small", 1.0, None, None) for i in range(2)])
+    order = asyncio.run(served_order(requests))
+    assert order == ["big0", "small0", "big1", "small1", "big2", "big3", "big4", "big5"]
+
+
+def test_weights_set_the_share():
+    requests = ([(f"a{i}", "a", 1.0, None, None) for i in range(3)]
+                + [(f"b{i}", "b", 4.0, None, None) for i in range(8)])
+    order = asyncio.run(served_order(requests))
+    # Four of b's requests per one of a's, ties going to the earlier arrival
+    assert order == ["b0", "b1", "b2", "a0", "b3", "b4", "b5", "b6", "a1", "b7", "a2"]
+
+
+def test_priority_outranks_fair_share():
+    requests = ([(f"bulk{i}", "bulk_job", 10.0, "bulk", None) for i in range(3)]
+                + [("duel", "small_job", 0.1, "final", None)])
+    assert asyncio.run(served_order(requests))[0] == "duel"
+
+
+def test_nested_job_keeps_outer_job():
+    with llm_job("pipeline", 2.0):
+        with llm_job("judge"):
+            assert current_job.get() == ("pipeline", 2.0)
+
+
+def test_cancelled_waiter_is_skipped():
+    async def run():
+        scheduler = LLMScheduler(max_concurrent=1)
+        order = []
+
+        async def request(name: str):
+            async with scheduler.slot():
+                order.append(name)
+
+        await scheduler.acquire()
+        first = asyncio.create_task(request("first"))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(request("second"))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        scheduler.release()
+        await second
+        return order, scheduler.snapshot()
+
+    order, snapshot = asyncio.run(run())
+    assert order == ["second"]
+    assert snapshot["in_flight"] == 0 and snapshot["queued"] == 0
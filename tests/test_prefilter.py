@@ -0,0 +1,98 @@
+"""Heuristic admissibility prefilter (judges/prefilter.py): text signals and verdict boundaries"""
+
+import pytest
+
+from judges.prefilter import (MAX_CLASS_ENTROPY, MAX_GIBBERISH_WORDLIKE_RATIO, MAX_WORDS, MIN_CLASS_ENTROPY,
+                              MIN_FUNCTION_WORD_RATIO, MIN_LETTER_SHARE, MIN_WORDLIKE_RATIO, MIN_WORDS,
+                              AdmissibilityPrefilter, text_signals)
+
+# Signals of plain joke prose: every clear-pass check holds
+PROSE = {"words": 12.0, "letter_share": 0.95, "class_entropy": 1.3, "wordlike_ratio": 1.0,
+         "function_word_ratio": 0.4, "terminal_punctuation": 1.0, "truncated": 0.0, "sentences": 2.0,
+         "joke_structure": 1.0, "blocklisted": 0.0}
+
+
+def decide(**overrides) -> str:
+    return AdmissibilityPrefilter._decide({**PROSE, **overrides}).verdict
+
+
+def test_text_signals_of_joke_prose():
+    signals = text_signals("Why did the ant refuse to work? Because it was on its colony break!")
+    assert signals["words"] == 14
+    assert signals["wordlike_ratio"] == 1.0
+    assert signals["terminal_punctuation"] == 1.0
+    assert signals["joke_structure"] == 1.0
+    assert signals["truncated"] == 0.0
+    assert signals["blocklisted"] == 0.0
+    assert MIN_CLASS_ENTROPY <= signals["class_entropy"] <= MAX_CLASS_ENTROPY
+    assert signals["function_word_ratio"] >= MIN_FUNCTION_WORD_RATIO
+
+
+def test_text_signals_truncated_and_gibberish():
+    assert text_signals("The ant walked into a bar and")["truncated"] == 1.0
+    assert text_signals("The ant walked into a bar and.")["truncated"] == 0.0
+    assert text_signals("xkcdqz bvtrplm qwrtzk gh fjklp")["wordlike_ratio"] <= MAX_GIBBERISH_WORDLIKE_RATIO
+
+
+@pytest.mark.parametrize("text, verdict", [
+    ("Why did the ant refuse to work? Because it was on its colony break!", "pass"),
+    ("", "fail"),
+    ("   ", "fail"),
+    ("The ant walked into a bar and", "fail"),
+    ("xkcdqz bvtrplm qwrtzk gh fjklp.", "fail"),
+    ("Immigrants must be exterminated.", "fail"),
+    ("I told a pun so bad my friends wanted to die laughing.", "ambiguous"),
+    ("Ants.", "ambiguous"),
+])
+def test_screen(text, verdict):
+    assert AdmissibilityPrefilter().screen(text).verdict == verdict
+
+
+def test_clear_fail_reports_failed_check():
+    prefilter = AdmissibilityPrefilter()
+    decision = prefilter.screen("The ant walked into a bar and")
+    assert decision.failed_check == "completeness"
+    results = prefilter.results(decision)
+    assert not results.is_admissible and not results.completeness_check.passed and results.intent_check.passed
+    assert prefilter.results(prefilter.screen("Ants.")) is None
+
+
+def test_decide_prose_passes():
+    assert decide() == "pass"
+
+
+@pytest.mark.parametrize("signal, inside, outside", [
+    ("words", MIN_WORDS, MIN_WORDS - 1),
+    ("words", MAX_WORDS, MAX_WORDS + 1),
+    ("letter_share", MIN_LETTER_SHARE, MIN_LETTER_SHARE - 0.01),
+    ("class_entropy", MIN_CLASS_ENTROPY, MIN_CLASS_ENTROPY - 0.01),
+    ("class_entropy", MAX_CLASS_ENTROPY, MAX_CLASS_ENTROPY + 0.01),
+    ("wordlike_ratio", MIN_WORDLIKE_RATIO, MIN_WORDLIKE_RATIO - 0.01),
+    ("function_word_ratio", MIN_FUNCTION_WORD_RATIO, MIN_FUNCTION_WORD_RATIO - 0.01),
+    ("terminal_punctuation", 1.0, 0.0),
+    ("joke_structure", 1.0, 0.0),
+])
+def test_decide_clear_pass_boundary(signal, inside, outside):
+    assert decide(**{signal: inside}) == "pass"
+    assert decide(**{signal: outside}) == "ambiguous"
+
+
+def test_decide_gibberish_fail_boundary():
+    assert decide(wordlike_ratio=MAX_GIBBERISH_WORDLIKE_RATIO) == "fail"
+    assert decide(wordlike_ratio=MAX_GIBBERISH_WORDLIKE_RATIO + 0.01) == "ambiguous"
+    assert decide(letter_share=MIN_LETTER_SHARE / 2 - 0.01) == "fail"
+    assert decide(letter_share=MIN_LETTER_SHARE / 2) == "ambiguous"
+    # Fewer than three words are too little evidence of gibberish
+    assert decide(words=2.0, wordlike_ratio=0.0) == "ambiguous"
+    assert decide(words=3.0, wordlike_ratio=0.0) == "fail"
+
+
+@pytest.mark.parametrize("overrides, failed_check", [
+    ({"words": 0.0}, "completeness"),
+    ({"blocklisted": 1.0}, "appropriateness"),
+    ({"truncated": 1.0}, "completeness"),
+    ({"wordlike_ratio": 0.2}, "accessibility"),
+])
+def test_decide_clear_fail_checks(overrides, failed_check):
+    decision = AdmissibilityPrefilter._decide({**PROSE, **overrides})
+    assert decision.verdict == "fail" and decision.failed_check == failed_check
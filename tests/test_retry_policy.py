@@ -0,0 +1,155 @@
+"""Error classes, circuit breaker and retry policy (utilities/retry_policy.py)"""
+
+import asyncio
+
+import pytest
+
+from utilities.retry_policy import (FATAL, PARSE, THROTTLE, TRANSIENT, CircuitBreaker, RetryBudgetExceeded,
+                                    RetryPolicy, classify_error, is_outage_error)
+
+
+class ProviderError(Exception):
+    def __init__(self, message: str = "provider error", status_code: int = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class AuthenticationError(Exception):
+    pass
+
+
+@pytest.mark.parametrize("error, kind", [
+    (ProviderError(status_code=429), THROTTLE),
+    (ProviderError(status_code=529), THROTTLE),
+    (ProviderError("Rate limit reached"), THROTTLE),
+    (ProviderError(status_code=400), FATAL),
+    (ProviderError(status_code=401), FATAL),
+    (AuthenticationError("bad key"), FATAL),
+    (RetryBudgetExceeded("Run retry budget of 0 exhausted"), FATAL),
+    (ValueError("no score"), PARSE),
+    (KeyError("score"), PARSE),
+    (ProviderError(status_code=500), TRANSIENT),
+    (TimeoutError("timed out"), TRANSIENT),
+    (ConnectionError("reset"), TRANSIENT),
+])
+def test_classify_error(error, kind):
+    assert classify_error(error) == kind
+
+
+@pytest.mark.parametrize("error, outage", [
+    (ProviderError(status_code=500), True),
+    (ProviderError(status_code=529), True),
+    (ProviderError(status_code=429), False),
+    (ValueError("no score"), False),
+    (RetryBudgetExceeded("spent"), False),
+])
+def test_is_outage_error(error, outage):
+    assert is_outage_error(error, classify_error(error)) is outage
+
+
+def open_breaker(cooldown: float = 0.05) -> CircuitBreaker:
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=cooldown)
+    breaker.record_failure()
+    breaker.record_failure()
+    return breaker
+
+
+def test_breaker_opens_after_threshold():
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=60.0)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.times_opened == 0 and breaker._admit() == (0.0, False)
+    breaker.record_failure()
+    wait, probe = breaker._admit()
+    assert breaker.times_opened == 1 and wait > 59 and not probe
+
+
+def test_success_resets_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=60.0)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.times_opened == 0
+
+
+def test_half_open_lets_one_probe_through():
+    async def run():
+        breaker = open_breaker()
+        admitted = []
+
+        async def caller(name: str):
+            probe = await breaker.wait_until_closed()
+            admitted.append((name, probe))
+            if probe:
+                await asyncio.sleep(0.2)
+                admitted.append(("probe succeeded", None))
+                breaker.record_success()
+
+        await asyncio.gather(*(caller(f"caller{i}") for i in range(4)))
+        return admitted, breaker
+
+    admitted, breaker = asyncio.run(run())
+    assert [probe for _, probe in admitted[:1]] == [True]
+    assert admitted[1] == ("probe succeeded", None)
+    assert all(probe is False for _, probe in admitted[2:]) and len(admitted) == 5
+    assert not breaker.half_open and breaker.cooldown == breaker.base_cooldown
+
+
+def test_failed_probe_reopens_with_doubled_cooldown():
+    breaker = open_breaker()
+    assert breaker.wait_until_closed_blocking() is True
+    breaker.record_failure()
+    wait, probe = breaker._admit()
+    assert breaker.times_opened == 2 and 0.05 < wait <= 0.1 and not probe
+    assert breaker.cooldown == 0.2
+
+
+def test_probe_without_verdict_passes_the_probe_on():
+    breaker = open_breaker(cooldown=0.0)
+    assert breaker.wait_until_closed_blocking() is True
+    assert breaker._admit() == (CircuitBreaker.PROBE_POLL_INTERVAL, False)
+    breaker.end_probe()
+    assert breaker.wait_until_closed_blocking() is True
+    assert breaker.half_open
+
+
+def test_policy_does_not_retry_fatal_errors():
+    policy = RetryPolicy(max_retries=3, base_delay=0.0)
+    calls = []
+
+    def fail():
+        calls.append(1)
+        raise ProviderError(status_code=400)
+
+    with pytest.raises(ProviderError):
+        policy.call_blocking(fail)
+    assert len(calls) == 1 and policy.retries_used == 0
+
+
+def test_policy_budget_exhaustion_is_fatal_and_not_an_outage():
+    policy = RetryPolicy(max_retries=3, run_budget=1, base_delay=0.0,
+                         breaker=CircuitBreaker(failure_threshold=1, cooldown=60.0))
+    calls = []
+
+    async def inner():
+        calls.append(1)
+        raise ValueError("unparseable")
+
+    async def outer():
+        return await policy.call(inner, stage="rating")
+
+    with pytest.raises(RetryBudgetExceeded):
+        asyncio.run(policy.call(outer, max_retries=3, breaker=False))
+    assert len(calls) == 2 and policy.retries_used == 1
+    assert policy.breaker.times_opened == 0
+
+
+def test_policy_outside_breaker_does_not_open_it():
+    policy = RetryPolicy(max_retries=2, base_delay=0.0, breaker=CircuitBreaker(failure_threshold=1, cooldown=60.0))
+
+    async def broken():
+        raise RuntimeError("bug in rating code")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(policy.call(broken, breaker=False))
+    assert policy.breaker.times_opened == 0 and policy.retries_used == 2
@@ -0,0 +1,89 @@
+"""Local repair of near-miss LLM answers (utilities/structured_output.py)"""
+
+from typing import List, Literal
+
+import pytest
+
+from judges.dspy_signatures import (AdmissibilitySignature, CombinedAdmissibilitySignature,
+                                    DuelComparisonSignature, FactorScoringSignature)
+from utilities.structured_output import repair_completion, repair_value
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("True.", True),
+    ("**yes**", True),
+    ("PASS", True),
+    ("no issues, passes", True),
+    ("No problems found - passed", True),
+    ("false", False),
+    ("No", False),
+    ("No, the joke fails", False),
+    ("does not pass", False),
+    ("It doesn't pass the check", False),
+    ("not true", False),
+])
+def test_repair_value_bool(text, expected):
+    assert repair_value(text, bool) is expected
+
+
+def test_repair_value_bool_without_verdict():
+    with pytest.raises(ValueError):
+        repair_value("maybe", bool)
+
+
+@pytest.mark.parametrize("text, annotation, expected", [
+    ("4/5", int, 4),
+    ("Score: 4", int, 4),
+    ("3.6", int, 4),
+    ("`3.5`", float, 3.5),
+    ("Joke A", Literal["joke_a", "joke_b"], "joke_a"),
+    ("joke_b.", Literal["joke_a", "joke_b"], "joke_b"),
+    ('["wordplay", "timing",]', List[str], ["wordplay", "timing"]),
+    ('{"items": ["wordplay"]}', List[str], ["wordplay"]),
+    ("- wordplay\n- timing", List[str], ["wordplay", "timing"]),
+])
+def test_repair_value(text, annotation, expected):
+    assert repair_value(text, annotation) == expected
+
+
+@pytest.mark.parametrize("text, annotation", [
+    ("none", int),
+    ("either joke", Literal["joke_a", "joke_b"]),
+    ("joke a or joke b", Literal["joke_a", "joke_b"]),
+])
+def test_repair_value_hopeless(text, annotation):
+    with pytest.raises(ValueError):
+        repair_value(text, annotation)
+
+
+@pytest.mark.parametrize("completion", [
+    "## Reasoning\nClever pun.\n## Score\n4/5",
+    "**Reasoning:** Clever pun.\n**Score:** 4",
+    "Reasoning: Clever pun.\nScore: 4.",
+    '```json\n{"reasoning": "Clever pun.", "score": "4"}\n```',
+])
+def test_repair_completion_headers_and_json(completion):
+    assert repair_completion(FactorScoringSignature, completion) == {"reasoning": "Clever pun.", "score": 4}
+
+
+def test_repair_completion_fills_missing_reasoning():
+    assert repair_completion(AdmissibilitySignature, "[[ ## passed ## ]]\nno issues, passes") == {
+        "reasoning": "", "passed": True}
+
+
+def test_repair_completion_missing_decision():
+    assert repair_completion(AdmissibilitySignature, "Reasoning: looks fine") is None
+    assert repair_completion(DuelComparisonSignature, "Reasoning: close\nWinner: joke_a") is None
+
+
+def test_repair_completion_unreadable_decision():
+    assert repair_completion(DuelComparisonSignature,
+                             "Reasoning: close\nWinner: neither\nConfidence level: 2") is None
+
+
+def test_repair_completion_per_check_reasoning():
+    checks = ["intent", "completeness", "appropriateness", "coherence", "accessibility"]
+    completion = "\n".join(f"{check}_passed: {'false' if check == 'coherence' else 'true'}" for check in checks)
+    fields = repair_completion(CombinedAdmissibilitySignature, completion)
+    assert fields == {**{f"{check}_passed": check != "coherence" for check in checks},
+                      **{f"{check}_reasoning": "" for check in checks}}
@@ -0,0 +1,287 @@
+"""Bulk message-batch mode: collect LLM requests and submit them as one batch"""
+
+import asyncio
+import contextvars
+import itertools
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+import dspy
+
+from utilities.lm_response import completion_response
+from utilities.usage_tracker import current_stage
+
+
+# Stages of the rating phase; these are batched, everything else (duels, probes) stays live
+RATING_STAGES = ("admissibility", "categories", "factor_selection", "factor_scoring")
+
+# Anthropic limit is 100,000 requests per batch
+MAX_BATCH_REQUESTS = 10000
+
+
+class BatchRequestError(Exception):
+    """One request in a message batch failed; carries the provider's error type"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def to_anthropic_params(model: str, messages: List[dict], kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert DSPy's OpenAI-style chat request to Anthropic Messages API params"""
+    system = []
+    for message in messages:
+        if message.get("role") == "system":
+            content = message["content"]
+            # Keep content blocks as they are, so cache_control breakpoints survive
+            system.extend(content if isinstance(content, list) else [{"type": "text", "text": str(content)}])
+    params = {
+        "model": model.split("/", 1)[-1],  # Drop the "anthropic/" provider prefix
+        "max_tokens": kwargs.get("max_tokens", 4000),
+        "messages": [{"role": m["role"], "content": m["content"]} for m in messages if m.get("role") != "system"],
+    }
+    if system:
+        params["system"] = system
+    if kwargs.get("temperature") is not None:
+        params["temperature"] = kwargs["temperature"]
+    return params
+
+
+class AnthropicBatchBackend:
+    """Anthropic Message Batches API (half the price of live calls, results within 24h)"""
+
+    poll_interval = 15.0
+
+    def __init__(self, api_key: Optional[str] = None):
+        from anthropic import Anthropic
+        self.client = Anthropic(api_key=api_key)
+
+    def submit(self, requests: List[Tuple[str, Dict[str, Any], contextvars.Context]]) -> str:
+        batch = self.client.messages.batches.create(
+            requests=[{"custom_id": custom_id, "params": params} for custom_id, params, _ in requests]
+        )
+        return batch.id
+
+    def is_done(self, batch_id: str) -> bool:
+        return self.client.messages.batches.retrieve(batch_id).processing_status == "ended"
+
+    def results(self, batch_id: str) -> Dict[str, Any]:
+        """custom_id -> OpenAI-format response, or a BatchRequestError"""
+        results = {}
+        for entry in self.client.messages.batches.results(batch_id):
+            result = entry.result
+            if result.type == "succeeded":
+                message = result.message
+                text = "".join(block.text for block in message.content if getattr(block, "type", "") == "text")
+                cache_write = message.usage.cache_creation_input_tokens or 0
+                cache_read = message.usage.cache_read_input_tokens or 0
+                usage = {
+                    # Same convention as litellm: prompt tokens include cache writes and reads
+                    "prompt_tokens": message.usage.input_tokens + cache_write + cache_read,
+                    "completion_tokens": message.usage.output_tokens,
+                    "cache_creation_input_tokens": cache_write,
+                    "cache_read_input_tokens": cache_read,
+                }
+                results[entry.custom_id] = completion_response(text, usage, message.model)
+            elif result.type == "errored":
+                error = result.error.error
+                status = 429 if error.type == "rate_limit_error" else 529 if error.type == "overloaded_error" else 500
+                results[entry.custom_id] = BatchRequestError(f"Batch request failed: {error.message}", status)
+            else:
+                results[entry.custom_id] = BatchRequestError(f"Batch request {result.type}", 500)
+        return results
+
+
+class LocalBatchBackend:
+    """In-process stand-in for the batch endpoint, for tests and offline runs.
+
+    Requests are answered by `lm` (e.g. utilities.mock_lm.MockLM) in the
+    request's original context once `processing_delay` seconds have passed.
+    """
+
+    poll_interval = 0.2
+
+    def __init__(self, lm: dspy.BaseLM, processing_delay: float = 1.0):
+        self.lm = lm
+        self.processing_delay = processing_delay
+        self._lock = threading.Lock()
+        self._batches: Dict[str, Tuple[float, List[Tuple[str, Dict[str, Any], contextvars.Context]]]] = {}
+
+    def submit(self, requests: List[Tuple[str, Dict[str, Any], contextvars.Context]]) -> str:
+        batch_id = f"local_batch_{uuid.uuid4().hex[:12]}"
+        with self._lock:
+            self._batches[batch_id] = (time.monotonic(), list(requests))
+        return batch_id
+
+    def is_done(self, batch_id: str) -> bool:
+        with self._lock:
+            submitted_at, _ = self._batches[batch_id]
+        return time.monotonic() - submitted_at >= self.processing_delay
+
+    def results(self, batch_id: str) -> Dict[str, Any]:
+        with self._lock:
+            _, requests = self._batches.pop(batch_id)
+        # A MockLM answers without its simulated live latency and rate limits
+        answer = getattr(self.lm, "complete_now", None) or self.lm.forward
+        results = {}
+        for custom_id, params, context in requests:
+            messages = ([{"role": "system", "content": params["system"]}] if "system" in params else []) \
+                + params["messages"]
+            try:
+                # Run in the request's own context, so the mock sees the original signature and inputs
+                results[custom_id] = context.run(answer, messages=messages, max_tokens=params["max_tokens"])
+            except Exception as e:
+                results[custom_id] = e
+        return results
+
+
+class BatchCollectorLM(dspy.BaseLM):
+    """DSPy LM that turns concurrent requests of the rating stages into message batches.
+
+    Each request is queued and its caller awaits a future. Once no new
+    request has arrived for `idle_window` seconds (all jokes have reached
+    the same stage) or `max_batch` requests are queued, the queue is
+    submitted as one batch, polled until it ends and every future resolved.
+    Requests from other stages (duels, probes) go to `live_lm` directly.
+    """
+
+    price_multiplier = 0.5  # Message batches cost half of live requests
+
+    def __init__(self, backend, live_lm: dspy.BaseLM, model: str, idle_window: float = 2.0,
+                 max_batch: int = MAX_BATCH_REQUESTS, stages: Tuple[str, ...] = RATING_STAGES):
+        super().__init__(model=model, model_type="chat", temperature=live_lm.kwargs.get("temperature", 0.1),
+                         max_tokens=live_lm.kwargs.get("max_tokens", 4000), cache=False)
+        self.backend = backend
+        self.simulated = isinstance(backend, LocalBatchBackend)  # Answered in-process, model names are moot
+        self.live_lm = live_lm
+        self.idle_window = idle_window
+        self.max_batch = max_batch
+        self.stages = stages
+
+        self._ids = itertools.count(1)
+        self._pending: List[Tuple[str, Dict[str, Any], contextvars.Context, asyncio.Future]] = []
+        self._last_enqueue = 0.0
+        self._flusher: Optional[asyncio.Task] = None
+        self.batches_submitted = 0
+        self.requests_batched = 0
+
+    def forward(self, prompt=None, messages=None, **kwargs):
+        # The synchronous path (startup probe, generate()) is never batched
+        return self.live_lm.forward(prompt=prompt, messages=messages, **kwargs)
+
+    async def aforward(self, prompt=None, messages=None, **kwargs):
+        if current_stage.get() not in self.stages:
+            return await self.live_lm.aforward(prompt=prompt, messages=messages, **kwargs)
+        return await self.enqueue(self.model, prompt, messages, {**self.kwargs, **kwargs})
+
+    async def enqueue(self, model: str, prompt=None, messages=None, settings: Optional[Dict[str, Any]] = None):
+        """Queue one request for the next batch and await its response"""
+        messages = messages or [{"role": "user", "content": prompt}]
+        params = to_anthropic_params(model, messages, settings or {})
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((f"req-{next(self._ids)}", params, contextvars.copy_context(), future))
+        self._last_enqueue = time.monotonic()
+
+        if self._flusher is None or self._flusher.done() or self._flusher.get_loop() is not loop:
+            self._flusher = loop.create_task(self._flush_when_idle())
+        return await future
+
+    async def _flush_when_idle(self):
+        """Submit the queue once it stops growing, repeatedly, until nothing is pending"""
+        while self._pending:
+            idle = time.monotonic() - self._last_enqueue
+            if idle < self.idle_window and len(self._pending) < self.max_batch:
+                await asyncio.sleep(self.idle_window - idle)
+                continue
+            batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+            # Poll each batch in its own task so later stages' requests can be collected meanwhile
+            asyncio.get_running_loop().create_task(self._run_batch(batch))
+
+    async def _run_batch(self, batch: List[Tuple[str, Dict[str, Any], contextvars.Context, asyncio.Future]]):
+        futures = {custom_id: future for custom_id, _, _, future in batch}
+        stage_names = sorted({context.get(current_stage) for _, _, context, _ in batch})
+        try:
+            batch_id = await asyncio.to_thread(self.backend.submit, [(c, p, ctx) for c, p, ctx, _ in batch])
+            self.batches_submitted += 1
+            self.requests_batched += len(batch)
+            print(f"\033[94m📦 Submitted message batch {batch_id}: {len(batch)} requests "
+                  f"({', '.join(stage_names)})\033[0m")
+
+            while not await asyncio.to_thread(self.backend.is_done, batch_id):
+                await asyncio.sleep(self.backend.poll_interval)
+            results = await asyncio.to_thread(self.backend.results, batch_id)
+        except Exception as e:
+            for future in futures.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        print(f"\033[94m📦 Message batch {batch_id} finished\033[0m")
+        for custom_id, future in futures.items():
+            if future.done():
+                continue  # Caller was cancelled
+            result = results.get(custom_id, BatchRequestError(f"No result for {custom_id}", 500))
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                result._hidden_params["price_multiplier"] = self.price_multiplier
+                future.set_result(result)
+
+    def tier(self, model: str, live_lm: dspy.BaseLM, **settings) -> "BatchTierLM":
+        """Handle for another model tier whose rating requests join these batches (see BatchTierLM)"""
+        return BatchTierLM(self, model, governed_live_lm(live_lm), **settings)
+
+    def stats(self) -> dict:
+        return {"batches_submitted": self.batches_submitted, "requests_batched": self.requests_batched}
+
+
+class BatchTierLM(dspy.BaseLM):
+    """A model tier in batch mode: its rating requests are queued on the collector with the tier's
+    model, max_tokens and temperature; other stages go to the tier's own live LM."""
+
+    def __init__(self, collector: BatchCollectorLM, model: str, live_lm: dspy.BaseLM, **settings):
+        settings = {**collector.kwargs, **settings}
+        super().__init__(model=model, model_type="chat", cache=False, **settings)
+        self.collector = collector
+        self.live_lm = live_lm
+
+    def forward(self, prompt=None, messages=None, **kwargs):
+        return self.live_lm.forward(prompt=prompt, messages=messages, **kwargs)
+
+    async def aforward(self, prompt=None, messages=None, **kwargs):
+        if current_stage.get() not in self.collector.stages:
+            return await self.live_lm.aforward(prompt=prompt, messages=messages, **kwargs)
+        return await self.collector.enqueue(self.model, prompt, messages, {**self.kwargs, **kwargs})
+
+
+def governed_live_lm(live_lm: dspy.BaseLM) -> dspy.BaseLM:
+    """Live handle for the requests that are not batched: through the process-wide scheduler and rate
+    governor; pooled keys (KeyPoolLM) are paced per key"""
+    from utilities.dspy_client import GovernedLM
+    from utilities.key_pool import KeyPoolLM
+    from utilities.llm_scheduler import LLMScheduler
+    from utilities.rate_governor import RateGovernor
+
+    governor = RateGovernor.unbounded() if isinstance(live_lm, KeyPoolLM) else RateGovernor.shared()
+    return GovernedLM(live_lm, governor, scheduler=LLMScheduler.shared())
+
+
+def build_batch_lm(model: str, api_key: Optional[str] = None, mock_lm: Optional[dspy.BaseLM] = None,
+                   idle_window: float = 2.0, live_lm: Optional[dspy.BaseLM] = None) -> BatchCollectorLM:
+    """Batch-mode LM for a client's model: the Anthropic batch API on api_key, or the local stand-in
+    answered by mock_lm.
+
+    Live (non-batched) requests go to live_lm (e.g. a KeyPoolLM over the client's keys, default
+    api_key's handle), see governed_live_lm().
+    """
+    from utilities.providers import get_provider
+
+    if mock_lm is not None:
+        backend, live_lm, model = LocalBatchBackend(mock_lm), mock_lm, mock_lm.model
+    else:
+        backend = AnthropicBatchBackend(api_key)
+        live_lm = live_lm or get_provider("anthropic").get_lm(model, api_key=api_key)
+    return BatchCollectorLM(backend, governed_live_lm(live_lm), model, idle_window=idle_window)
@@ -0,0 +1,270 @@
+"""Record/replay cassettes: every LLM request/response of a run, for reproducible offline benchmarks"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+
+import dspy
+from pydantic import BaseModel
+
+from utilities.llm_cache import normalize_value
+from utilities.lm_response import ProviderError, completion_response, current_request
+from utilities.prompt_caching import message_text
+from utilities.rate_governor import error_retry_after, response_headers
+from utilities.usage_tracker import current_stage
+
+
+CASSETTE_VERSION = 1
+
+
+def request_key(prompt: Optional[str], messages: Optional[list]) -> str:
+    """Identity of one request: the full prompt, independent of model and call order"""
+    payload = json.dumps([prompt, [[m.get("role"), message_text(m.get("content"))] for m in messages or []]])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:24]
+
+
+def request_group(prompt: Optional[str], messages: Optional[list]) -> str:
+    """Coarser identity: the system message, i.e. which signature the request belongs to"""
+    system = next((message_text(m.get("content")) for m in messages or [] if m.get("role") == "system"), "")
+    return hashlib.sha256(system.encode("utf-8")).hexdigest()[:24]
+
+
+def _rendered_items(text: str) -> Optional[List[str]]:
+    """Top-level items of a list rendered with str() ("[CategoryInfo(name='a', ...), ...]"), else None"""
+    text = text.strip()
+    if not (text.startswith("[") and text.endswith("]")):
+        return None
+    items, current, depth, quote = [], [], 0, None
+    for index, char in enumerate(text[1:-1]):
+        if quote:
+            if char == quote and text[index] != "\\":
+                quote = None
+        elif char in "'\"":
+            quote = char
+        elif char in "([{":
+            depth += 1
+        elif char in ")]}":
+            depth -= 1
+        elif char == "," and depth == 0:
+            items.append("".join(current))
+            current = []
+            continue
+        current.append(char)
+    items.append("".join(current))
+    return [item for item in items if item.strip()]
+
+
+def _unordered(value: Any) -> str:
+    """Order-independent canonical JSON of an input.
+
+    List items are sorted (also in nested lists, and in lists passed
+    pre-rendered with str()), as are the lines of other texts, so shuffled
+    category and factor lists match while different inputs never do.
+    """
+    if isinstance(value, BaseModel):
+        return _unordered(value.model_dump(mode="json"))
+    if isinstance(value, dict):
+        return json.dumps({str(key): _unordered(item) for key, item in value.items()}, sort_keys=True)
+    if isinstance(value, (list, tuple)):
+        return json.dumps(sorted(_unordered(item) for item in value))
+    if isinstance(value, str):
+        items = _rendered_items(value)
+        parts = items if items is not None else [line for line in value.splitlines() if line.strip()]
+        return json.dumps(sorted(normalize_value(part) for part in parts))
+    return json.dumps(normalize_value(value))
+
+
+def request_inputs(prompt: Optional[str], messages: Optional[list]) -> str:
+    """Signature plus the predictor inputs regardless of their order (utilities.lm_response.current_request).
+
+    Category orderings and factor lists are shuffled per call, so this
+    matches a request for the same joke, check or factor whose prompt differs
+    from the recording only in the order of listed items.
+    """
+    request = current_request.get()
+    if request is None:
+        return request_key(prompt, messages)
+    signature, inputs = request
+    payload = json.dumps([signature.__name__, {name: _unordered(value) for name, value in inputs.items()}],
+                         sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:24]
+
+
+class CassetteRecorder:
+    """Appends every LLM request/response of a run to a gzip-compressed JSONL cassette.
+
+    Only hashes of the prompts are stored, next to the response text, usage,
+    rate-limit headers, latency and errors, so cassettes stay compact. Handed
+    to ClaudeClient(recorder=...), which records below the rate governor.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+        self._started = time.monotonic()
+        self.entries = 0
+        self._write({"version": CASSETTE_VERSION, "created": datetime.now().isoformat(timespec="seconds")})
+
+    def _write(self, entry: Dict[str, Any]):
+        self._file.write(json.dumps(entry, separators=(",", ":")) + "\n")
+
+    def record(self, model: str, prompt: Optional[str], messages: Optional[list], latency: float,
+               response: Any = None, error: Optional[BaseException] = None):
+        entry = {
+            "key": request_key(prompt, messages),
+            "inputs": request_inputs(prompt, messages),
+            "group": request_group(prompt, messages),
+            "stage": current_stage.get(),
+            "model": model,
+            "offset": round(time.monotonic() - self._started - latency, 4),
+            "latency": round(latency, 4)
+        }
+        if error is not None:
+            entry["error"] = {"type": type(error).__name__, "message": str(error)[:500],
+                              "status_code": getattr(error, "status_code", None),
+                              "retry_after": error_retry_after(error)}
+        else:
+            usage = getattr(response, "usage", None) or {}
+            entry["response"] = {"content": response.choices[0].message.content or "",
+                                 "usage": {k: v for k, v in dict(usage).items() if isinstance(v, (int, float))},
+                                 "headers": response_headers(response)}
+            multiplier = (getattr(response, "_hidden_params", None) or {}).get("price_multiplier")
+            if multiplier is not None:
+                entry["response"]["price_multiplier"] = multiplier
+        with self._lock:
+            if self._file.closed:
+                return
+            entry["seq"] = self.entries
+            self._write(entry)
+            self.entries += 1
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+                print(f"\033[92mRecorded {self.entries} LLM calls to {self.path}\033[0m")
+
+
+def load_cassette(path: str) -> List[Dict[str, Any]]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        lines = [json.loads(line) for line in f if line.strip()]
+    if not lines or lines[0].get("version") != CASSETTE_VERSION:
+        raise ValueError(f"{path} is not a version {CASSETTE_VERSION} LLM cassette")
+    return lines[1:]
+
+
+class ReplayLM(dspy.BaseLM):
+    """Serves the responses of a recorded cassette instead of calling a provider.
+
+    A request gets the next unused recording of the identical prompt, in
+    recorded order (so retried requests see the same errors, then the same
+    answer). Prompts that changed since recording (e.g. shuffled category
+    orderings) get the next unused recording with the same inputs in any
+    order, else with the same signature; these approximate matches are
+    counted in stats(). Each answer is delayed by the recorded latency
+    unless `latency=False`.
+    """
+
+    def __init__(self, path: str, latency: bool = True, model: str = "replay/cassette"):
+        super().__init__(model=model, temperature=0.1, max_tokens=4000, cache=False)
+        self.path = path
+        self.latency = latency
+        self._entries = load_cassette(path)
+        self._used = [False] * len(self._entries)
+        # Queues of recording indices per match level, most specific first
+        self._queues: Dict[str, Dict[str, Deque[int]]] = {level: defaultdict(deque)
+                                                          for level in ("key", "inputs", "group")}
+        for index, entry in enumerate(self._entries):
+            for level, queues in self._queues.items():
+                queues[entry[level]].append(index)
+        self._lock = threading.Lock()
+        self.exact = 0
+        self.approximate = 0
+        self.missing = 0
+
+    def _next(self, queue: Deque[int]) -> Optional[int]:
+        """Pop the first unused recording from a queue, called with the lock held"""
+        while queue:
+            index = queue.popleft()
+            if not self._used[index]:
+                self._used[index] = True
+                return index
+        return None
+
+    def _lookup(self, prompt, messages) -> Optional[Dict[str, Any]]:
+        keys = {"key": request_key(prompt, messages), "inputs": request_inputs(prompt, messages),
+                "group": request_group(prompt, messages)}
+        with self._lock:
+            for level, queues in self._queues.items():
+                index = self._next(queues.get(keys[level], deque()))
+                if index is not None:
+                    if level == "key":
+                        self.exact += 1
+                    else:
+                        self.approximate += 1
+                    return self._entries[index]
+            self.missing += 1
+            return None
+
+    def _replay(self, entry: Optional[Dict[str, Any]]):
+        if entry is None:
+            # Nothing recorded for this request: an empty answer (the adapter's parse error triggers a retry)
+            return completion_response("", {"prompt_tokens": 0, "completion_tokens": 0}, self.model)
+        if "error" in entry:
+            error = entry["error"]
+            raise ProviderError(f"Replayed {error['type']}: {error['message']}", error["status_code"],
+                                retry_after=error["retry_after"])
+        recorded = entry["response"]
+        response = completion_response(recorded["content"], recorded["usage"], entry["model"],
+                                       {f"llm_provider-{name}": value for name, value in recorded["headers"].items()})
+        # Account usage under the recorded model and price (e.g. batch discount), not the replay LM's
+        response._hidden_params["usage_model"] = entry["model"]
+        if "price_multiplier" in recorded:
+            response._hidden_params["price_multiplier"] = recorded["price_multiplier"]
+        return response
+
+    def forward(self, prompt=None, messages=None, **kwargs):
+        entry = self._lookup(prompt, messages)
+        if entry is not None and self.latency:
+            time.sleep(entry["latency"])
+        return self._replay(entry)
+
+    async def aforward(self, prompt=None, messages=None, **kwargs):
+        entry = self._lookup(prompt, messages)
+        if entry is not None and self.latency:
+            await asyncio.sleep(entry["latency"])
+        return self._replay(entry)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"recorded": len(self._entries), "exact": self.exact, "approximate": self.approximate,
+                    "missing": self.missing, "unused": self._used.count(False)}
+
+
+def add_cassette_arguments(parser):
+    """--record / --replay options shared by the generator and judge CLIs"""
+    parser.add_argument('--record', type=str, default=None, metavar='PATH',
+                        help='Record every LLM request/response of this run to a cassette (e.g. run.cassette.gz)')
+    parser.add_argument('--replay', type=str, default=None, metavar='PATH',
+                        help='Serve LLM calls from a recorded cassette instead of the API (no network needed)')
+    parser.add_argument('--replay-no-latency', action='store_true',
+                        help='With --replay, answer immediately instead of waiting the recorded latencies')
+
+
+def recorder_from_args(args) -> Optional[CassetteRecorder]:
+    """CassetteRecorder for --record, None otherwise"""
+    return CassetteRecorder(args.record) if getattr(args, 'record', None) else None
+
+
+def replay_lm_from_args(args) -> Optional[ReplayLM]:
+    """ReplayLM for --replay, None otherwise"""
+    if not getattr(args, 'replay', None):
+        return None
+    return ReplayLM(args.replay, latency=not args.replay_no_latency)
@@ -1,23 +1,192 @@
 import os
 import time
+import asyncio
+import threading
 import dspy
-from typing import Optional, Any
+from typing import Optional, Any, Awaitable, Callable, Dict, List, Tuple
 from anthropic import Anthropic
-import random
+from utilities.rate_governor import RateGovernor, estimate_tokens
+from utilities.llm_cache import LLMCache, serialize_outputs, deserialize_outputs
+from utilities.retry_policy import RetryPolicy
+from utilities.hedging import HedgePolicy, hedged_call
+from utilities.usage_tracker import UsageTracker, current_stage
+from utilities.lm_response import current_request
+from utilities.structured_output import StructuredOutputAdapter, repair_stats
+from utilities.providers import get_provider, resolve_model
+from utilities.key_pool import KeyPool, KeyPoolLM, load_api_keys
+from utilities.llm_scheduler import LLMScheduler
+from utilities.cassette import CassetteRecorder
+from utilities.batch_api import BatchCollectorLM, build_batch_lm
+from utilities.streaming import early_exit_fields, is_reasoning_field, stream_until_fields, supports_streaming
 
 # Import OpenRouter clients from utilities
 try:
-    from utilities.openrouter import OpenRouterClient, OpenRouterClientV2
+    from utilities.openrouter import OpenRouterClient
+    from utilities.model_selector import ModelSelector
     OPENROUTER_AVAILABLE = True
 except ImportError:
     print("Warning: OpenRouter utilities not found. Fallback will not be available.")
     OPENROUTER_AVAILABLE = False
 
 
+def _install_adapter():
+    """Use the structured-output adapter process-wide.
+    
+    The adapter decides prompt layout (prompt-cached chat, or a JSON schema
+    for LMs flagged `structured_output`) and repairs near-miss answers; it
+    works for every model, so it is the one piece of global DSPy state left.
+    LMs are never configured globally: every predictor call gets its LM
+    handle passed explicitly.
+    """
+    if not isinstance(dspy.settings.adapter, StructuredOutputAdapter):
+        dspy.settings.configure(adapter=StructuredOutputAdapter())
+
+
+class GovernedLM(dspy.BaseLM):
+    """DSPy LM wrapper that sends every request through a scheduler slot and a RateGovernor and records its usage"""
+    
+    def __init__(self, lm: dspy.BaseLM, governor: RateGovernor, usage: Optional[UsageTracker] = None,
+                 recorder: Optional[CassetteRecorder] = None, structured_output: bool = False,
+                 scheduler: Optional[LLMScheduler] = None):
+        super().__init__(model=lm.model, model_type=lm.model_type, cache=lm.cache)
+        self.inner = lm
+        self.governor = governor
+        # Priority classes and fair sharing between jobs for async calls (utilities.llm_scheduler)
+        self.scheduler = scheduler or LLMScheduler.unbounded()
+        self.usage = usage
+        self.recorder = recorder  # Cassette that receives every request/response (--record)
+        self.structured_output = structured_output  # JSON-schema answers (utilities.structured_output)
+        self.kwargs = lm.kwargs  # Share generation kwargs (temperature, max_tokens) with the wrapped LM
+    
+    # DSPy keeps every call (full prompt and response) in the LM's and each predictor's history;
+    # bound it so long runs don't grow without limit
+    MAX_HISTORY = 100
+    
+    def _process_lm_response(self, response, prompt, messages, **kwargs):
+        outputs = super()._process_lm_response(response, prompt, messages, **kwargs)
+        for owner in [self] + list(dspy.settings.caller_modules or []):
+            if len(owner.history) > self.MAX_HISTORY:
+                del owner.history[:-self.MAX_HISTORY]
+        return outputs
+    
+    def _record(self, queued: float, started: float, response=None, error=None, prompt=None, messages=None):
+        latency = time.monotonic() - started
+        if self.usage is not None:
+            self.usage.record_call(self.model, response=response, latency=latency,
+                                   queue_time=started - queued, error=error)
+        if self.recorder is not None and not isinstance(error, asyncio.CancelledError):
+            self.recorder.record(self.model, prompt, messages, latency, response=response, error=error)
+    
+    def forward(self, prompt=None, messages=None, **kwargs):
+        estimated = estimate_tokens(prompt, messages)
+        queued = time.monotonic()
+        self.governor.acquire_blocking(estimated)
+        started = time.monotonic()
+        try:
+            response = self.inner.forward(prompt=prompt, messages=messages, **kwargs)
+        except Exception as e:
+            self.governor.release(estimated, error=e)
+            self._record(queued, started, error=e, prompt=prompt, messages=messages)
+            raise
+        self.governor.release(estimated, response=response)
+        self._record(queued, started, response=response, prompt=prompt, messages=messages)
+        return response
+    
+    async def aforward(self, prompt=None, messages=None, **kwargs):
+        estimated = estimate_tokens(prompt, messages)
+        queued = time.monotonic()
+        async with self.scheduler.slot():
+            await self.governor.acquire(estimated)
+            started = time.monotonic()
+            early_exit = early_exit_fields.get()
+            try:
+                if early_exit is not None and supports_streaming(self.inner):
+                    response = await stream_until_fields(self.inner, *early_exit, prompt=prompt, messages=messages,
+                                                         **kwargs)
+                else:
+                    response = await self.inner.aforward(prompt=prompt, messages=messages, **kwargs)
+            except (Exception, asyncio.CancelledError) as e:
+                # Cancelled calls (e.g. the losing side of a hedge) must free their in-flight slot too
+                self.governor.release(estimated, error=e)
+                self._record(queued, started, error=e, prompt=prompt, messages=messages)
+                raise
+            self.governor.release(estimated, response=response)
+        self._record(queued, started, response=response, prompt=prompt, messages=messages)
+        return response
+
+
+class SingleFlight:
+    """Coalesces identical in-flight requests: followers await the leader's result"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, asyncio.Future] = {}
+        self.coalesced: Dict[str, int] = {}
+    
+    async def run(self, key: str, func: Callable[[], Awaitable[Any]], stage: str = "default") -> Any:
+        """Run func() unless an identical request is already in flight, then share its result"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            future = self._in_flight.get(key)
+            # A future left over from a previous event loop cannot be awaited here
+            is_follower = future is not None and future.get_loop() is loop
+            if is_follower:
+                self.coalesced[stage] = self.coalesced.get(stage, 0) + 1
+            else:
+                future = loop.create_future()
+                self._in_flight[key] = future
+        
+        if is_follower:
+            # shield() so a cancelled follower doesn't cancel the shared request
+            return await asyncio.shield(future)
+        
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            # Followers weren't cancelled; hand them an ordinary error so their own retry kicks in
+            future.set_exception(RuntimeError("Coalesced LLM request was cancelled"))
+            future.exception()  # Mark retrieved, there may be no followers
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                if self._in_flight.get(key) is future:
+                    del self._in_flight[key]
+    
+    def stats(self) -> Dict[str, int]:
+        """Per-stage count of requests that were served by an in-flight duplicate"""
+        with self._lock:
+            return dict(self.coalesced)
+
+
 class ClaudeClient:
+    # Successful health probes per (model, api key), shared by every client in the process
+    PROBE_TTL = 300.0
+    _probe_results: Dict[tuple, float] = {}
+    _probe_lock = threading.Lock()
+    
     def __init__(self, model: str = '', api_key: Optional[str] = None, 
-                 cache: bool = True):
-        """Initialize DSPy with Claude 3.5 Sonnet using environment API key"""
+                 cache: bool = True, governor: Optional[RateGovernor] = None,
+                 response_cache: Optional[LLMCache] = None, retry_policy: Optional[RetryPolicy] = None,
+                 hedge: Optional[HedgePolicy] = None, secondary_lm: Optional[dspy.BaseLM] = None,
+                 backend_lm: Optional[dspy.BaseLM] = None, stream: bool = False, keep_reasoning: bool = False,
+                 tiers: Optional[Dict[str, Dict[str, Any]]] = None, recorder: Optional[CassetteRecorder] = None,
+                 structured_output: bool = False, api_keys: Optional[List[str]] = None,
+                 scheduler: Optional[LLMScheduler] = None, batch_api: bool = False,
+                 batch_idle_window: float = 2.0):
+        """Initialize DSPy with Claude 3.5 Sonnet using environment API key.
+        
+        api_keys (default: ANTHROPIC_API_KEYS, comma-separated) spreads Claude requests
+        over several keys, each with its own rate limits (utilities.key_pool).
+        batch_api=True sends the rating stages as message batches (utilities.batch_api) on this
+        client's model and key, answered by backend_lm instead when one is given (mock, replay).
+        """
         # model_default = "claude-3-5-sonnet-20241022" # Input -> $3.00 / MTok       Output ->$15.00 / MTok
         model_default = "claude-3-haiku-20240307"    # Input -> $0.25 / MTok       Output -> $1.25 / MTok
         # model_default = "claude-3-5-haiku-20241022"  # Input -> $0.80 / MTok       Output -> $4.00 / MTok
@@ -27,41 +196,99 @@ class ClaudeClient:
         # Claude 3.5 Sonnet: 8,192 output tokens max
         # Claude 3.5 Haiku: 8,192 output tokens max
 
-        self.model = model if model else model_default
+        # A custom backend (e.g. utilities.mock_lm.MockLM) replaces the Anthropic LM under the governor
+        self.backend_lm = backend_lm
+        self.model = backend_lm.model if backend_lm is not None else (model if model else model_default)
         self.api_key = api_key or self._get_api_key()
-        self.cache = cache
-        self.max_retries = 10
-        self.retry_delay = 5
+        # Several keys: requests rotate over them, a throttled key sits out a cooldown
+        keys = api_keys if api_keys is not None else load_api_keys()
+        self.key_pool = KeyPool.shared(keys) if len(keys) > 1 and backend_lm is None else None
+        if self.key_pool is not None:
+            self.api_key = self.key_pool.keys[0]
+        if batch_api:
+            # Requests that are not batched (duels, probes) stay live, on every pooled key
+            self.backend_lm = build_batch_lm(
+                self.model, self.api_key, mock_lm=backend_lm, idle_window=batch_idle_window,
+                live_lm=self._anthropic_lm(self.model) if backend_lm is None else None
+            )
+        self.cache = cache  # False = bypass: skip cache reads, fresh responses still refresh the cache
+        self.response_cache = response_cache or LLMCache()
+        self.single_flight = SingleFlight()  # Identical concurrent requests hit the API once
+        # One retry policy (per-call and per-run budgets, jittered backoff, circuit breaker)
+        # shared by every judge and generator call made through this client
+        self.retry_policy = retry_policy or RetryPolicy()
         self.fallback_client = None
+        self.model_selector = None  # Picks the fallback's OpenRouter model (utilities.model_selector)
+        self._fallback_lms: Dict[str, GovernedLM] = {}  # Governed fallback LM per OpenRouter model
         self.client_type = "claude"  # Track which client is being used
+        # Every Claude request is paced by one process-wide governor unless a dedicated one is given;
+        # pooled keys are paced per key by the pool, the client's governor then only counts requests
+        self.governor = governor or (RateGovernor.unbounded() if self.key_pool is not None else RateGovernor.shared())
+        # Concurrency slots by priority class, shared fairly between the jobs in this process
+        self.scheduler = scheduler or LLMScheduler.shared()
+        # Per-stage tokens, cost and latency of every request made through this client
+        self.usage = UsageTracker()
+        # Optional cassette recording every request/response of the run (utilities.cassette)
+        self.recorder = recorder
+        # Answers as JSON schema / tool use instead of the chat layout (utilities.structured_output)
+        self.structured_output = structured_output
+        # Opt-in hedging: slow predictor calls are duplicated to a secondary backend
+        self.hedge = hedge
+        self.secondary_lm = secondary_lm
+        if hedge is not None and secondary_lm is None:
+            self.secondary_lm = self._build_secondary_lm()
+        # Streaming mode: predictor calls stop as soon as their decision fields arrived,
+        # skipping trailing reasoning unless it is kept for verbose logging
+        self.stream = stream
+        self.keep_reasoning = keep_reasoning
+        # Per-stage model tiers (utilities.model_tiers): stage -> model / max_tokens / temperature
+        self.tiers = tiers or {}
+        self._stage_lms: Dict[str, dspy.BaseLM] = {}
+        self._stage_lms_lock = threading.Lock()
         
-        # Try to configure DSPy with Claude first
-        success = self._try_claude_configuration()
+        # Configure DSPy with Claude now (cheap, must happen on this thread) and run
+        # the health probe in the background, so it overlaps with the caller's own
+        # startup work (XML config parsing, topic processing). The first request
+        # waits for the probe and falls back to OpenRouter if it failed.
+        self._ready = threading.Event()
+        self._ready_lock = threading.Lock()
+        self._checked = False
+        self._claude_ok = False
+        self._init_error = None
         
-        if not success and OPENROUTER_AVAILABLE:
-            print("\033[93mClaude configuration failed. Attempting OpenRouter fallback...\033[0m")
-            success = self._try_openrouter_fallback()
-            
-        if not success:
-            raise Exception("Failed to initialize any language model client (Claude or OpenRouter)")
+        if self._configure_claude():
+            threading.Thread(target=self._warm_up, name="claude-warm-up", daemon=True).start()
+        else:
+            self._ready.set()
     
-    def _try_claude_configuration(self) -> bool:
-        """Try to configure DSPy with Claude"""
+    def _configure_claude(self) -> bool:
+        """Create the governed Claude LM, this client's default handle for predictor calls"""
+        try:
+            # Provider handles have litellm's cache (we cache in apredict()) and retries (429/529 must
+            # reach the governor) turned off
+            self.lm = self._governed(self.backend_lm or self._anthropic_lm(self.model), self.governor)
+            # Static prompt prefixes first and marked for provider-side caching
+            _install_adapter()
+            return True
+        except Exception as e:
+            print(f"\033[91mClaude configuration failed: {str(e)}\033[0m")
+            return False
+    
+    def _probe_claude(self) -> bool:
+        """Test the configured LM with a tiny call, skipped if the same model/key passed recently"""
+        probe_key = (self.model, self.api_key)
+        with ClaudeClient._probe_lock:
+            last_success = ClaudeClient._probe_results.get(probe_key)
+        if last_success is not None and time.monotonic() - last_success < self.PROBE_TTL:
+            self.client_type = "claude"
+            return True
+        
         try:
-            # Configure DSPy with Claude
-            self.lm = dspy.LM(
-                model=self.model,
-                api_key=self.api_key,
-                max_tokens=4000,
-                cache=self.cache,
-                temperature=0.1 + (0 if self.cache else 1)*0.001*random.uniform(-1, 1)        # The cache of DSPy is not functioning well so add some randomness to bypass the cache.
-            )
-            dspy.settings.configure(lm=self.lm, cache=self.cache)
-            
-            # Test the configuration with a simple call
             test_response = self.lm("Test", max_tokens=5)
             if test_response:
                 print("\033[92mClaude configuration successful!\033[0m")
+                with ClaudeClient._probe_lock:
+                    ClaudeClient._probe_results[probe_key] = time.monotonic()
                 self.client_type = "claude"
                 return True
             else:
@@ -72,6 +299,39 @@ class ClaudeClient:
             print(f"\033[91mClaude configuration failed: {str(e)}\033[0m")
             return False
     
+    def _try_claude_configuration(self) -> bool:
+        """Try to configure DSPy with Claude"""
+        return self._configure_claude() and self._probe_claude()
+    
+    def _warm_up(self):
+        """Background health probe started by __init__"""
+        try:
+            self._claude_ok = self._probe_claude()
+        finally:
+            self._ready.set()
+    
+    def ensure_ready(self):
+        """Block until the startup probe finished; switch to OpenRouter if Claude is unusable"""
+        self._ready.wait()
+        with self._ready_lock:
+            if not self._checked:
+                self._checked = True
+                success = self._claude_ok
+                if not success and OPENROUTER_AVAILABLE:
+                    print("\033[93mClaude configuration failed. Attempting OpenRouter fallback...\033[0m")
+                    success = self._try_openrouter_fallback()
+                if not success:
+                    self._init_error = Exception("Failed to initialize any language model client (Claude or OpenRouter)")
+        if self._init_error is not None:
+            raise self._init_error
+    
+    async def aensure_ready(self):
+        """Async variant of ensure_ready(); only the first call leaves the event loop"""
+        if not self._checked:
+            await asyncio.get_running_loop().run_in_executor(None, self.ensure_ready)
+        elif self._init_error is not None:
+            raise self._init_error
+    
     def _try_openrouter_fallback(self) -> bool:
         """Try to fallback to OpenRouter clients"""
         if not OPENROUTER_AVAILABLE:
@@ -85,91 +345,315 @@ class ClaudeClient:
             print("\033[93mNote: Even free OpenRouter models require an API key (sign up at https://openrouter.ai)\033[0m")
             return False
             
-        # Try OpenRouterClient first
+        # Probe the candidate models in parallel and fall back to the fastest healthy one
         try:
-            print("\033[93mTrying OpenRouterClient...\033[0m")
-            self.fallback_client = OpenRouterClient(
-                model="meta-llama/llama-3.1-8b-instruct:free",  # Use free model for fallback
-                cache=self.cache
-            )
-            
-            # Test the fallback client
-            test_response = self.fallback_client.generate("Test", max_tokens=5)
-            if test_response:
-                print("\033[92mOpenRouterClient fallback successful!\033[0m")
-                self.client_type = "openrouter_v1"
-                return True
-            else:
-                print("\033[91mOpenRouterClient test failed - no response\033[0m")
-                
+            self.model_selector = ModelSelector.shared()
+            model = self.model_selector.select()
         except Exception as e:
-            print(f"\033[91mOpenRouterClient fallback failed: {str(e)}\033[0m")
+            print(f"\033[91mOpenRouter model probe failed: {str(e)}\033[0m")
+            return False
+        if model is None:
+            print("\033[91mNo OpenRouter fallback model answered its probe\033[0m")
+            return False
+        
+        self.fallback_client = OpenRouterClient(
+            model=model,
+            cache=self.cache,
+            configure_dspy=False  # Predictor calls get the fallback LM passed explicitly
+        )
+        print(f"\033[92mOpenRouter fallback successful: {model}\033[0m")
+        self.client_type = "openrouter_v1"
+        return True
+    
+    def _fallback(self):
+        """The fallback client, moved to the selector's fastest model (stale probes are redone in the background)"""
+        selector = self.model_selector
+        if selector is not None:
+            selector.refresh_in_background()
+            best = selector.best
+            if best and best != self.fallback_client.model:
+                with self._ready_lock:
+                    if best != self.fallback_client.model:
+                        print(f"\033[93mOpenRouter fallback switching to {best}\033[0m")
+                        self.fallback_client = OpenRouterClient(model=best, cache=self.cache, configure_dspy=False)
+        return self.fallback_client
+    
+    def generate(self, prompt: str, max_tokens: int = 2000, temperature: float = 0.1) -> Optional[str]:
+        """Generate response with retry logic"""
+        self.ensure_ready()
+        
+        def call():
+            if self.client_type == "claude":
+                # Use Claude directly
+                return self.lm(prompt, max_tokens=max_tokens, temperature=temperature)
+            # Use fallback client
+            return self._fallback().generate(prompt, max_tokens=max_tokens, temperature=temperature)
         
-        # Try OpenRouterClientV2 as last resort
         try:
-            print("\033[93mTrying OpenRouterClientV2...\033[0m")
-            self.fallback_client = OpenRouterClientV2(
-                model="meta-llama/llama-3.1-8b-instruct:free",
-                cache=self.cache
-            )
+            return self.retry_policy.call_blocking(call, label=f"generate [{self.client_type}]")
+        except Exception as e:
+            # If Claude fails completely, try to switch to fallback
+            if self.client_type == "claude" and OPENROUTER_AVAILABLE and not self.fallback_client:
+                print("\033[93mClaude completely failed. Attempting emergency OpenRouter switch...\033[0m")
+                if self._try_openrouter_fallback():
+                    return self.generate(prompt, max_tokens, temperature)
             
-            # Test the fallback client
-            test_response = self.fallback_client.generate("Test", max_tokens=5)
-            if test_response:
-                print("\033[92mOpenRouterClientV2 fallback successful!\033[0m")
-                self.client_type = "openrouter_v2"
-                return True
-            else:
-                print("\033[91mOpenRouterClientV2 test failed - no response\033[0m")
-                
+            raise Exception(f"Failed with {self.client_type}: {str(e)}")
+    
+    async def acall(self, prompt: str, max_tokens: int = 2000, temperature: float = 0.1) -> Optional[str]:
+        """Async counterpart of generate() that awaits network I/O instead of blocking a thread"""
+        await self.aensure_ready()
+        
+        async def call():
+            if self.client_type == "claude":
+                # dspy.LM.acall goes through litellm's pooled async HTTP client
+                return await self.lm.acall(prompt, max_tokens=max_tokens, temperature=temperature)
+            fallback = self._fallback()
+            if hasattr(fallback, "agenerate"):
+                # OpenRouterClient awaits its pooled async HTTP client
+                return await fallback.agenerate(prompt, max_tokens=max_tokens, temperature=temperature)
+            # Other fallback clients are synchronous, keep them off the event loop
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                None,
+                lambda: fallback.generate(prompt, max_tokens=max_tokens, temperature=temperature)
+            )
+        
+        try:
+            return await self.retry_policy.call(call, label=f"acall [{self.client_type}]")
         except Exception as e:
-            print(f"\033[91mOpenRouterClientV2 fallback failed: {str(e)}\033[0m")
+            raise Exception(f"Failed with {self.client_type}: {str(e)}")
+    
+    async def apredict(self, predictor: dspy.Predict, stage: str = "default", lm: Optional[dspy.BaseLM] = None,
+                       **kwargs) -> dspy.Prediction:
+        """Run a DSPy predictor on the native async path, served from the response cache when possible.
+        
+        The LM is passed to the predictor for this call only: `lm` (e.g. a
+        handle from make_lm() for another model tier), else the stage's tier
+        (lm_for_stage), else the client's default.
+        Nothing global is reconfigured, so pipelines with different models can
+        run side by side in one process.
+        
+        Identical requests that are already in flight are coalesced: every
+        caller gets the first request's result and the API is hit once.
+        
+        With Claude the call is awaited end to end (Predict.acall -> LM.acall ->
+        litellm.acompletion), so concurrency is bounded by the API rather than by
+        the size of the default thread pool. The OpenRouter fallback is awaited
+        on its pooled async HTTP client; other fallback clients only expose a
+        synchronous interface and still run in the executor.
+        """
+        await self.aensure_ready()
+        call_lm = self._call_lm(lm or self.lm_for_stage(stage))
+        signature = predictor.signature
+        skipped = self._skipped_outputs(signature)
+        # Answers without their reasoning are cached under their own key
+        cache_inputs = {**kwargs, "__skipped_outputs__": skipped} if skipped else kwargs
+        key = self.response_cache.make_key(self._active_model(call_lm), signature, cache_inputs,
+                                           self._active_temperature(call_lm))
         
-        return False
+        if self.cache:
+            cached = self.response_cache.get(key, stage)
+            if cached is not None:
+                return dspy.Prediction(**deserialize_outputs(cached, signature))
+        
+        # Tag the LM calls made below (including hedges) with this stage for usage accounting
+        stage_token = current_stage.set(stage)
+        request_token = current_request.set((signature, kwargs))
+        outputs = tuple(signature.output_fields)
+        # JSON-schema answers arrive as one tool call, there are no field headers to stop at
+        streaming = self.stream and not getattr(call_lm, "structured_output", False)
+        early_exit_token = early_exit_fields.set(
+            (tuple(name for name in outputs if name not in skipped), outputs) if streaming else None
+        )
+        try:
+            return await self.single_flight.run(
+                key, lambda: self._call_predictor(predictor, call_lm, key, stage, kwargs, skipped), stage
+            )
+        finally:
+            early_exit_fields.reset(early_exit_token)
+            current_request.reset(request_token)
+            current_stage.reset(stage_token)
     
-    def generate(self, prompt: str, max_tokens: int = 2000, temperature: float = 0.1) -> Optional[str]:
-        """Generate response with retry logic"""
-        for attempt in range(self.max_retries):
-            try:
-                if self.client_type == "claude":
-                    # Use Claude directly
-                    with dspy.settings.context(temperature=temperature):
-                        response = self.lm(prompt, max_tokens=max_tokens)
-                        return response
-                else:
-                    # Use fallback client
-                    response = self.fallback_client.generate(prompt, max_tokens=max_tokens, temperature=temperature)
-                    return response
-                    
-            except Exception as e:
-                error_msg = f"API Call Failed (Attempt {attempt + 1}/{self.max_retries}) [{self.client_type}]: {str(e)}"
-                print(f"\033[91m{error_msg}\033[0m")  # Print in RED
-                
-                if attempt < self.max_retries - 1:
-                    time.sleep(self.retry_delay)
-                else:
-                    # If Claude fails completely, try to switch to fallback on final attempt
-                    if self.client_type == "claude" and OPENROUTER_AVAILABLE and not self.fallback_client:
-                        print("\033[93mClaude completely failed. Attempting emergency OpenRouter switch...\033[0m")
-                        if self._try_openrouter_fallback():
-                            return self.generate(prompt, max_tokens, temperature)
-                    
-                    raise Exception(f"Failed after {self.max_retries} attempts with {self.client_type}: {str(e)}")
+    async def _call_predictor(self, predictor: dspy.Predict, lm: dspy.BaseLM, key: str, stage: str, kwargs: dict,
+                              skipped: Tuple[str, ...] = ()) -> dspy.Prediction:
+        """Make the actual LLM call for apredict() and store a complete answer in the cache"""
+        signature = predictor.signature
+        # Fallback LMs with an async path (OpenRouterLM, dspy.LM) are awaited too
+        native_async = (self.client_type == "claude" or isinstance(lm, (dspy.LM, GovernedLM))
+                        or hasattr(lm, "abasic_request"))
+        if native_async and hasattr(predictor, "acall"):
+            # The secondary backend mirrors the default model only
+            if self.hedge is not None and self.secondary_lm is not None and lm is self.lm:
+                result = await hedged_call(
+                    lambda: predictor.acall(lm=lm, **kwargs),
+                    lambda: predictor.acall(lm=self.secondary_lm, **kwargs),
+                    self.hedge, stage,
+                    is_valid=lambda prediction: self._is_complete(serialize_outputs(prediction, signature), skipped)
+                )
+            else:
+                result = await predictor.acall(lm=lm, **kwargs)
+        else:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(None, lambda: predictor(lm=lm, **kwargs))
         
+        outputs = serialize_outputs(result, signature)
+        # Never cache incomplete answers, the caller's retry must reach the LLM again
+        if self._is_complete(outputs, skipped):
+            self.response_cache.set(key, outputs, stage)
+        return result
+    
+    @staticmethod
+    def _is_complete(outputs: dict, skipped: Tuple[str, ...] = ()) -> bool:
+        """True when every output field of a prediction, except deliberately skipped ones, has a value"""
+        return all(value not in (None, "", []) for name, value in outputs.items() if name not in skipped)
+    
+    def _skipped_outputs(self, signature) -> Tuple[str, ...]:
+        """Output fields that streaming mode does not wait for"""
+        if not self.stream or self.keep_reasoning or self.structured_output or self.client_type != "claude":
+            return ()
+        return tuple(name for name in signature.output_fields if is_reasoning_field(name))
+    
+    def _build_secondary_lm(self) -> Optional[dspy.BaseLM]:
+        """Backend for hedged requests: a second Anthropic key, else Claude through OpenRouter"""
+        # Each backend has its own rate limits, so each gets its own governor
+        secondary_key = os.environ.get('ANTHROPIC_API_KEY_SECONDARY')
+        if secondary_key:
+            return self._governed(get_provider("anthropic").get_lm(self.model, api_key=secondary_key), RateGovernor())
+        openrouter = get_provider("openrouter")
+        if openrouter.available():
+            # OpenRouter names drop the date suffix and write versions with a dot (claude-3.5-sonnet)
+            name = self.model.rsplit('-', 1)[0].replace('3-5', '3.5')
+            return self._governed(openrouter.get_lm(f"anthropic/{name}"), openrouter.governor())
+        print("\033[93mHedging disabled: set ANTHROPIC_API_KEY_SECONDARY or OPENROUTER_API_KEY "
+              "for a secondary backend\033[0m")
         return None
     
+    def _call_lm(self, lm: Optional[dspy.BaseLM] = None) -> dspy.BaseLM:
+        """LM handle for one predictor call: the requested one, the default, or the fallback client's"""
+        if self.client_type != "claude":
+            # Claude is unusable, whatever model was asked for; the fallback is still paced, scheduled and recorded
+            fallback = self._fallback()
+            with self._stage_lms_lock:
+                if fallback.model not in self._fallback_lms:
+                    self._fallback_lms[fallback.model] = self._governed(fallback.lm,
+                                                                        get_provider("openrouter").governor())
+                return self._fallback_lms[fallback.model]
+        return lm or self.lm
+    
+    def make_lm(self, model: Optional[str] = None, **kwargs) -> dspy.BaseLM:
+        """A separate LM handle (e.g. a cheaper or stronger model tier) for components or apredict(lm=...).
+        
+        The model is a provider spec (utilities.providers), e.g.
+        "claude-3-5-sonnet-20241022", "openrouter/meta-llama/llama-3.1-70b-instruct"
+        or "local/qwen2.5-7b-instruct". Claude models share this client's rate
+        governor, other backends are paced by their provider's own governor;
+        usage is always recorded here. kwargs override the generation settings
+        (max_tokens, temperature). In message-batch mode Claude tiers are batched
+        with their own settings; mock and replayed backends answer for every model.
+        """
+        batches = isinstance(self.backend_lm, BatchCollectorLM) and not self.backend_lm.simulated
+        if self.backend_lm is not None and not batches:
+            return self.lm  # A mock or replayed backend answers for every model
+        provider, name = resolve_model(model or self.model)
+        if provider.name == "anthropic":
+            lm = self._anthropic_lm(name, **kwargs)
+            if batches:
+                # The tier's model and settings go into its batched requests; its other calls stay live
+                lm = self.backend_lm.tier(name, lm, **kwargs)
+            return self._governed(lm, self.governor)
+        return self._governed(provider.get_lm(name, **kwargs), provider.governor())
+    
+    def _anthropic_lm(self, model: str, **kwargs) -> dspy.BaseLM:
+        """Anthropic handle for a model: on every key of the pool if there is one, else on this client's key"""
+        if self.key_pool is not None:
+            return KeyPoolLM(self.key_pool, model, **kwargs)
+        return get_provider("anthropic").get_lm(model, api_key=self.api_key, **kwargs)
+    
+    def _governed(self, lm: dspy.BaseLM, governor: RateGovernor) -> "GovernedLM":
+        """Wrap a provider handle with a governor, this client's usage tracker, recorder, output mode and scheduler"""
+        return GovernedLM(lm, governor, self.usage, self.recorder, self.structured_output, self.scheduler)
+    
+    def lm_for_stage(self, stage: str) -> dspy.BaseLM:
+        """LM handle for a stage's configured tier, the default LM for stages without one"""
+        tier = self.tiers.get(stage)
+        if not tier:
+            return self.lm
+        with self._stage_lms_lock:
+            if stage not in self._stage_lms:
+                self._stage_lms[stage] = self.make_lm(**tier)
+            return self._stage_lms[stage]
+    
+    def _active_model(self, lm: Optional[dspy.BaseLM] = None) -> str:
+        """Model name of the client currently serving requests"""
+        if self.client_type == "claude":
+            return lm.model if lm is not None else self.model
+        return getattr(self.fallback_client, 'model', 'unknown')
+    
+    def _active_temperature(self, lm: Optional[dspy.BaseLM] = None) -> Optional[float]:
+        lm = lm or getattr(self, "lm", None)
+        return lm.kwargs.get("temperature") if self.client_type == "claude" and lm is not None else None
+    
+    def cache_stats(self) -> dict:
+        """Per-stage response cache hit/miss counters"""
+        return self.response_cache.stats()
+    
+    def usage_report(self) -> dict:
+        """Per-stage tokens, cost, latency, retries and cache hits of every call made so far"""
+        return self.usage.report(
+            cache_stats=self.cache_stats(),
+            retries=self.retry_policy.stats()["retries_by_stage"],
+            coalesced=self.single_flight.stats(),
+            extra={
+                "model": self._active_model(),
+                "client_type": self.client_type,
+                "model_tiers": self.tiers,
+                "structured_output": self.structured_output,
+                "output_repairs": repair_stats(),
+                "hedging": self.hedge.stats() if self.hedge is not None else None,
+                "rate_governor": self.governor.snapshot(),
+                "key_pool": self.key_pool.snapshot() if self.key_pool is not None else None,
+                "scheduler": self.scheduler.snapshot()
+            }
+        )
+    
+    def write_usage_report(self, directory: str, since: Optional[dict] = None) -> str:
+        """Write usage_report() as JSON next to a run's logs and return the file path.
+        
+        since = an earlier usage_report() of this client: only the calls made after it are reported.
+        """
+        report = self.usage_report()
+        if since is not None:
+            report = UsageTracker.since(report, since)
+        path = UsageTracker.write_report(report, directory)
+        totals = report["totals"]
+        print(f"\033[92mLLM usage: {totals['calls']} calls, {totals['input_tokens']} input / "
+              f"{totals['output_tokens']} output tokens (prompt cache: {totals['cache_read_tokens']} read / "
+              f"{totals['cache_write_tokens']} written), ${totals['cost_usd']:.4f} -> {path}\033[0m")
+        return path
+    
     def get_client_info(self) -> dict:
         """Get information about the currently active client"""
+        self.ensure_ready()
         info = {
             "client_type": self.client_type,
             "model": self.model if self.client_type == "claude" else getattr(self.fallback_client, 'model', 'unknown'),
+            "model_tiers": self.tiers,
+            "structured_output": self.structured_output,
             "cache": self.cache,
-            "max_retries": self.max_retries,
-            "retry_delay": self.retry_delay
+            "cache_stats": self.cache_stats(),
+            "coalesced_requests": self.single_flight.stats(),
+            "retry_policy": self.retry_policy.stats(),
+            "hedging": self.hedge.stats() if self.hedge is not None else None,
+            "rate_governor": self.governor.snapshot(),
+            "key_pool": self.key_pool.snapshot() if self.key_pool is not None else None,
+            "scheduler": self.scheduler.snapshot()
         }
         
         if self.client_type != "claude" and self.fallback_client:
             info["fallback_model"] = getattr(self.fallback_client, 'model', 'unknown')
+            if self.model_selector is not None:
+                info["fallback_probe"] = self.model_selector.snapshot()
             
         return info
     
@@ -190,6 +674,7 @@ class ClaudeClient:
     
     def switch_to_fallback(self, force: bool = False) -> bool:
         """Manually switch to OpenRouter fallback"""
+        self.ensure_ready()
         if not OPENROUTER_AVAILABLE:
             print("\033[91mOpenRouter utilities not available for fallback\033[0m")
             return False
@@ -207,6 +692,7 @@ class ClaudeClient:
     
     def switch_to_claude(self) -> bool:
         """Manually switch back to Claude (if possible)"""
+        self.ensure_ready()
         if self.client_type == "claude":
             print("\033[93mAlready using Claude client\033[0m")
             return True
@@ -244,7 +730,8 @@ if __name__ == "__main__":
         # Test with DSPy modules
         print(f"\nTesting DSPy modules with {info['client_type']}...")
         qa = dspy.Predict("question -> answer")
-        result = qa(question="What is 2+2?")
+        # No global DSPy LM is configured: pass the client's handle (the fallback's when switched)
+        result = qa(question="What is 2+2?", lm=client._call_lm())
         print(f"DSPy result: {result.answer}")
         
         # Test manual switching (if fallback is available)
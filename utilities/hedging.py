@@ -0,0 +1,122 @@
+"""Hedged LLM requests: duplicate slow calls to a secondary backend"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional
+
+
+class HedgePolicy:
+    """Decides when a slow request deserves a duplicate on a secondary backend.
+
+    Latencies of primary calls are kept per stage in a rolling window. Once a
+    stage has `min_samples` observations, a call still running after the
+    stage's `percentile` latency is hedged, as long as hedged calls stay
+    under `max_fraction` of all calls. Whichever backend returns a valid
+    answer first wins and the other request is cancelled.
+    """
+
+    def __init__(self, percentile: float = 0.95, max_fraction: float = 0.1, min_samples: int = 20,
+                 window: int = 200, min_delay: float = 1.0):
+        self._lock = threading.Lock()
+        self.percentile = percentile
+        self.max_fraction = max_fraction
+        self.min_samples = min_samples
+        self.window = window
+        self.min_delay = min_delay  # Never hedge calls faster than this, whatever the percentile says
+        self._latencies: Dict[str, Deque[float]] = {}
+        self.calls = 0
+        self.hedged = 0
+        self.secondary_wins = 0
+
+    def record_latency(self, stage: str, seconds: float):
+        with self._lock:
+            self._latencies.setdefault(stage, deque(maxlen=self.window)).append(seconds)
+
+    def threshold(self, stage: str) -> Optional[float]:
+        """Seconds after which a call in this stage should be hedged, None while still learning"""
+        with self._lock:
+            samples = sorted(self._latencies.get(stage, ()))
+        if len(samples) < self.min_samples:
+            return None
+        index = min(len(samples) - 1, int(self.percentile * len(samples)))
+        return max(self.min_delay, samples[index])
+
+    def count_call(self):
+        with self._lock:
+            self.calls += 1
+
+    def try_hedge(self) -> bool:
+        """Reserve a hedge if the hedged fraction of traffic is still under the cap"""
+        with self._lock:
+            if self.hedged + 1 > self.max_fraction * max(1, self.calls):
+                return False
+            self.hedged += 1
+            return True
+
+    def record_secondary_win(self):
+        with self._lock:
+            self.secondary_wins += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "hedged": self.hedged,
+                "secondary_wins": self.secondary_wins
+            }
+
+
+async def hedged_call(primary: Callable[[], Awaitable[Any]], secondary: Callable[[], Awaitable[Any]],
+                      policy: HedgePolicy, stage: str, is_valid: Callable[[Any], bool]) -> Any:
+    """Await primary(); if it outlives the stage threshold, race it against secondary().
+
+    Returns the first valid result. If neither backend produces one, the
+    primary's outcome (result or exception) is returned as if no hedge
+    had been sent.
+    """
+    policy.count_call()
+    start = time.monotonic()
+    primary_task = asyncio.ensure_future(primary())
+
+    delay = policy.threshold(stage)
+    if delay is not None:
+        try:
+            done, _ = await asyncio.wait({primary_task}, timeout=delay)
+        except asyncio.CancelledError:
+            primary_task.cancel()
+            raise
+        if not done and policy.try_hedge():
+            return await _race(primary_task, secondary, policy, stage, start, is_valid)
+
+    try:
+        return await primary_task
+    finally:
+        if primary_task.done() and not primary_task.cancelled():
+            policy.record_latency(stage, time.monotonic() - start)
+
+
+async def _race(primary_task: asyncio.Future, secondary: Callable[[], Awaitable[Any]], policy: HedgePolicy,
+                stage: str, start: float, is_valid: Callable[[Any], bool]) -> Any:
+    secondary_task = asyncio.ensure_future(secondary())
+    pending = {primary_task, secondary_task}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task is primary_task:
+                    policy.record_latency(stage, time.monotonic() - start)
+                if task.exception() is None and is_valid(task.result()):
+                    if task is secondary_task:
+                        policy.record_secondary_win()
+                        # The primary is censored at this point; keep the slow tail in the window
+                        policy.record_latency(stage, time.monotonic() - start)
+                    return task.result()
+        return primary_task.result()
+    finally:
+        for task in (primary_task, secondary_task):
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                task.exception()  # Mark retrieved, the loser's error is not interesting
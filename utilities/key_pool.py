@@ -0,0 +1,166 @@
+"""Several Anthropic API keys used as one: per-key rate governors and a cooldown after throttling
+
+Set ANTHROPIC_API_KEYS to a comma-separated list (or pass api_keys to
+ClaudeClient). Every request goes to the next key in rotation whose governor
+has capacity, so throughput grows with the number of keys. A key answered
+with 429/529 is taken out of rotation for its retry-after, at least
+KEY_COOLDOWN seconds; the retry of the failed request goes to another key.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import dspy
+
+from utilities.providers import get_provider
+from utilities.rate_governor import RateGovernor, error_retry_after, estimate_tokens, is_throttle_error
+from utilities.streaming import early_exit_fields, stream_until_fields, supports_streaming
+
+
+# Seconds a throttled key stays out of rotation (longer if the provider's retry-after says so)
+KEY_COOLDOWN = 30.0
+
+
+def load_api_keys() -> List[str]:
+    """Keys from ANTHROPIC_API_KEYS (comma-separated), empty if unset"""
+    return [key.strip() for key in os.environ.get('ANTHROPIC_API_KEYS', "").split(",") if key.strip()]
+
+
+def key_label(key: str) -> str:
+    """Printable form of a key: its last four characters"""
+    return f"...{key[-4:]}"
+
+
+class KeyPool:
+    """Per-key rate governors, rotation and cooldowns for a set of API keys"""
+
+    _shared: Dict[Tuple[str, ...], "KeyPool"] = {}
+    _shared_lock = threading.Lock()
+
+    def __init__(self, keys: Sequence[str], cooldown: float = KEY_COOLDOWN):
+        self.keys = list(dict.fromkeys(key for key in keys if key))
+        if not self.keys:
+            raise ValueError("A key pool needs at least one API key")
+        self.cooldown = cooldown
+        # Rate limits are per key, so each key learns its own limits
+        self.governors = [RateGovernor() for _ in self.keys]
+        self._lock = threading.Lock()
+        self._cooling_until = [0.0] * len(self.keys)
+        self._next = 0
+        self.requests = [0] * len(self.keys)
+        self.throttles = [0] * len(self.keys)
+
+    @classmethod
+    def shared(cls, keys: Sequence[str]) -> "KeyPool":
+        """Process-wide pool for a set of keys, so every client using them shares their limits"""
+        with cls._shared_lock:
+            pool_key = tuple(sorted(set(keys)))
+            if pool_key not in cls._shared:
+                cls._shared[pool_key] = cls(keys)
+            return cls._shared[pool_key]
+
+    def _try_acquire(self, estimated_tokens: int) -> Tuple[Optional[int], float]:
+        """Reserve capacity on the next available key: (key index, 0), or (None, seconds to wait)"""
+        with self._lock:
+            start = self._next
+            self._next = (self._next + 1) % len(self.keys)
+            cooling = list(self._cooling_until)
+        now = time.monotonic()
+        waits = []
+        for offset in range(len(self.keys)):
+            index = (start + offset) % len(self.keys)
+            if cooling[index] > now:
+                waits.append(cooling[index] - now)
+                continue
+            wait = self.governors[index].try_acquire(estimated_tokens)
+            if wait <= 0:
+                with self._lock:
+                    self.requests[index] += 1
+                return index, 0.0
+            waits.append(wait)
+        return None, min(waits)
+
+    async def acquire(self, estimated_tokens: int = 1) -> int:
+        """Wait (without blocking the event loop) for a key with capacity and return its index"""
+        while True:
+            index, wait = self._try_acquire(estimated_tokens)
+            if index is not None:
+                return index
+            await asyncio.sleep(wait)
+
+    def acquire_blocking(self, estimated_tokens: int = 1) -> int:
+        while True:
+            index, wait = self._try_acquire(estimated_tokens)
+            if index is not None:
+                return index
+            time.sleep(wait)
+
+    def release(self, index: int, estimated_tokens: int, response=None, error: Optional[BaseException] = None):
+        """Finish a request on a key; a throttled key leaves the rotation for its cooldown"""
+        self.governors[index].release(estimated_tokens, response=response, error=error)
+        if error is not None and is_throttle_error(error):
+            pause = max(self.cooldown, error_retry_after(error) or 0.0)
+            now = time.monotonic()
+            with self._lock:
+                already_cooling = self._cooling_until[index] > now
+                self._cooling_until[index] = max(self._cooling_until[index], now + pause)
+                self.throttles[index] += 1
+            if not already_cooling:  # Other requests in flight on the key fail the same way
+                print(f"\033[93m⏳ API key {key_label(self.keys[index])} throttled, out of rotation for {pause:.0f}s\033[0m")
+
+    def snapshot(self) -> List[dict]:
+        """Per-key requests, throttles, remaining cooldown and governor limits, for logging"""
+        now = time.monotonic()
+        with self._lock:
+            states = [(self.requests[i], self.throttles[i], max(0.0, self._cooling_until[i] - now))
+                      for i in range(len(self.keys))]
+        return [{"key": key_label(key), "requests": requests, "throttles": throttles,
+                 "cooling_down_s": round(cooling, 1), "rate_governor": governor.snapshot()}
+                for key, (requests, throttles, cooling), governor in zip(self.keys, states, self.governors)]
+
+
+class KeyPoolLM(dspy.BaseLM):
+    """One model on every key of a pool: each request is sent with the key the pool hands out.
+
+    Wrapped by ClaudeClient in a GovernedLM with an unbounded governor, which
+    only records usage; pacing happens here, per key. Streaming early exit
+    (utilities.streaming) is applied to the chosen key's handle.
+    """
+
+    def __init__(self, pool: KeyPool, model: str, **settings):
+        provider = get_provider("anthropic")
+        self.pool = pool
+        self.members = [provider.get_lm(model, api_key=key, **settings) for key in pool.keys]
+        first = self.members[0]
+        super().__init__(model=first.model, model_type=first.model_type, cache=False)
+        self.kwargs = {name: value for name, value in first.kwargs.items() if name != "api_key"}
+
+    def forward(self, prompt=None, messages=None, **kwargs):
+        estimated = estimate_tokens(prompt, messages)
+        index = self.pool.acquire_blocking(estimated)
+        try:
+            response = self.members[index].forward(prompt=prompt, messages=messages, **kwargs)
+        except Exception as e:
+            self.pool.release(index, estimated, error=e)
+            raise
+        self.pool.release(index, estimated, response=response)
+        return response
+
+    async def aforward(self, prompt=None, messages=None, **kwargs):
+        estimated = estimate_tokens(prompt, messages)
+        index = await self.pool.acquire(estimated)
+        member = self.members[index]
+        early_exit = early_exit_fields.get()
+        try:
+            if early_exit is not None and supports_streaming(member):
+                response = await stream_until_fields(member, *early_exit, prompt=prompt, messages=messages, **kwargs)
+            else:
+                response = await member.aforward(prompt=prompt, messages=messages, **kwargs)
+        except (Exception, asyncio.CancelledError) as e:
+            self.pool.release(index, estimated, error=e)
+            raise
+        self.pool.release(index, estimated, response=response)
+        return response
@@ -0,0 +1,197 @@
+"""Persistent content-addressed cache for LLM predictor responses"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel, TypeAdapter
+
+
+# Bump when prompt formatting changes in a way the cache key cannot see
+# (e.g. a DSPy adapter upgrade), to invalidate every stored response at once.
+PROMPT_VERSION = "1"
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "llm_cache.sqlite")
+
+
+def normalize_value(value: Any) -> Any:
+    """Convert predictor inputs to a canonical JSON-compatible form for hashing"""
+    if isinstance(value, BaseModel):
+        return normalize_value(value.model_dump(mode="json"))
+    if isinstance(value, dict):
+        return {str(k): normalize_value(v) for k, v in sorted(value.items(), key=lambda item: str(item[0]))}
+    if isinstance(value, (list, tuple)):
+        return [normalize_value(v) for v in value]
+    if isinstance(value, str):
+        return " ".join(value.split())  # Collapse whitespace differences
+    if value is None or isinstance(value, (int, float, bool)):
+        return value
+    return normalize_value(str(value))
+
+
+def signature_fingerprint(signature) -> str:
+    """Stable identity of a DSPy signature: name, instructions and field descriptions"""
+    parts = [getattr(signature, "__name__", str(signature)), getattr(signature, "instructions", "") or ""]
+    for group in ("input_fields", "output_fields"):
+        for name, field in getattr(signature, group, {}).items():
+            extra = getattr(field, "json_schema_extra", None) or {}
+            parts.append(f"{group}:{name}:{extra.get('desc', '')}:{field.annotation}")
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+class LLMCache:
+    """SQLite-backed response cache with LRU/TTL eviction and per-stage hit/miss counters.
+
+    Keys hash (model, signature, normalized inputs, temperature, prompt version).
+    Every thread gets its own connection; WAL mode and a busy timeout make the
+    file safe to share between threads and between concurrent processes.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = 100000,
+                 max_bytes: int = 512 * 1024 * 1024, ttl_seconds: float = 30 * 24 * 3600,
+                 prompt_version: str = PROMPT_VERSION):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.prompt_version = prompt_version
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._writes_since_evict = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    stage TEXT,
+                    value TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def make_key(self, model: str, signature, inputs: Dict[str, Any], temperature: Optional[float]) -> str:
+        """Content address for one predictor request"""
+        payload = json.dumps({
+            "model": model,
+            "signature": signature_fingerprint(signature),
+            "inputs": normalize_value(inputs),
+            "temperature": temperature,
+            "prompt_version": self.prompt_version
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _count(self, stage: str, outcome: str):
+        with self._stats_lock:
+            counters = self._stats.setdefault(stage, {"hits": 0, "misses": 0})
+            counters[outcome] += 1
+
+    def get(self, key: str, stage: str = "default") -> Optional[Dict[str, Any]]:
+        """Return the stored output fields for a key, or None on a miss"""
+        try:
+            conn = self._connection()
+            row = conn.execute("SELECT value, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            now = time.time()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._count(stage, "misses")
+                return None
+            conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._count(stage, "hits")
+            return json.loads(row[0])
+        except sqlite3.Error as e:
+            print(f"\033[93m⚠️  LLM cache read failed: {e}\033[0m")
+            self._count(stage, "misses")
+            return None
+
+    def set(self, key: str, outputs: Dict[str, Any], stage: str = "default"):
+        """Store the output fields for a key"""
+        value = json.dumps(outputs, ensure_ascii=False)
+        now = time.time()
+        try:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO responses (key, stage, value, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, stage, value, len(value), now, now)
+            )
+            self._writes_since_evict += 1
+            if self._writes_since_evict >= 100:
+                self.evict()
+        except sqlite3.Error as e:
+            print(f"\033[93m⚠️  LLM cache write failed: {e}\033[0m")
+
+    def evict(self):
+        """Drop expired entries, then least-recently-used ones until under the size caps"""
+        self._writes_since_evict = 0
+        conn = self._connection()
+        conn.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+
+        count, total_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if count <= self.max_entries and total_bytes <= self.max_bytes:
+            return
+
+        # Trim to 90% of the caps so eviction doesn't run on every write
+        excess = max(count - int(self.max_entries * 0.9), 0)
+        if total_bytes > self.max_bytes and count:
+            average = total_bytes / count
+            excess = max(excess, int((total_bytes - self.max_bytes * 0.9) / average) + 1)
+        conn.execute(
+            "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_access ASC LIMIT ?)",
+            (excess,)
+        )
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Per-stage hit/miss counters for this process"""
+        with self._stats_lock:
+            return {stage: dict(counters) for stage, counters in self._stats.items()}
+
+
+def serialize_outputs(prediction, signature) -> Dict[str, Any]:
+    """Turn a dspy.Prediction into JSON-compatible output fields"""
+    outputs = {}
+    for name in signature.output_fields:
+        outputs[name] = normalize_output(getattr(prediction, name, None))
+    return outputs
+
+
+def normalize_output(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, (list, tuple)):
+        return [normalize_output(v) for v in value]
+    if isinstance(value, dict):
+        return {k: normalize_output(v) for k, v in value.items()}
+    return value
+
+
+def deserialize_outputs(outputs: Dict[str, Any], signature) -> Dict[str, Any]:
+    """Rebuild typed output values (e.g. List[FirstOrderTriplet]) from cached JSON"""
+    restored = {}
+    for name, field in signature.output_fields.items():
+        value = outputs.get(name)
+        annotation = field.annotation
+        if value is not None and annotation not in (str, None):
+            value = TypeAdapter(annotation).validate_python(value)
+        restored[name] = value
+    return restored
@@ -0,0 +1,224 @@
+"""Priority classes and weighted fair queuing for LLM calls from concurrent jobs sharing a process
+
+Every async request made through a GovernedLM takes one of max_concurrent
+slots before it reaches the rate governor. When slots run out, waiting
+requests are served by priority class first (tournament duels before
+generation before bulk rating), and within a class by weighted fair queuing
+across jobs: each job gets a share of the slots proportional to its weight,
+however many requests it has queued, so a 1000-joke rating job cannot starve
+a small interactive run.
+
+The job and class of a request come from the context (llm_job(),
+llm_priority(), else the stage's default class), like the usage stage tags.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import heapq
+import itertools
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from utilities.usage_tracker import current_stage
+
+
+# Priority classes, lower is served first
+PRIORITY_CLASSES = {"final": 0, "normal": 1, "bulk": 2}
+# Default class of each stage; stages not listed are "normal"
+STAGE_PRIORITIES = {
+    "duel": "final",
+    "admissibility": "bulk",
+    "categories": "bulk",
+    "factor_selection": "bulk",
+    "factor_scoring": "bulk",
+    "rating": "bulk",
+}
+
+DEFAULT_JOB = "default"
+DEFAULT_JOB_WEIGHT = 1.0
+DEFAULT_MAX_CONCURRENT = 16
+
+# (job name, weight) of the requests made in this context
+current_job: contextvars.ContextVar[Tuple[str, float]] = contextvars.ContextVar(
+    "current_job", default=(DEFAULT_JOB, DEFAULT_JOB_WEIGHT)
+)
+# Priority class that overrides the stage default in this context (e.g. the top jokes' re-rating)
+current_priority: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_priority", default=None)
+
+
+@contextlib.contextmanager
+def llm_job(name: str, weight: float = DEFAULT_JOB_WEIGHT) -> Iterator[None]:
+    """Attribute the LLM calls made in this context (and tasks started from it) to a job.
+
+    A job already active in the context is kept, so a judge run started by the
+    generator pipeline stays part of that run's job.
+    """
+    if current_job.get()[0] != DEFAULT_JOB:
+        yield
+        return
+    token = current_job.set((name, max(weight, 1e-3)))
+    try:
+        yield
+    finally:
+        current_job.reset(token)
+
+
+@contextlib.contextmanager
+def llm_priority(priority: str) -> Iterator[None]:
+    """Serve the LLM calls made in this context in the given priority class"""
+    if priority not in PRIORITY_CLASSES:
+        raise ValueError(f"Unknown priority class {priority!r}, expected one of {', '.join(PRIORITY_CLASSES)}")
+    token = current_priority.set(priority)
+    try:
+        yield
+    finally:
+        current_priority.reset(token)
+
+
+def request_priority() -> str:
+    """Priority class of a request made in the current context"""
+    return current_priority.get() or STAGE_PRIORITIES.get(current_stage.get(), "normal")
+
+
+class _Waiter:
+    __slots__ = ("loop", "future", "granted", "cancelled")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.future = loop.create_future()
+        self.granted = False  # A slot was handed over to this waiter
+        self.cancelled = False  # The waiter gave up; skipped when it reaches the head of the queue
+
+
+def _wake(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class LLMScheduler:
+    """Concurrency slots for LLM calls, handed out by priority class, then weighted fair queuing across jobs.
+
+    Like RateGovernor, state is guarded by a threading lock so one scheduler can
+    serve several threads and successive event loops; queued requests are woken
+    on their own loop.
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, max_concurrent: int = DEFAULT_MAX_CONCURRENT):
+        self._lock = threading.Lock()
+        self.max_concurrent = max_concurrent
+        self.in_flight = 0
+        # (priority, virtual finish tag, arrival order, virtual start tag, waiter)
+        self._queue: List[Tuple[int, float, int, float, _Waiter]] = []
+        self._order = itertools.count()
+        self._virtual_time = 0.0
+        self._job_finish: Dict[str, float] = {}
+        self.granted: Dict[str, int] = defaultdict(int)  # By "job/priority"
+        self.wait_time: Dict[str, float] = defaultdict(float)
+
+    @classmethod
+    def shared(cls) -> "LLMScheduler":
+        """Process-wide scheduler used by every ClaudeClient unless one is passed explicitly"""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    @classmethod
+    def unbounded(cls) -> "LLMScheduler":
+        """Scheduler that never queues, for backends with their own queueing (message batches)"""
+        return cls(max_concurrent=sys.maxsize)
+
+    def _tag(self, job: str, weight: float) -> Tuple[float, float]:
+        """Virtual start and finish tags of a job's next request (lock held)"""
+        start = max(self._virtual_time, self._job_finish.get(job, 0.0))
+        finish = start + 1.0 / weight
+        self._job_finish[job] = finish
+        return start, finish
+
+    async def acquire(self):
+        """Wait for a slot for a request made in the current context"""
+        job, weight = current_job.get()
+        priority = request_priority()
+        label = f"{job}/{priority}"
+        queued = time.monotonic()
+        with self._lock:
+            start, finish = self._tag(job, weight)
+            if self.in_flight < self.max_concurrent and not self._queue:
+                self.in_flight += 1
+                self._virtual_time = max(self._virtual_time, start)
+                self.granted[label] += 1
+                return
+            waiter = _Waiter(asyncio.get_running_loop())
+            heapq.heappush(self._queue, (PRIORITY_CLASSES[priority], finish, next(self._order), start, waiter))
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                handed_over = waiter.granted
+                waiter.cancelled = True
+            if handed_over:
+                self.release()  # The slot arrived as the request was cancelled
+            raise
+        with self._lock:
+            self.granted[label] += 1
+            self.wait_time[label] += time.monotonic() - queued
+
+    def release(self):
+        """Free a slot, handing it to the next queued request if there is one"""
+        with self._lock:
+            while self._queue:
+                _, _, _, start, waiter = heapq.heappop(self._queue)
+                if waiter.cancelled:
+                    continue
+                try:
+                    waiter.loop.call_soon_threadsafe(_wake, waiter.future)
+                except RuntimeError:
+                    continue  # Its event loop is closed
+                waiter.granted = True
+                self._virtual_time = max(self._virtual_time, start)
+                return
+            self.in_flight -= 1
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def snapshot(self) -> dict:
+        """Slots in use, queue length and per job/priority grants and mean wait, for logging"""
+        with self._lock:
+            return {
+                "max_concurrent": self.max_concurrent if self.max_concurrent != sys.maxsize else None,
+                "in_flight": self.in_flight,
+                "queued": sum(1 for entry in self._queue if not entry[-1].cancelled),
+                "granted": dict(self.granted),
+                "mean_wait_s": {label: round(self.wait_time[label] / count, 3)
+                                for label, count in self.granted.items()},
+            }
+
+
+def add_scheduler_arguments(parser):
+    """--max-concurrent / --job-weight options shared by the generator and judge CLIs"""
+    parser.add_argument('--max-concurrent', type=int, default=DEFAULT_MAX_CONCURRENT,
+                        help=f'LLM calls in flight at once across all jobs in this process; raise it with several '
+                             f'API keys (default: {DEFAULT_MAX_CONCURRENT})')
+    parser.add_argument('--job-weight', type=float, default=DEFAULT_JOB_WEIGHT,
+                        help=f'Share of the LLM slots this run gets relative to other jobs in the process '
+                             f'(default: {DEFAULT_JOB_WEIGHT})')
+
+
+def scheduler_from_args(args) -> LLMScheduler:
+    """The process-wide scheduler, sized from --max-concurrent"""
+    scheduler = LLMScheduler.shared()
+    scheduler.max_concurrent = max(1, args.max_concurrent)
+    return scheduler
@@ -0,0 +1,35 @@
+"""Backend-neutral pieces shared by the LM backends: the response shape DSPy expects, provider errors
+and the predictor call in flight"""
+
+import contextvars
+from types import SimpleNamespace
+from typing import Any, Dict, Optional, Tuple
+
+
+# (signature, inputs) of the predictor call currently running in this task, set by ClaudeClient.apredict.
+# The mock needs the typed inputs to answer with names that actually exist (categories, factors), and
+# cassettes match recorded requests on them.
+current_request: contextvars.ContextVar[Optional[Tuple[Any, Dict[str, Any]]]] = \
+    contextvars.ContextVar("llm_request", default=None)
+
+
+def completion_response(content: str, usage: Dict[str, int], model: str,
+                        headers: Optional[Dict[str, str]] = None) -> SimpleNamespace:
+    """Minimal OpenAI-format chat completion, the shape DSPy expects from BaseLM.forward()"""
+    usage = dict(usage)
+    usage.setdefault("total_tokens", usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0))
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content), finish_reason="stop")],
+        usage=usage,
+        model=model,
+        _hidden_params={"additional_headers": headers or {}}
+    )
+
+
+class ProviderError(Exception):
+    """Provider failure raised outside litellm; carries status_code (and retry-after) like litellm errors"""
+
+    def __init__(self, message: str, status_code: int, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.litellm_response_headers = {"retry-after": f"{retry_after:.2f}"} if retry_after is not None else {}
@@ -0,0 +1,361 @@
+"""Deterministic offline LM for load testing the generator and judge pipelines"""
+
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+import typing
+from collections import deque
+from types import SimpleNamespace
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import dspy
+from pydantic import BaseModel
+
+from utilities.llm_cache import normalize_value, normalize_output
+from utilities.lm_response import ProviderError, completion_response, current_request
+from utilities.prompt_caching import message_text
+
+
+MOCK_WORDS = ("cat", "tax", "pun", "dog", "office", "coffee", "robot", "wizard", "banana", "meeting",
+              "deadline", "penguin", "spreadsheet", "pirate", "dentist", "toaster", "llama", "sock")
+
+
+class MockLLMError(ProviderError):
+    """Simulated provider failure"""
+
+
+class MockLM(dspy.BaseLM):
+    """Offline stand-in for the Anthropic LM.
+
+    Answers every signature in judges/dspy_signatures.py and
+    generator/signatures.py with schema-valid outputs. Everything random is
+    derived from `seed` and the request content, so runs are reproducible no
+    matter how calls interleave:
+
+    - latency: lognormal with the given median and sigma
+    - error_rate: fraction of calls failing with a 500
+    - malformed_rate: fraction of answers in a near-miss format ("**Score:** 4/5",
+      "Joke A", "True.", no end marker) that the strict adapter parse rejects
+    - 429 bursts: on average every `burst_interval` seconds the mock rejects
+      all calls with 429 (and a retry-after) for `burst_duration` seconds
+    - pass_rate: probability that an admissibility check passes
+    - list_size: length of generated lists (triplets, groups, jokes)
+    - rpm_limit: requests per minute before the mock answers 429, advertised
+      in Anthropic-style rate-limit headers so the RateGovernor can learn it
+    - prompt caching: prefixes up to cache_control blocks of at least
+      `min_cache_tokens` are remembered and reported as cache writes, then
+      cache reads, in the response usage
+    """
+
+    def __init__(self, seed: int = 0, latency_median: float = 1.0, latency_sigma: float = 0.5,
+                 error_rate: float = 0.0, malformed_rate: float = 0.0, burst_interval: float = 0.0, burst_duration: float = 5.0,
+                 pass_rate: float = 0.95, list_size: int = 3, rpm_limit: int = 4000, tpm_limit: int = 4000000,
+                 min_cache_tokens: int = 2048, model: str = "mock/claude-3-haiku-20240307"):
+        super().__init__(model=model, temperature=0.1, max_tokens=4000, cache=False)
+        self.seed = seed
+        self.latency_median = latency_median
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.burst_interval = burst_interval
+        self.burst_duration = burst_duration
+        self.pass_rate = pass_rate
+        self.list_size = list_size  # Items per generated list; raise it to produce thousands of jokes
+        self.rpm_limit = rpm_limit  # Enforced like a provider limit and advertised in rate-limit headers
+        self.tpm_limit = tpm_limit  # Only advertised
+        self.min_cache_tokens = min_cache_tokens  # Anthropic's minimum cacheable prefix (2048 for Haiku)
+
+        self._lock = threading.Lock()
+        self._attempts: Dict[str, int] = {}
+        self._started = time.monotonic()
+        self._burst_rng = random.Random(f"{seed}:bursts")
+        self._bursts: List[float] = []  # Burst start times, relative to _started
+        self._recent: Deque[float] = deque()  # Request times within the last minute
+        self._cached_prefixes: set = set()  # Digests of prompt prefixes in the simulated provider cache
+        self.calls = 0
+        self.rejected = 0
+
+    # Request handling
+
+    def forward(self, prompt=None, messages=None, **kwargs):
+        delay, outcome = self._plan(prompt, messages)
+        time.sleep(delay)
+        return self._complete(outcome, messages)
+
+    async def aforward(self, prompt=None, messages=None, **kwargs):
+        delay, outcome = self._plan(prompt, messages)
+        await asyncio.sleep(delay)
+        return self._complete(outcome, messages)
+
+    async def astream(self, prompt=None, messages=None, meta: Optional[Dict[str, Any]] = None, **kwargs):
+        """Streamed variant of aforward(): first chunk after 20% of the latency, the rest spread over the text"""
+        delay, outcome = self._plan(prompt, messages)
+        if isinstance(outcome, Exception):
+            await asyncio.sleep(delay)
+            raise outcome
+        response = self._complete(outcome, messages)
+        if meta is not None:
+            meta["usage"] = response.usage
+            meta["headers"] = response._hidden_params["additional_headers"]
+        content = response.choices[0].message.content
+        chunk_size = max(1, len(content) // 20)
+        await asyncio.sleep(delay * 0.2)
+        for start in range(0, len(content), chunk_size):
+            await asyncio.sleep(delay * 0.8 * chunk_size / len(content))
+            yield content[start:start + chunk_size]
+
+    def complete_now(self, prompt=None, messages=None, **kwargs):
+        """Answer immediately, without live latency, rate limits or 429 bursts (batch endpoint stand-in)"""
+        _, outcome = self._plan(prompt, messages, live=False)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return self._complete(outcome, messages, headers=False)
+
+    def _plan(self, prompt, messages, live: bool = True) -> Tuple[float, Any]:
+        """Decide latency and outcome (error or output fields) for one call"""
+        request = current_request.get()
+        digest = self._digest(prompt, messages, request)
+        with self._lock:
+            attempt = self._attempts.get(digest, 0)
+            self._attempts[digest] = attempt + 1
+            self.calls += 1
+            over_limit = self._count_request() if live else False
+
+        # Content plus attempt number: a retried request gets a fresh draw for errors and latency
+        rng = random.Random(f"{self.seed}:{digest}:{attempt}")
+        delay = self.latency_median * math.exp(rng.gauss(0.0, self.latency_sigma)) if self.latency_median else 0.0
+
+        burst_remaining = self._burst_remaining() if live else 0.0
+        if over_limit:
+            burst_remaining = max(burst_remaining, 60.0 - (time.monotonic() - self._recent[0]))
+        if burst_remaining > 0:
+            with self._lock:
+                self.rejected += 1
+            return min(delay, 0.05), MockLLMError("Mock rate limit exceeded", 429, retry_after=burst_remaining)
+        if rng.random() < self.error_rate:
+            return delay, MockLLMError("Mock internal server error", 500)
+
+        # Outputs depend on content only, never on the attempt, like a temperature-0 model
+        output_rng = random.Random(f"{self.seed}:{digest}")
+        outputs = self._outputs(request, output_rng)
+        if request is not None and rng.random() < self.malformed_rate:
+            return delay, self._malformed(outputs)
+        return delay, outputs
+
+    def _digest(self, prompt, messages, request) -> str:
+        if request is not None:
+            signature, inputs = request
+            payload = json.dumps([signature.__name__, normalize_value(inputs)], sort_keys=True)
+        else:
+            payload = json.dumps([prompt, messages], default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+    def _count_request(self) -> bool:
+        """Track the sliding one-minute window, called with the lock held. True if over rpm_limit."""
+        if not self.rpm_limit:
+            return False
+        now = time.monotonic()
+        while self._recent and now - self._recent[0] > 60.0:
+            self._recent.popleft()
+        if len(self._recent) >= self.rpm_limit:
+            return True
+        self._recent.append(now)
+        return False
+
+    def _rate_limit_headers(self) -> Dict[str, str]:
+        if not self.rpm_limit:
+            return {}
+        with self._lock:
+            remaining = max(0, self.rpm_limit - len(self._recent))
+        return {
+            "llm_provider-anthropic-ratelimit-requests-limit": str(self.rpm_limit),
+            "llm_provider-anthropic-ratelimit-requests-remaining": str(remaining),
+            "llm_provider-anthropic-ratelimit-tokens-limit": str(self.tpm_limit)
+        }
+
+    def _burst_remaining(self) -> float:
+        """Seconds left in the current 429 burst, 0 outside bursts"""
+        if not self.burst_interval:
+            return 0.0
+        now = time.monotonic() - self._started
+        with self._lock:
+            # Extend the seeded burst schedule (Poisson arrivals) up to now
+            while not self._bursts or self._bursts[-1] <= now:
+                last = self._bursts[-1] if self._bursts else 0.0
+                self._bursts.append(last + self._burst_rng.expovariate(1.0 / self.burst_interval))
+            for start in reversed(self._bursts):
+                if start <= now:
+                    return max(0.0, start + self.burst_duration - now)
+        return 0.0
+
+    def _complete(self, outcome: Any, messages, headers: bool = True) -> SimpleNamespace:
+        if isinstance(outcome, Exception):
+            raise outcome
+        content = outcome if isinstance(outcome, str) else self._format(outcome, messages)
+        prompt_chars = sum(len(message_text(message.get("content", ""))) for message in messages or [])
+        cache_write, cache_read = self._cache_usage(messages)
+        usage = {
+            "prompt_tokens": max(1, prompt_chars // 4),
+            "completion_tokens": max(1, len(content) // 4),
+            "cache_creation_input_tokens": cache_write,
+            "cache_read_input_tokens": cache_read,
+        }
+        return completion_response(content, usage, self.model, self._rate_limit_headers() if headers else None)
+
+    def _cache_usage(self, messages) -> Tuple[int, int]:
+        """Simulated prompt caching: (cache write, cache read) tokens, like Anthropic's usage fields"""
+        prefix, breakpoints = "", []
+        for message in messages or []:
+            content = message.get("content", "")
+            for block in content if isinstance(content, list) else [{"text": content}]:
+                prefix += message_text([block])
+                if isinstance(block, dict) and block.get("cache_control") and len(prefix) // 4 >= self.min_cache_tokens:
+                    breakpoints.append((hashlib.sha256(prefix.encode("utf-8")).hexdigest(), len(prefix) // 4))
+        if not breakpoints:
+            return 0, 0
+        with self._lock:
+            # The longest cached prefix is read, the rest up to the last breakpoint is written
+            read = next((tokens for digest, tokens in reversed(breakpoints) if digest in self._cached_prefixes), 0)
+            self._cached_prefixes.update(digest for digest, _ in breakpoints)
+        return breakpoints[-1][1] - read, read
+
+    @staticmethod
+    def _format(outputs: Dict[str, Any], messages) -> str:
+        """Render output fields the way the active DSPy adapter expects to parse them"""
+        system = next((message_text(m.get("content", "")) for m in messages or [] if m.get("role") == "system"), "")
+        if "[[ ## completed ## ]]" not in system:
+            return json.dumps(outputs)  # JSONAdapter
+        parts = []
+        for name, value in outputs.items():
+            rendered = value if isinstance(value, str) else json.dumps(value)
+            parts.append(f"[[ ## {name} ## ]]\n{rendered}")
+        parts.append("[[ ## completed ## ]]")
+        return "\n\n".join(parts)
+
+    @staticmethod
+    def _malformed(outputs: Dict[str, Any]) -> str:
+        """Render output fields the way LLMs get the format slightly wrong"""
+        parts = []
+        for name, value in outputs.items():
+            if name == "score":
+                value = f"{value}/5"
+            elif name == "confidence_level":
+                value = f"{value} out of 5"
+            elif name == "winner":
+                value = value.replace("_", " ").title()
+            elif value in ("true", "false"):
+                value = value.capitalize() + "."
+            elif not isinstance(value, str):
+                value = json.dumps(value)[:-1] + ",]"  # Trailing comma
+            parts.append(f"**{name.replace('_', ' ').title()}:** {value}")
+        return "\n\n".join(parts)
+
+    # Output generation
+
+    def _outputs(self, request, rng: random.Random) -> Dict[str, Any]:
+        if request is None:
+            return {"response": self._sentence(rng)}
+        signature, inputs = request
+        outputs = {}
+        for name, field in signature.output_fields.items():
+            outputs[name] = normalize_output(self._field_value(name, field.annotation, inputs, rng))
+        return outputs
+
+    def _field_value(self, name: str, annotation, inputs: Dict[str, Any], rng: random.Random) -> Any:
+        if name == "passed" or name.endswith("_passed"):
+            return "true" if rng.random() < self.pass_rate else "false"
+        if name == "is_independent":
+            return "true" if rng.random() < 0.05 else "false"
+        if name == "selected_categories":
+            names = _names(inputs.get("available_categories"))
+            return ", ".join(rng.sample(names, min(len(names), rng.randint(1, 3)))) if names else "Independent"
+        if name == "relevant_factors":
+            names = _names(inputs.get("relevant_categories"), nested="factors")
+            return ", ".join(rng.sample(names, min(len(names), rng.randint(2, 5))))
+        if name == "score":
+            return str(rng.choices(range(6), weights=(1, 2, 4, 5, 3, 1))[0])
+        if name == "winner":
+            return rng.choice(("joke_a", "joke_b"))
+        if name == "confidence_level":
+            return f"{rng.uniform(1.0, 5.0):.1f}"
+        return self._value(annotation, rng, name)
+
+    def _value(self, annotation, rng: random.Random, name: str = "") -> Any:
+        """Random instance of a type annotation (str, List[...], Union[...], pydantic models)"""
+        origin = typing.get_origin(annotation)
+        if origin in (list, List):
+            (item_type,) = typing.get_args(annotation) or (str,)
+            count = max(2, self.list_size + rng.randint(-1, 1))
+            return [self._value(item_type, rng, name) for _ in range(count)]
+        if origin is typing.Union:
+            return self._value(rng.choice([arg for arg in typing.get_args(annotation) if arg is not type(None)]), rng)
+        if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+            return annotation(**{field_name: self._value(field.annotation, rng, field_name)
+                                 for field_name, field in annotation.model_fields.items()})
+        if annotation is int:
+            return rng.randint(0, 5)
+        if annotation is float:
+            return round(rng.uniform(0.0, 5.0), 2)
+        if annotation is bool:
+            return rng.random() < 0.5
+        if name == "text":
+            return f"Why did the {rng.choice(MOCK_WORDS)} bring a {rng.choice(MOCK_WORDS)}? " \
+                   f"Because the {rng.choice(MOCK_WORDS)} was #{rng.randint(1, 10 ** 6)}."
+        return self._sentence(rng)
+
+    @staticmethod
+    def _sentence(rng: random.Random) -> str:
+        return " ".join(rng.choice(MOCK_WORDS) for _ in range(rng.randint(6, 14))).capitalize() + "."
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"calls": self.calls, "rejected_429": self.rejected}
+
+
+def _names(value: Any, nested: Optional[str] = None) -> List[str]:
+    """Names of the options offered in an input (pydantic objects, or their str() repr)"""
+    if isinstance(value, str):
+        return re.findall(r"name='([^']*)'", value)
+    names = []
+    for item in value or []:
+        children = getattr(item, nested, None) if nested else None
+        if children:
+            names.extend(child.name for child in children)
+        elif hasattr(item, "name"):
+            names.append(item.name)
+    return names
+
+
+def add_mock_arguments(parser):
+    """Add the --mock-llm options shared by the generator and judge CLIs"""
+    parser.add_argument('--mock-llm', action='store_true',
+                        help='Use the offline mock LM instead of Anthropic (load testing, no cost)')
+    parser.add_argument('--mock-seed', type=int, default=0, help='Seed for mock outputs, latency and errors (default: 0)')
+    parser.add_argument('--mock-latency', type=float, default=1.0,
+                        help='Median mock call latency in seconds (default: 1.0)')
+    parser.add_argument('--mock-error-rate', type=float, default=0.0,
+                        help='Fraction of mock calls failing with a 500 (default: 0.0)')
+    parser.add_argument('--mock-malformed-rate', type=float, default=0.0,
+                        help='Fraction of mock answers in a near-miss format the adapter must repair (default: 0.0)')
+    parser.add_argument('--mock-burst-interval', type=float, default=0.0,
+                        help='Average seconds between mock 429 bursts, 0 = no bursts (default: 0)')
+    parser.add_argument('--mock-burst-duration', type=float, default=5.0,
+                        help='Length of each mock 429 burst in seconds (default: 5.0)')
+    parser.add_argument('--mock-rpm', type=int, default=4000,
+                        help='Requests per minute the mock accepts before answering 429 (default: 4000)')
+    parser.add_argument('--mock-list-size', type=int, default=3,
+                        help='Items per generated list; e.g. 100 yields ~10k jokes in the full pipeline (default: 3)')
+
+
+def mock_lm_from_args(args) -> Optional[MockLM]:
+    """MockLM configured from add_mock_arguments() options, None unless --mock-llm was given"""
+    if not getattr(args, 'mock_llm', False):
+        return None
+    return MockLM(seed=args.mock_seed, latency_median=args.mock_latency, error_rate=args.mock_error_rate,
+                  malformed_rate=args.mock_malformed_rate, burst_interval=args.mock_burst_interval,
+                  burst_duration=args.mock_burst_duration, list_size=args.mock_list_size, rpm_limit=args.mock_rpm)
@@ -0,0 +1,161 @@
+"""Pick the fastest healthy OpenRouter model for the fallback client by probing candidates in parallel
+
+The candidates (OPENROUTER_FALLBACK_MODELS, comma-separated, else
+DEFAULT_CANDIDATES) are first narrowed to the models OpenRouter currently
+lists; the list is cached on disk for a day so startup does not pay for it.
+Each remaining candidate gets a tiny request at the same time, and the fastest
+one that answers wins. Results go stale after REPROBE_INTERVAL seconds; the
+next fallback call then re-probes in the background and the client switches
+to the new winner when it is ready.
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+from utilities.openrouter import OpenRouterClient, OpenRouterLM
+
+
+DEFAULT_CANDIDATES = (
+    "meta-llama/llama-3.1-8b-instruct:free",
+    "meta-llama/llama-3.2-3b-instruct:free",
+    "mistralai/mistral-7b-instruct:free",
+    "google/gemma-2-9b-it:free",
+    "qwen/qwen-2.5-7b-instruct:free",
+)
+MODEL_LIST_PATH = os.path.join(".cache", "openrouter_models.json")
+MODEL_LIST_TTL = 24 * 3600.0
+PROBE_TIMEOUT = 10.0  # Seconds a probe may take before the model counts as unhealthy
+REPROBE_INTERVAL = 600.0
+
+
+@dataclass
+class ProbeResult:
+    model: str
+    latency: Optional[float]  # Seconds, None if the probe failed
+    error: str = ""
+
+
+def load_candidates() -> List[str]:
+    """Candidate models from OPENROUTER_FALLBACK_MODELS, else the built-in list"""
+    configured = [model.strip() for model in os.environ.get('OPENROUTER_FALLBACK_MODELS', "").split(",")
+                  if model.strip()]
+    return configured or list(DEFAULT_CANDIDATES)
+
+
+def listed_models(client: OpenRouterClient, path: str = MODEL_LIST_PATH, ttl: float = MODEL_LIST_TTL) -> List[str]:
+    """Model ids OpenRouter lists, from the disk cache while it is fresh; empty if unknown"""
+    cached = None
+    try:
+        with open(path, "r") as f:
+            cached = json.load(f)
+        if time.time() - cached.get("fetched_at", 0) < ttl:
+            return cached.get("models", [])
+    except (OSError, ValueError):
+        pass
+    models = [model.get("id") for model in client.list_models() if model.get("id")]
+    if not models:
+        return cached.get("models", []) if cached else []  # A stale list beats none
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"fetched_at": time.time(), "models": models}, f)
+    return models
+
+
+class ModelSelector:
+    """Parallel latency probes over the candidate models, with the fastest healthy one kept until it goes stale"""
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, candidates: Optional[List[str]] = None, probe_timeout: float = PROBE_TIMEOUT,
+                 reprobe_interval: float = REPROBE_INTERVAL,
+                 probe_fn: Optional[Callable[[str, float], Optional[str]]] = None):
+        """probe_fn(model, timeout) -> response text replaces the live OpenRouter request (tests, mocks)"""
+        self.candidates = candidates or load_candidates()
+        self.probe_timeout = probe_timeout
+        self.reprobe_interval = reprobe_interval
+        self.probe_fn = probe_fn or self._live_probe
+        self._lock = threading.Lock()
+        self.best: Optional[str] = None
+        self.results: List[ProbeResult] = []
+        self._probed_at = 0.0
+        self._reprobing = False
+
+    @classmethod
+    def shared(cls) -> "ModelSelector":
+        """Process-wide selector, so every client's fallback shares the probe results"""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    @staticmethod
+    def _live_probe(model: str, timeout: float) -> Optional[str]:
+        return OpenRouterLM(model=model, max_tokens=5).basic_request("Test", max_tokens=5, timeout=timeout)
+
+    def _available_candidates(self) -> List[str]:
+        try:
+            listed = set(listed_models(OpenRouterClient(model=self.candidates[0], configure_dspy=False)))
+        except Exception:
+            listed = set()
+        available = [model for model in self.candidates if model in listed]
+        return available or self.candidates  # Listing unavailable: probe them all
+
+    def _probe_one(self, model: str) -> ProbeResult:
+        started = time.monotonic()
+        try:
+            if not self.probe_fn(model, self.probe_timeout):
+                return ProbeResult(model, None, "empty response")
+            return ProbeResult(model, time.monotonic() - started)
+        except Exception as e:
+            return ProbeResult(model, None, str(e))
+
+    def probe(self) -> Optional[str]:
+        """Probe every available candidate at once and return the fastest healthy model (None if all failed)"""
+        candidates = self._available_candidates()
+        with ThreadPoolExecutor(max_workers=len(candidates), thread_name_prefix="openrouter-probe") as pool:
+            results = list(pool.map(self._probe_one, candidates))
+        healthy = sorted((r for r in results if r.latency is not None), key=lambda r: r.latency)
+        with self._lock:
+            self.results = results
+            self._probed_at = time.monotonic()
+            if healthy:
+                self.best = healthy[0].model
+        summary = ", ".join(f"{r.model} {r.latency:.2f}s" if r.latency is not None else f"{r.model} failed"
+                            for r in results)
+        color = "\033[92m" if healthy else "\033[91m"
+        print(f"{color}OpenRouter probe: {summary}\033[0m")
+        return healthy[0].model if healthy else None
+
+    def select(self) -> Optional[str]:
+        """The fastest healthy model, probing first if there is no fresh result"""
+        with self._lock:
+            fresh = self.best is not None and time.monotonic() - self._probed_at < self.reprobe_interval
+        return self.best if fresh else self.probe()
+
+    def refresh_in_background(self):
+        """Start a re-probe on a daemon thread when the last one is stale; callers keep the current model meanwhile"""
+        with self._lock:
+            if self._reprobing or time.monotonic() - self._probed_at < self.reprobe_interval:
+                return
+            self._reprobing = True
+
+        def reprobe():
+            try:
+                self.probe()
+            finally:
+                with self._lock:
+                    self._reprobing = False
+
+        threading.Thread(target=reprobe, name="openrouter-reprobe", daemon=True).start()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"best": self.best,
+                    "latencies_s": {r.model: round(r.latency, 3) if r.latency is not None else None
+                                    for r in self.results}}
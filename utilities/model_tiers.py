@@ -0,0 +1,119 @@
+"""Per-stage model tiers: which model, max_tokens and temperature each pipeline stage runs with"""
+
+import json
+from typing import Any, Dict, Iterable, Optional
+
+
+# Stages passed to ClaudeClient.apredict(stage=...) by the generator and the judges
+STAGES = (
+    "hook_generation", "grouping", "joke_generation",
+    "admissibility", "categories", "factor_selection", "factor_scoring", "duel"
+)
+TIER_SETTINGS = ("model", "max_tokens", "temperature")
+
+# Recommended tiering shipped with the repo (see model_tiers.json)
+DEFAULT_TIERS_FILE = "model_tiers.json"
+
+
+def _validate_tier(stage: str, tier: Any) -> Dict[str, Any]:
+    if stage not in STAGES:
+        raise ValueError(f"Unknown stage '{stage}' in model tiers (expected one of: {', '.join(STAGES)})")
+    if not isinstance(tier, dict):
+        raise ValueError(f"Model tier for stage '{stage}' must be an object, got {type(tier).__name__}")
+    unknown = set(tier) - set(TIER_SETTINGS)
+    if unknown:
+        raise ValueError(f"Unknown settings for stage '{stage}': {', '.join(sorted(unknown))}")
+    validated = {}
+    if tier.get("model") is not None:
+        validated["model"] = str(tier["model"])
+    if tier.get("max_tokens") is not None:
+        validated["max_tokens"] = int(tier["max_tokens"])
+    if tier.get("temperature") is not None:
+        validated["temperature"] = float(tier["temperature"])
+    return validated
+
+
+def load_model_tiers(path: str) -> Dict[str, Dict[str, Any]]:
+    """Read a tier file: {"<stage>": {"model": ..., "max_tokens": ..., "temperature": ...}, ...}
+
+    Every setting is optional and falls back to the client's default LM
+    (claude-3-haiku, max_tokens=4000, temperature=0.1). Keys starting with
+    an underscore are ignored (comments).
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Model tier file not found: {path}")
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON in model tier file {path}: {e}")
+    if not isinstance(data, dict):
+        raise ValueError(f"Model tier file {path} must contain a JSON object keyed by stage")
+    return {stage: _validate_tier(stage, tier) for stage, tier in data.items() if not stage.startswith("_")}
+
+
+def parse_stage_overrides(overrides: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """Tiers from STAGE=MODEL[:MAX_TOKENS[:TEMPERATURE]] strings (the --stage-model flag)"""
+    tiers = {}
+    for override in overrides:
+        stage, separator, spec = override.partition("=")
+        if not separator or not spec:
+            raise ValueError(f"Invalid --stage-model '{override}' (expected STAGE=MODEL[:MAX_TOKENS[:TEMPERATURE]])")
+        # Split from the right: model names themselves may contain ':' (e.g. OpenRouter ':free' variants)
+        parts = spec.split(":")
+        numbers = []
+        while len(parts) > 1 and len(numbers) < 2 and _is_number(parts[-1]):
+            numbers.insert(0, parts.pop())
+        tier = {"model": ":".join(parts)}
+        if numbers:
+            tier["max_tokens"] = numbers[0]
+        if len(numbers) > 1:
+            tier["temperature"] = numbers[1]
+        tiers[stage.strip()] = _validate_tier(stage.strip(), tier)
+    return tiers
+
+
+def _is_number(text: str) -> bool:
+    try:
+        float(text)
+        return True
+    except ValueError:
+        return False
+
+
+def merge_tiers(*tier_sets: Optional[Dict[str, Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+    """Later tier sets override earlier ones setting by setting"""
+    merged: Dict[str, Dict[str, Any]] = {}
+    for tiers in tier_sets:
+        for stage, tier in (tiers or {}).items():
+            merged.setdefault(stage, {}).update(tier)
+    return merged
+
+
+def add_tier_arguments(parser):
+    """--model-tiers / --stage-model options shared by the generator and judge CLIs"""
+    parser.add_argument(
+        '--model-tiers',
+        type=str,
+        default=None,
+        metavar='PATH',
+        help=f'JSON file mapping stages to model, max_tokens and temperature (e.g. {DEFAULT_TIERS_FILE}); '
+             'stages not listed use the default model'
+    )
+    parser.add_argument(
+        '--stage-model',
+        action='append',
+        default=[],
+        metavar='STAGE=MODEL[:MAX_TOKENS[:TEMPERATURE]]',
+        help=f'Override one stage\'s tier, repeatable. MODEL may carry a provider prefix '
+             f'(openrouter/, vertex_ai/, local/). Stages: {", ".join(STAGES)}'
+    )
+
+
+def model_tiers_from_args(args) -> Optional[Dict[str, Dict[str, Any]]]:
+    """Tiers from add_tier_arguments() options, None when neither flag was given"""
+    path = getattr(args, 'model_tiers', None)
+    overrides = getattr(args, 'stage_model', None) or []
+    if not path and not overrides:
+        return None
+    return merge_tiers(load_model_tiers(path) if path else None, parse_stage_overrides(overrides))
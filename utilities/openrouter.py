@@ -1,11 +1,114 @@
 import os
 import time
+import asyncio
+import threading
+import weakref
 import dspy
-from typing import Optional, Any
+from typing import Optional, Any, Dict
 import random
-import requests
+import httpx
 import json
 
+from utilities.lm_response import completion_response
+
+OPENROUTER_API_URL = "https://openrouter.ai/api/v1"
+
+# Connections kept open to OpenRouter (shared by every thread) and the default request timeout;
+# OPENROUTER_POOL_SIZE / OPENROUTER_TIMEOUT override them
+DEFAULT_POOL_SIZE = 32
+DEFAULT_TIMEOUT = 60.0
+CONNECT_TIMEOUT = 10.0
+
+
+def load_openrouter_api_key() -> Optional[str]:
+    """OpenRouter API key from ./secret/LLAMA_API_KEY.txt, else the OPENROUTER_API_KEY environment variable"""
+    try:
+        with open("./secret/LLAMA_API_KEY.txt", "r") as f:
+            api_key = f.read().strip()
+            if api_key:
+                return api_key
+    except Exception:
+        pass
+    return os.environ.get('OPENROUTER_API_KEY')
+
+
+def _http2_available() -> bool:
+    """HTTP/2 needs the optional h2 package (pip install httpx[http2])"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class OpenRouterSession:
+    """Keep-alive connection pool for OpenRouter requests, shared by every OpenRouterLM in the process.
+
+    The sync client is an httpx.Client, which is thread-safe, so fallback calls
+    from executor threads reuse warm TCP/TLS connections instead of a new
+    handshake per request. Async calls get an httpx.AsyncClient per event loop
+    (main.py runs generation and judging under separate asyncio.run calls).
+    HTTP/2 is used when h2 is installed.
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, pool_size: Optional[int] = None, timeout: Optional[float] = None):
+        self.pool_size = pool_size or int(os.environ.get('OPENROUTER_POOL_SIZE', DEFAULT_POOL_SIZE))
+        self.timeout = timeout or float(os.environ.get('OPENROUTER_TIMEOUT', DEFAULT_TIMEOUT))
+        self.http2 = _http2_available()
+        self._limits = httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
+        self.client = httpx.Client(limits=self._limits, timeout=self._timeout(self.timeout), http2=self.http2)
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls) -> "OpenRouterSession":
+        """Process-wide session used by every OpenRouterLM unless one is passed explicitly"""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    @staticmethod
+    def _timeout(seconds: float) -> httpx.Timeout:
+        return httpx.Timeout(seconds, connect=min(CONNECT_TIMEOUT, seconds))
+    
+    def _request_timeout(self, seconds: Optional[float]):
+        """Per-request timeout, else the pool's default"""
+        return self._timeout(seconds) if seconds else httpx.USE_CLIENT_DEFAULT
+
+    def async_client(self) -> httpx.AsyncClient:
+        """Pooled async client of the running event loop"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                client = httpx.AsyncClient(limits=self._limits, timeout=self._timeout(self.timeout), http2=self.http2)
+                self._async_clients[loop] = client
+            return client
+
+    def post(self, url: str, headers: Dict[str, str], data: dict, timeout: Optional[float] = None) -> dict:
+        """POST JSON on a pooled connection and return the decoded response"""
+        response = self.client.post(url, headers=headers, json=data, timeout=self._request_timeout(timeout))
+        response.raise_for_status()
+        return response.json()
+
+    async def apost(self, url: str, headers: Dict[str, str], data: dict, timeout: Optional[float] = None) -> dict:
+        """Async POST on the running loop's pooled client"""
+        response = await self.async_client().post(url, headers=headers, json=data,
+                                                  timeout=self._request_timeout(timeout))
+        response.raise_for_status()
+        return response.json()
+
+    def get(self, url: str, headers: Dict[str, str]) -> dict:
+        response = self.client.get(url, headers=headers)
+        response.raise_for_status()
+        return response.json()
+
 
 class OpenRouterLM(dspy.BaseLM):
     """Custom DSPy Language Model for OpenRouter API"""
@@ -15,44 +118,37 @@ class OpenRouterLM(dspy.BaseLM):
                  temperature: float = 0.1, 
                  max_tokens: int = 4000,
                  cache: bool = True,
+                 session: Optional[OpenRouterSession] = None,
+                 timeout: Optional[float] = None,
                  **kwargs):
+        """timeout = seconds per request (default: the session's); a call's own timeout= overrides it"""
         super().__init__(model=model)
         self.model = model
         self.api_key = api_key or self._get_api_key()
         self.temperature = temperature
         self.max_tokens = max_tokens
         self.cache = cache
-        self.api_url = "https://openrouter.ai/api/v1/chat/completions"
+        self.api_url = f"{OPENROUTER_API_URL}/chat/completions"
+        self.session = session or OpenRouterSession.shared()
+        self.timeout = timeout
         self.kwargs = kwargs
         
     def _get_api_key(self) -> str:
         """Retrieve API key from file or environment variable"""
-        # First try to read from file (as shown in your example)
-        try:
-            with open("./secret/LLAMA_API_KEY.txt", "r") as f:
-                api_key = f.read().strip()
-                if api_key:
-                    return api_key
-        except FileNotFoundError:
-            pass
-        except Exception:
-            pass
-            
-        # Fall back to environment variable
-        api_key = os.environ.get('OPENROUTER_API_KEY')
+        api_key = load_openrouter_api_key()
         if not api_key:
             raise ValueError("OpenRouter API key not found. Please create './secret/LLAMA_API_KEY.txt' with your API key or set OPENROUTER_API_KEY environment variable")
         return api_key
     
-    def basic_request(self, prompt: str, **kwargs) -> str:
-        """Make a basic request to OpenRouter API"""
-        headers = {
+    def _headers(self) -> Dict[str, str]:
+        return {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
             "HTTP-Referer": "https://github.com/stanfordnlp/dspy",  # Optional: for OpenRouter analytics
             "X-Title": "DSPy OpenRouter Client"  # Optional: for OpenRouter analytics
         }
-        
+    
+    def _basic_data(self, prompt: str, kwargs: dict) -> dict:
         # Combine default parameters with call-specific ones
         request_params = {
             "temperature": self.temperature,
@@ -61,31 +157,15 @@ class OpenRouterLM(dspy.BaseLM):
             **kwargs
         }
         
-        data = {
+        return {
             "model": self.model,
             "messages": [
                 {"role": "user", "content": prompt}
             ],
             **request_params
         }
-        
-        try:
-            response = requests.post(self.api_url, headers=headers, json=data, timeout=60)
-            response.raise_for_status()
-            
-            response_data = response.json()
-            if 'choices' in response_data and len(response_data['choices']) > 0:
-                return response_data['choices'][0]['message']['content']
-            else:
-                raise Exception(f"Invalid response format: {response_data}")
-                
-        except requests.exceptions.RequestException as e:
-            raise Exception(f"OpenRouter API request failed: {str(e)}")
-        except json.JSONDecodeError as e:
-            raise Exception(f"Failed to parse OpenRouter response: {str(e)}")
     
-    def __call__(self, prompt: str = None, messages: list = None, **kwargs) -> list[str]:
-        """DSPy-compatible call method"""
+    def _call_data(self, prompt: Optional[str], messages: Optional[list], kwargs: dict) -> dict:
         if messages:
             # Convert DSPy messages format to OpenRouter format
             if isinstance(messages, list) and len(messages) > 0:
@@ -98,13 +178,6 @@ class OpenRouterLM(dspy.BaseLM):
         else:
             formatted_messages = [{"role": "user", "content": prompt}]
         
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-            "HTTP-Referer": "https://github.com/stanfordnlp/dspy",
-            "X-Title": "DSPy OpenRouter Client"
-        }
-        
         request_params = {
             "temperature": kwargs.get('temperature', self.temperature),
             "max_tokens": kwargs.get('max_tokens', self.max_tokens),
@@ -112,35 +185,76 @@ class OpenRouterLM(dspy.BaseLM):
             **{k: v for k, v in kwargs.items() if k not in ['messages', 'prompt']}
         }
         
-        data = {
+        return {
             "model": self.model,
             "messages": formatted_messages,
             **request_params
         }
-        
+    
+    @staticmethod
+    def _choices(response_data: dict) -> list[str]:
+        if 'choices' in response_data and len(response_data['choices']) > 0:
+            return [choice['message']['content'] for choice in response_data['choices']]
+        raise Exception(f"Invalid response format: {response_data}")
+    
+    def _request(self, data: dict, timeout: Optional[float]) -> dict:
         try:
-            response = requests.post(self.api_url, headers=headers, json=data, timeout=60)
-            response.raise_for_status()
-            
-            response_data = response.json()
-            if 'choices' in response_data and len(response_data['choices']) > 0:
-                # Return list of strings as expected by DSPy
-                return [choice['message']['content'] for choice in response_data['choices']]
-            else:
-                raise Exception(f"Invalid response format: {response_data}")
-                
-        except requests.exceptions.RequestException as e:
+            return self.session.post(self.api_url, self._headers(), data, timeout or self.timeout)
+        except httpx.HTTPError as e:
+            raise Exception(f"OpenRouter API request failed: {str(e)}")
+        except json.JSONDecodeError as e:
+            raise Exception(f"Failed to parse OpenRouter response: {str(e)}")
+    
+    async def _arequest(self, data: dict, timeout: Optional[float]) -> dict:
+        try:
+            return await self.session.apost(self.api_url, self._headers(), data, timeout or self.timeout)
+        except httpx.HTTPError as e:
             raise Exception(f"OpenRouter API request failed: {str(e)}")
         except json.JSONDecodeError as e:
             raise Exception(f"Failed to parse OpenRouter response: {str(e)}")
+    
+    def _completion(self, response_data: dict):
+        """The response as the OpenAI-format completion DSPy expects from forward(), usage included"""
+        return completion_response(self._choices(response_data)[0], response_data.get("usage") or {},
+                                   response_data.get("model", self.model))
+    
+    def forward(self, prompt=None, messages=None, timeout: Optional[float] = None, **kwargs):
+        """BaseLM request path, used when the LM is wrapped (e.g. in a GovernedLM)"""
+        return self._completion(self._request(self._call_data(prompt, messages, kwargs), timeout))
+    
+    async def aforward(self, prompt=None, messages=None, timeout: Optional[float] = None, **kwargs):
+        return self._completion(await self._arequest(self._call_data(prompt, messages, kwargs), timeout))
+    
+    def basic_request(self, prompt: str, timeout: Optional[float] = None, **kwargs) -> str:
+        """Make a basic request to OpenRouter API"""
+        return self._choices(self._request(self._basic_data(prompt, kwargs), timeout))[0]
+    
+    async def abasic_request(self, prompt: str, timeout: Optional[float] = None, **kwargs) -> str:
+        """Async basic_request() on the event loop's pooled client"""
+        return self._choices(await self._arequest(self._basic_data(prompt, kwargs), timeout))[0]
+    
+    def __call__(self, prompt: str = None, messages: list = None, timeout: Optional[float] = None,
+                 **kwargs) -> list[str]:
+        """DSPy-compatible call method"""
+        # Return list of strings as expected by DSPy
+        return self._choices(self._request(self._call_data(prompt, messages, kwargs), timeout))
+    
+    async def acall(self, prompt: str = None, messages: list = None, timeout: Optional[float] = None,
+                    **kwargs) -> list[str]:
+        """DSPy-compatible async call (Predict.acall), without a worker thread"""
+        return self._choices(await self._arequest(self._call_data(prompt, messages, kwargs), timeout))
 
 
 class OpenRouterClient:
     """OpenRouter client similar to ClaudeClient for DSPy integration"""
     
     def __init__(self, model: str = '', api_key: Optional[str] = None, 
-                 cache: bool = True, **kwargs):
-        """Initialize DSPy with OpenRouter using custom or file-based API key"""
+                 cache: bool = True, configure_dspy: bool = True, **kwargs):
+        """Initialize DSPy with OpenRouter using custom or file-based API key.
+        
+        configure_dspy=False leaves DSPy's global settings alone; the caller
+        passes self.lm to each predictor call instead (ClaudeClient fallback).
+        """
         # Popular OpenRouter models with their costs (approximate)
         model_default = "meta-llama/llama-3.1-8b-instruct:free"  # Free model
         # model_default = "meta-llama/llama-3-70b-instruct"      # ~$0.59/$0.79 per MTok
@@ -165,7 +279,8 @@ class OpenRouterClient:
         )
         
         # Configure DSPy with our custom LM
-        dspy.settings.configure(lm=self.lm, cache=self.cache)
+        if configure_dspy:
+            dspy.settings.configure(lm=self.lm, cache=self.cache)
     
     def generate(self, prompt: str, max_tokens: int = 2000, temperature: float = 0.1) -> Optional[str]:
         """Generate response with retry logic"""
@@ -189,6 +304,22 @@ class OpenRouterClient:
         
         return None
     
+    async def agenerate(self, prompt: str, max_tokens: int = 2000, temperature: float = 0.1) -> Optional[str]:
+        """Async generate() on the pooled async client, same retry logic"""
+        for attempt in range(self.max_retries):
+            try:
+                return await self.lm.abasic_request(prompt=prompt, max_tokens=max_tokens, temperature=temperature)
+            except Exception as e:
+                error_msg = f"API Call Failed (Attempt {attempt + 1}/{self.max_retries}): {str(e)}"
+                print(f"\033[91m{error_msg}\033[0m")  # Print in RED
+                
+                if attempt < self.max_retries - 1:
+                    await asyncio.sleep(self.retry_delay)
+                else:
+                    raise Exception(f"Failed after {self.max_retries} attempts: {str(e)}")
+        
+        return None
+    
     def list_models(self) -> list:
         """List available models from OpenRouter (requires API key)"""
         try:
@@ -196,9 +327,7 @@ class OpenRouterClient:
                 "Authorization": f"Bearer {self.lm.api_key}",
                 "Content-Type": "application/json"
             }
-            response = requests.get("https://openrouter.ai/api/v1/models", headers=headers)
-            response.raise_for_status()
-            return response.json().get('data', [])
+            return self.lm.session.get(f"{OPENROUTER_API_URL}/models", headers).get('data', [])
         except Exception as e:
             print(f"Failed to fetch models: {e}")
             return []
@@ -209,8 +338,8 @@ class OpenRouterClientV2:
     """Alternative OpenRouter client using dspy.LM with custom base URL"""
     
     def __init__(self, model: str = '', api_key: Optional[str] = None, 
-                 cache: bool = True, **kwargs):
-        """Initialize DSPy with OpenRouter using dspy.LM"""
+                 cache: bool = True, configure_dspy: bool = True, **kwargs):
+        """Initialize DSPy with OpenRouter using dspy.LM (see OpenRouterClient for configure_dspy)"""
         model_default = "meta-llama/llama-3.1-8b-instruct:free"
         
         self.model = model if model else model_default
@@ -231,24 +360,17 @@ class OpenRouterClientV2:
                 api_base="https://openrouter.ai/api/v1",  # This may or may not be supported
                 **kwargs
             )
-            dspy.settings.configure(lm=self.lm, cache=self.cache)
+            if configure_dspy:
+                dspy.settings.configure(lm=self.lm, cache=self.cache)
         except Exception as e:
             print(f"Warning: dspy.LM approach failed ({e}), falling back to custom implementation")
             # Fall back to the custom implementation
             self.__init__ = OpenRouterClient.__init__
-            self.__init__(model, api_key, cache, **kwargs)
+            self.__init__(model, api_key, cache, configure_dspy, **kwargs)
     
     def _get_api_key(self) -> str:
         """Retrieve API key from file or environment variable"""
-        try:
-            with open("./secret/LLAMA_API_KEY.txt", "r") as f:
-                api_key = f.read().strip()
-                if api_key:
-                    return api_key
-        except (FileNotFoundError, Exception):
-            pass
-            
-        api_key = os.environ.get('OPENROUTER_API_KEY')
+        api_key = load_openrouter_api_key()
         if not api_key:
             raise ValueError("OpenRouter API key not found")
         return api_key
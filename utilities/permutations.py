@@ -0,0 +1,43 @@
+"""Seeded permutations for position-bias shuffles, reproducible across runs and processes
+
+The judges shuffle category and factor lists so the LLM does not favour
+whatever comes first. Drawing those orders from `random` made every prompt
+unique, so no response cache, provider prompt cache or cassette could match a
+re-run. Orders are derived from a stable hash of (run seed, what is being
+shuffled, the joke) instead: each joke still gets its own order, and
+evaluating the same joke with the same --seed gives the same prompt.
+"""
+
+import hashlib
+import json
+import random
+from typing import Any, List, Sequence, TypeVar
+
+T = TypeVar("T")
+
+DEFAULT_SEED = 0
+
+
+def stable_rng(*key: Any) -> random.Random:
+    """random.Random seeded from a hash of key, the same in every process (unlike hash())"""
+    payload = json.dumps([str(part) for part in key])
+    return random.Random(int(hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16], 16))
+
+
+def seeded_permutation(items: Sequence[T], *key: Any) -> List[T]:
+    """A shuffled copy of items, in the order fixed by key (e.g. run seed, purpose, joke text)"""
+    shuffled = list(items)
+    stable_rng(*key).shuffle(shuffled)
+    return shuffled
+
+
+def seeded_choice(items: Sequence[T], *key: Any) -> T:
+    """The item fixed by key"""
+    return items[stable_rng(*key).randrange(len(items))]
+
+
+def add_seed_arguments(parser):
+    """--seed option shared by the generator and judge CLIs"""
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED,
+                        help=f'Run seed for the category/factor order shuffles; the same seed and jokes give the same '
+                             f'prompts, so re-runs hit the caches (default: {DEFAULT_SEED})')
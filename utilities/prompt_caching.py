@@ -0,0 +1,61 @@
+"""Provider-side prompt caching: static prompt prefixes marked with Anthropic cache_control"""
+
+from typing import Any, Dict, List, Type
+
+import dspy
+
+
+# Anthropic caches the prompt prefix up to each marked block for ~5 minutes (refreshed on every hit).
+# At most four marked blocks per request: we use the system message plus two in the user message.
+CACHE_CONTROL = {"type": "ephemeral"}
+
+
+def message_text(content: Any) -> str:
+    """Plain text of a chat message's content, whether a string or a list of content blocks"""
+    if isinstance(content, list):
+        return "".join(str(block.get("text", "")) if isinstance(block, dict) else str(block) for block in content)
+    return str(content or "")
+
+
+def cached_block(text: str) -> Dict[str, Any]:
+    return {"type": "text", "text": text, "cache_control": dict(CACHE_CONTROL)}
+
+
+class PromptCachingAdapter(dspy.ChatAdapter):
+    """ChatAdapter that lays out every request as cacheable static prefix + dynamic tail.
+
+    Signatures declare the inputs that change from call to call in a
+    `dynamic_inputs` ClassVar. All other inputs are static (instructions,
+    category lists, examples) and are sent first as separate user-message
+    blocks; the system message and the static blocks carry cache_control, so
+    repeated calls only pay full price for the dynamic tail (the joke text).
+    Signatures without `dynamic_inputs` are formatted exactly like ChatAdapter.
+
+    Prefixes shorter than the model's minimum (1024 tokens, 2048 for Haiku)
+    are silently not cached by the provider. OpenRouter passes the blocks on
+    to Anthropic and ignores cache_control for other models.
+    """
+
+    def format(self, signature: Type[dspy.Signature], demos: List[Dict[str, Any]],
+               inputs: Dict[str, Any]) -> List[Dict[str, Any]]:
+        messages = super().format(signature, demos, inputs)
+        dynamic = getattr(signature, "dynamic_inputs", None)
+        if not dynamic or demos or self._get_history_field_name(signature):
+            return messages
+
+        static_fields = [name for name in signature.input_fields if name not in dynamic and name in inputs]
+        blocks = [{"type": "text", "text": self.format_user_message_content(signature, {name: inputs[name]}) + "\n\n"}
+                  for name in static_fields]
+        if blocks:
+            # Breakpoints after the first static field (shared by every call of the signature) and after the
+            # last one (e.g. instruction + factor description, shared by every joke scored on that factor)
+            blocks[0]["cache_control"] = dict(CACHE_CONTROL)
+            blocks[-1]["cache_control"] = dict(CACHE_CONTROL)
+        dynamic_inputs = {name: value for name, value in inputs.items() if name not in static_fields}
+        blocks.append({"type": "text", "text": self.format_user_message_content(signature, dynamic_inputs,
+                                                                                main_request=True)})
+
+        system = messages[0]
+        system["content"] = [cached_block(message_text(system["content"]))]
+        messages[-1]["content"] = blocks
+        return messages
@@ -0,0 +1,209 @@
+"""Provider registry: one way to get async-capable DSPy LM handles for every model backend
+
+Model specs are "<provider>/<model>" (a bare model name means Anthropic):
+
+    claude-3-haiku-20240307                      Anthropic (ANTHROPIC_API_KEY)
+    openrouter/meta-llama/llama-3.1-8b-instruct  OpenRouter (OPENROUTER_API_KEY or ./secret/LLAMA_API_KEY.txt)
+    vertex_ai/gemini-1.5-flash                   Vertex AI (service account file, see VertexProvider)
+    local/qwen2.5-7b-instruct                    OpenAI-compatible server (llama.cpp, vLLM, ...), LOCAL_LLM_BASE_URL
+
+Every handle is a dspy.LM on litellm, so it supports the native async path
+(Predict.acall), streaming and response headers like the Claude LM does.
+Handles are cached per (model, credentials, settings), so repeated lookups
+reuse the same LM object and litellm's pooled HTTP client for that endpoint.
+Each provider has its own rate governor, since rate limits are per backend.
+"""
+
+import json
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import dspy
+
+from utilities.openrouter import load_openrouter_api_key
+from utilities.rate_governor import RateGovernor
+
+
+# Generation defaults shared by every backend (same as the Claude LM)
+DEFAULT_LM_SETTINGS = {"max_tokens": 4000, "temperature": 0.1}
+
+
+class Provider:
+    """A model backend: credentials, litellm route, cached LM handles and a rate governor"""
+
+    name = ""
+    route = ""  # litellm model prefix
+
+    def __init__(self):
+        self._handles: Dict[tuple, dspy.BaseLM] = {}
+        self._lock = threading.Lock()
+        self._governor: Optional[RateGovernor] = None
+
+    def api_key(self) -> Optional[str]:
+        return None
+
+    def connection_settings(self) -> Dict[str, Any]:
+        """Extra litellm arguments for this backend (endpoint, project, credentials)"""
+        return {}
+
+    def available(self) -> bool:
+        """Whether credentials for this backend are configured"""
+        return self.api_key() is not None
+
+    def new_governor(self) -> RateGovernor:
+        return RateGovernor()
+
+    def governor(self) -> RateGovernor:
+        """Process-wide governor for this backend's rate limits"""
+        with self._lock:
+            if self._governor is None:
+                self._governor = self.new_governor()
+            return self._governor
+
+    def create_lm(self, model: str, **settings) -> dspy.BaseLM:
+        return dspy.LM(model=f"{self.route}/{model}", **settings)
+
+    def get_lm(self, model: str, api_key: Optional[str] = None, **settings) -> dspy.BaseLM:
+        """Cached LM handle for a model of this backend.
+
+        Responses are cached by our own LLMCache and retries are left to the
+        governor and RetryPolicy, so litellm's cache and retries are off.
+        """
+        settings = {**DEFAULT_LM_SETTINGS, "cache": False, "num_retries": 0, **self.connection_settings(),
+                    **settings, "api_key": api_key or self.api_key()}
+        key = (model, json.dumps(settings, sort_keys=True, default=str))
+        with self._lock:
+            if key not in self._handles:
+                self._handles[key] = self.create_lm(model, **settings)
+            return self._handles[key]
+
+
+class AnthropicProvider(Provider):
+    name = "anthropic"
+    route = "anthropic"
+
+    def api_key(self) -> Optional[str]:
+        return os.environ.get('ANTHROPIC_API_KEY')
+
+    def new_governor(self) -> RateGovernor:
+        return RateGovernor.shared()
+
+
+class OpenRouterProvider(Provider):
+    name = "openrouter"
+    route = "openrouter"
+
+    def api_key(self) -> Optional[str]:
+        return load_openrouter_api_key()
+
+
+class VertexProvider(Provider):
+    """Gemini on Vertex AI with a service account file.
+
+    VERTEX_CREDENTIALS_FILE (else GOOGLE_APPLICATION_CREDENTIALS, else
+    ./secret/vertex_key.json); the project is read from the file once,
+    VERTEX_LOCATION defaults to us-central1. litellm keeps the authorized
+    credentials between calls.
+    """
+    name = "vertex_ai"
+    route = "vertex_ai"
+
+    def __init__(self):
+        super().__init__()
+        self._project: Optional[str] = None
+
+    def credentials_file(self) -> str:
+        return (os.environ.get('VERTEX_CREDENTIALS_FILE') or os.environ.get('GOOGLE_APPLICATION_CREDENTIALS')
+                or "./secret/vertex_key.json")
+
+    def available(self) -> bool:
+        return os.path.exists(self.credentials_file())
+
+    def connection_settings(self) -> Dict[str, Any]:
+        path = self.credentials_file()
+        if self._project is None:
+            with open(path, "r") as f:
+                self._project = json.load(f).get("project_id")
+            if not self._project:
+                raise ValueError(f"Key 'project_id' not found in service account file {path}")
+        return {
+            "vertex_credentials": path,
+            "vertex_project": self._project,
+            "vertex_location": os.environ.get('VERTEX_LOCATION', "us-central1")
+        }
+
+
+class LocalLM(dspy.LM):
+    """LM on a self-hosted OpenAI-compatible server: responses are marked free for usage accounting"""
+
+    price_multiplier = 0.0  # Also applied to streamed responses (utilities.streaming)
+
+    def _mark_free(self, response):
+        hidden = getattr(response, "_hidden_params", None)
+        if isinstance(hidden, dict):
+            hidden["price_multiplier"] = self.price_multiplier
+        return response
+
+    def forward(self, prompt=None, messages=None, **kwargs):
+        return self._mark_free(super().forward(prompt=prompt, messages=messages, **kwargs))
+
+    async def aforward(self, prompt=None, messages=None, **kwargs):
+        return self._mark_free(await super().aforward(prompt=prompt, messages=messages, **kwargs))
+
+
+class LocalProvider(Provider):
+    """Any OpenAI-compatible endpoint: llama.cpp server, vLLM, Ollama, LM Studio.
+
+    LOCAL_LLM_BASE_URL (default http://localhost:8000/v1), optional
+    LOCAL_LLM_API_KEY, and LOCAL_LLM_MAX_IN_FLIGHT concurrent requests
+    (default 8, the server's batch slots) instead of API rate limits.
+    """
+    name = "local"
+    route = "openai"
+
+    def api_key(self) -> Optional[str]:
+        return os.environ.get('LOCAL_LLM_API_KEY', "local")  # Most local servers ignore the key
+
+    def connection_settings(self) -> Dict[str, Any]:
+        return {"api_base": os.environ.get('LOCAL_LLM_BASE_URL', "http://localhost:8000/v1")}
+
+    def new_governor(self) -> RateGovernor:
+        max_in_flight = int(os.environ.get('LOCAL_LLM_MAX_IN_FLIGHT', 8))
+        return RateGovernor(requests_per_minute=1e6, tokens_per_minute=1e9, max_in_flight=max_in_flight,
+                            learn_limits=False)
+
+    def create_lm(self, model: str, **settings) -> dspy.BaseLM:
+        return LocalLM(model=f"{self.route}/{model}", **settings)
+
+
+PROVIDERS: Dict[str, Provider] = {}
+
+
+def register_provider(provider: Provider):
+    """Add (or replace) a backend under its name, the prefix used in model specs"""
+    PROVIDERS[provider.name] = provider
+
+
+for _provider in (AnthropicProvider(), OpenRouterProvider(), VertexProvider(), LocalProvider()):
+    register_provider(_provider)
+
+
+def get_provider(name: str) -> Provider:
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown provider '{name}' (available: {', '.join(PROVIDERS)})")
+    return PROVIDERS[name]
+
+
+def resolve_model(spec: str) -> Tuple[Provider, str]:
+    """(provider, model name) for a model spec; names without a known provider prefix are Anthropic models"""
+    prefix, separator, model = spec.partition("/")
+    if separator and prefix in PROVIDERS:
+        return PROVIDERS[prefix], model
+    return PROVIDERS["anthropic"], spec
+
+
+def provider_lm(spec: str, **settings) -> Tuple[dspy.BaseLM, RateGovernor]:
+    """Cached LM handle for a model spec and the governor of its backend"""
+    provider, model = resolve_model(spec)
+    return provider.get_lm(model, **settings), provider.governor()
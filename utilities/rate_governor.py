@@ -0,0 +1,290 @@
+"""Process-wide adaptive rate governor for LLM traffic"""
+
+import asyncio
+import math
+import threading
+import time
+from typing import Any, Dict, Optional
+
+
+# Header names (lower-case, without litellm's "llm_provider-" prefix) that carry
+# the provider's advertised limits. Anthropic names first, OpenAI-style aliases second.
+REQUEST_LIMIT_HEADERS = ("anthropic-ratelimit-requests-limit", "x-ratelimit-limit-requests")
+REQUEST_REMAINING_HEADERS = ("anthropic-ratelimit-requests-remaining", "x-ratelimit-remaining-requests")
+TOKEN_LIMIT_HEADERS = ("anthropic-ratelimit-tokens-limit", "anthropic-ratelimit-input-tokens-limit",
+                       "x-ratelimit-limit-tokens")
+TOKEN_REMAINING_HEADERS = ("anthropic-ratelimit-tokens-remaining", "anthropic-ratelimit-input-tokens-remaining",
+                           "x-ratelimit-remaining-tokens")
+
+# Status codes that mean "slow down": 429 rate limited, 529 Anthropic overloaded
+THROTTLE_STATUS_CODES = (429, 529)
+
+
+def estimate_tokens(prompt: Optional[str] = None, messages: Optional[list] = None) -> int:
+    """Rough input token estimate (~4 characters per token) used to pre-charge the token bucket"""
+    chars = len(prompt or "")
+    for message in messages or []:
+        content = message.get("content", "") if isinstance(message, dict) else str(message)
+        if isinstance(content, list):
+            # Content blocks ({"type": "text", "text": ...})
+            chars += sum(len(str(block.get("text", ""))) if isinstance(block, dict) else len(str(block))
+                         for block in content)
+        else:
+            chars += len(str(content))
+    return max(1, chars // 4)
+
+
+def response_headers(response: Any) -> Dict[str, str]:
+    """Extract provider response headers from a litellm response, normalized to lower-case"""
+    hidden = getattr(response, "_hidden_params", None) or {}
+    raw = hidden.get("additional_headers") or hidden.get("headers") or {}
+    headers = {}
+    for key, value in dict(raw).items():
+        name = str(key).lower()
+        if name.startswith("llm_provider-"):
+            name = name[len("llm_provider-"):]
+        headers[name] = value
+    return headers
+
+
+def response_total_tokens(response: Any) -> Optional[int]:
+    """Total (input + output) tokens reported by the provider, if any"""
+    usage = getattr(response, "usage", None)
+    if usage is None and isinstance(response, dict):
+        usage = response.get("usage")
+    if not usage:
+        return None
+    usage = usage if isinstance(usage, dict) else dict(usage)
+    total = usage.get("total_tokens")
+    if total is None:
+        total = (usage.get("prompt_tokens") or 0) + (usage.get("completion_tokens") or 0)
+    return int(total) if total else None
+
+
+def is_throttle_error(error: Exception) -> bool:
+    """True for 429 (rate limited) and 529 (overloaded) responses"""
+    status = getattr(error, "status_code", None)
+    if status in THROTTLE_STATUS_CODES:
+        return True
+    message = str(error).lower()
+    return "rate limit" in message or "rate_limit" in message or "overloaded" in message
+
+
+def error_retry_after(error: Exception) -> Optional[float]:
+    """Read the retry-after hint from a provider error, if the exception carries headers"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or getattr(error, "litellm_response_headers", None) or {}
+    try:
+        value = dict(headers).get("retry-after") or dict(headers).get("Retry-After")
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _first_number(headers: Dict[str, str], names: tuple) -> Optional[float]:
+    for name in names:
+        if name in headers:
+            try:
+                return float(headers[name])
+            except (TypeError, ValueError):
+                continue
+    return None
+
+
+class RateGovernor:
+    """Shared pacing for every LLM request: RPM, TPM and max in-flight, adjusted AIMD-style.
+
+    Limits start at the configured ceilings. Every throttle response (429/529)
+    halves the working limits and pauses traffic for the provider's retry-after;
+    every success adds a small step back towards the ceiling. When the provider
+    advertises its own limits in rate-limit headers those replace the ceilings,
+    so a large run settles just under the real limit instead of oscillating
+    between idle and throttled.
+
+    State is guarded by a threading lock and waiting is done with plain sleeps,
+    so one governor can be shared by threads and by successive event loops
+    (main.py runs generation and judging under separate asyncio.run calls).
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, requests_per_minute: float = 50, tokens_per_minute: float = 50000,
+                 max_in_flight: int = 16, decrease_factor: float = 0.5,
+                 increase_fraction: float = 0.02, burst_seconds: float = 5.0,
+                 default_pause: float = 2.0, headroom: float = 0.9, learn_limits: bool = True):
+        self._lock = threading.Lock()
+        self.learn_limits = learn_limits  # Replace the ceilings with limits advertised in response headers
+
+        # Ceilings (configured, or learned from rate-limit headers)
+        self.rpm_ceiling = float(requests_per_minute)
+        self.tpm_ceiling = float(tokens_per_minute)
+        self.in_flight_ceiling = float(max_in_flight)
+
+        # Working limits that AIMD moves between a floor and the ceilings
+        self.rpm_limit = self.rpm_ceiling
+        self.tpm_limit = self.tpm_ceiling
+        self.in_flight_limit = self.in_flight_ceiling
+
+        self.decrease_factor = decrease_factor
+        self.increase_fraction = increase_fraction
+        self.burst_seconds = burst_seconds
+        self.default_pause = default_pause
+        self.headroom = headroom  # Fraction of an advertised limit we aim for
+
+        # Token buckets (start full) and bookkeeping
+        self._request_tokens = self._request_capacity()
+        self._token_tokens = self._token_capacity()
+        self._last_refill = time.monotonic()
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self.in_flight = 0
+        self.throttle_count = 0
+        self.request_count = 0
+
+    @classmethod
+    def shared(cls) -> "RateGovernor":
+        """Process-wide governor used by every ClaudeClient unless one is passed explicitly"""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    @classmethod
+    def unbounded(cls) -> "RateGovernor":
+        """Governor that never delays requests, for backends with their own queueing (message batches)"""
+        return cls(requests_per_minute=1e9, tokens_per_minute=1e12, max_in_flight=10 ** 6, learn_limits=False)
+
+    def _request_capacity(self) -> float:
+        return max(1.0, self.rpm_limit / 60.0 * self.burst_seconds)
+
+    def _token_capacity(self) -> float:
+        return max(1.0, self.tpm_limit / 60.0 * self.burst_seconds)
+
+    def _refill(self, now: float):
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self._request_tokens = min(self._request_capacity(),
+                                   self._request_tokens + elapsed * self.rpm_limit / 60.0)
+        self._token_tokens = min(self._token_capacity(),
+                                 self._token_tokens + elapsed * self.tpm_limit / 60.0)
+
+    def _try_reserve(self, estimated_tokens: int) -> float:
+        """Reserve capacity for one request. Returns 0 on success, else seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+
+            if now < self._paused_until:
+                return self._paused_until - now
+            if self.in_flight >= max(1, math.floor(self.in_flight_limit)):
+                return 0.05  # Poll until an in-flight request finishes
+            if self._request_tokens < 1.0:
+                return (1.0 - self._request_tokens) * 60.0 / self.rpm_limit
+
+            # Never require more than a full bucket, otherwise big prompts would wait forever
+            needed = min(float(estimated_tokens), self._token_capacity())
+            if self._token_tokens < needed:
+                return (needed - self._token_tokens) * 60.0 / self.tpm_limit
+
+            self._request_tokens -= 1.0
+            self._token_tokens -= estimated_tokens
+            self.in_flight += 1
+            self.request_count += 1
+            return 0.0
+
+    def try_acquire(self, estimated_tokens: int = 1) -> float:
+        """Reserve capacity without waiting: 0 when the request may be sent, else seconds to wait"""
+        return self._try_reserve(estimated_tokens)
+
+    async def acquire(self, estimated_tokens: int = 1):
+        """Wait (without blocking the event loop) until the request may be sent"""
+        while True:
+            wait = self._try_reserve(estimated_tokens)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def acquire_blocking(self, estimated_tokens: int = 1):
+        """Synchronous variant of acquire() for the sync LM path"""
+        while True:
+            wait = self._try_reserve(estimated_tokens)
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    def release(self, estimated_tokens: int, response: Any = None, error: Optional[Exception] = None):
+        """Finish a request: reconcile token usage and feed the outcome back into AIMD"""
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+
+            if error is not None:
+                if is_throttle_error(error):
+                    self._on_throttle(error_retry_after(error))
+                return
+
+            actual_tokens = response_total_tokens(response)
+            if actual_tokens is not None:
+                # Charge (or refund) the difference between estimate and actual usage
+                self._token_tokens -= actual_tokens - estimated_tokens
+
+            self._on_success(response_headers(response) if self.learn_limits else {})
+
+    def _on_throttle(self, retry_after: Optional[float]):
+        """Multiplicative decrease and a pause, called with the lock held"""
+        self.throttle_count += 1
+        now = time.monotonic()
+        pause = retry_after if retry_after is not None else self.default_pause
+        self._paused_until = max(self._paused_until, now + pause)
+        
+        # Requests that were already in flight fail together; count that as one congestion event
+        if now - self._last_decrease < pause:
+            return
+        self._last_decrease = now
+        
+        self.rpm_limit = max(1.0, self.rpm_limit * self.decrease_factor)
+        self.tpm_limit = max(1000.0, self.tpm_limit * self.decrease_factor)
+        self.in_flight_limit = max(1.0, self.in_flight_limit * self.decrease_factor)
+        self._request_tokens = min(self._request_tokens, 0.0)
+        self._token_tokens = min(self._token_tokens, 0.0)
+        print(f"\033[93m⏳ Rate governor: throttled, pausing {pause:.1f}s "
+              f"(RPM {self.rpm_limit:.0f}, TPM {self.tpm_limit:.0f}, in-flight {self.in_flight_limit:.0f})\033[0m")
+
+    def _on_success(self, headers: Dict[str, str]):
+        """Learn advertised limits from headers and apply additive increase, called with the lock held"""
+        request_limit = _first_number(headers, REQUEST_LIMIT_HEADERS)
+        token_limit = _first_number(headers, TOKEN_LIMIT_HEADERS)
+        if request_limit:
+            self.rpm_ceiling = request_limit * self.headroom
+        if token_limit:
+            self.tpm_ceiling = token_limit * self.headroom
+
+        # Don't grow into a limit the provider says is nearly exhausted
+        request_remaining = _first_number(headers, REQUEST_REMAINING_HEADERS)
+        token_remaining = _first_number(headers, TOKEN_REMAINING_HEADERS)
+        if request_remaining is not None:
+            self._request_tokens = min(self._request_tokens, request_remaining)
+        if token_remaining is not None:
+            self._token_tokens = min(self._token_tokens, token_remaining)
+        near_limit = ((request_limit and request_remaining is not None and request_remaining < 0.1 * request_limit)
+                      or (token_limit and token_remaining is not None and token_remaining < 0.1 * token_limit))
+
+        if not near_limit:
+            self.rpm_limit = min(self.rpm_ceiling, self.rpm_limit + max(1.0, self.rpm_ceiling * self.increase_fraction))
+            self.tpm_limit = min(self.tpm_ceiling, self.tpm_limit + max(100.0, self.tpm_ceiling * self.increase_fraction))
+            self.in_flight_limit = min(self.in_flight_ceiling, self.in_flight_limit + 1.0 / max(1.0, self.in_flight_limit))
+        else:
+            self.rpm_limit = min(self.rpm_limit, self.rpm_ceiling)
+            self.tpm_limit = min(self.tpm_limit, self.tpm_ceiling)
+
+    def snapshot(self) -> dict:
+        """Current limits and counters, for logging"""
+        with self._lock:
+            return {
+                "rpm_limit": round(self.rpm_limit, 1),
+                "tpm_limit": round(self.tpm_limit, 1),
+                "in_flight_limit": round(self.in_flight_limit, 2),
+                "in_flight": self.in_flight,
+                "requests": self.request_count,
+                "throttles": self.throttle_count
+            }
@@ -0,0 +1,239 @@
+"""Unified retry policy shared by the judges and the generator"""
+
+import asyncio
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from utilities.rate_governor import is_throttle_error, error_retry_after
+
+
+# Error classes returned by classify_error()
+THROTTLE = "throttle"     # 429/529: retry after backing off
+TRANSIENT = "transient"   # Timeouts, connection errors, 5xx: retry
+PARSE = "parse"           # The model answered but the output didn't parse: retry
+FATAL = "fatal"           # Bad request, auth, not found: retrying cannot help
+
+FATAL_STATUS_CODES = (400, 401, 403, 404, 413, 422)
+FATAL_ERROR_NAMES = ("AuthenticationError", "PermissionDeniedError", "BadRequestError", "NotFoundError",
+                     "ContextWindowExceededError", "ContentPolicyViolationError", "UnsupportedParamsError",
+                     "RetryBudgetExceeded")
+PARSE_ERROR_NAMES = ("AdapterParseError", "ValidationError", "JSONDecodeError")
+
+
+class RetryBudgetExceeded(Exception):
+    """Raised when the per-run retry budget is spent"""
+
+
+def is_outage_error(error: Exception, kind: str) -> bool:
+    """Failures that suggest the provider is down (as opposed to us sending too fast)"""
+    if kind == TRANSIENT:
+        return True
+    return kind == THROTTLE and (getattr(error, "status_code", None) == 529 or "overloaded" in str(error).lower())
+
+
+def classify_error(error: Exception) -> str:
+    """Sort an exception into THROTTLE, TRANSIENT, PARSE or FATAL"""
+    if is_throttle_error(error):
+        return THROTTLE
+
+    name = type(error).__name__
+    status = getattr(error, "status_code", None)
+    if name in FATAL_ERROR_NAMES or status in FATAL_STATUS_CODES:
+        return FATAL
+    if name in PARSE_ERROR_NAMES or isinstance(error, (ValueError, AttributeError, TypeError, KeyError)):
+        return PARSE
+    return TRANSIENT
+
+
+class CircuitBreaker:
+    """Pauses all LLM traffic while the provider looks down.
+
+    After `failure_threshold` consecutive provider failures (5xx, 529
+    overloaded, timeouts, connection errors) the circuit opens and every
+    caller waits out the cooldown. The circuit is then half-open: the first
+    caller is let through as a probe while the others keep waiting. A
+    successful probe closes the circuit; a failed one re-opens it with a
+    doubled cooldown.
+    """
+
+    PROBE_POLL_INTERVAL = 0.1  # Seconds between checks while the half-open probe is in flight
+
+    def __init__(self, failure_threshold: int = 8, cooldown: float = 15.0, max_cooldown: float = 120.0):
+        self._lock = threading.Lock()
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.cooldown = cooldown
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.half_open = False  # Opened and not yet closed by a successful probe
+        self.probing = False  # The half-open probe is in flight
+        self.times_opened = 0
+
+    def _admit(self) -> Tuple[float, bool]:
+        """(seconds to wait, 0 when the caller may go; whether the caller is the half-open probe)"""
+        with self._lock:
+            now = time.monotonic()
+            if now < self.open_until:
+                return self.open_until - now, False
+            if not self.half_open:
+                return 0.0, False
+            if self.probing:
+                return self.PROBE_POLL_INTERVAL, False
+            self.probing = True
+            return 0.0, True
+
+    async def wait_until_closed(self) -> bool:
+        """Sleep (without blocking the loop) while the circuit is open or its probe is in flight.
+        Returns True if the caller goes ahead as the half-open probe."""
+        while True:
+            wait, probe = self._admit()
+            if wait <= 0:
+                return probe
+            await asyncio.sleep(wait)
+
+    def wait_until_closed_blocking(self) -> bool:
+        while True:
+            wait, probe = self._admit()
+            if wait <= 0:
+                return probe
+            time.sleep(wait)
+
+    def end_probe(self):
+        """A probe that ended without a verdict (e.g. a parse error, cancelled): the next caller probes"""
+        with self._lock:
+            self.probing = False
+
+    def record_success(self):
+        with self._lock:
+            closed = self.half_open
+            self.consecutive_failures = 0
+            self.cooldown = self.base_cooldown
+            self.half_open = self.probing = False
+        if closed:
+            print("\033[92m✅ Circuit breaker closed: the provider answered again\033[0m")
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            now = time.monotonic()
+            if self.probing:
+                reason = "half-open probe failed"
+            elif not self.half_open and self.consecutive_failures >= self.failure_threshold:
+                reason = f"{self.consecutive_failures} consecutive provider failures"
+            else:
+                return
+            self.open_until = now + self.cooldown
+            self.half_open, self.probing = True, False
+            self.times_opened += 1
+            print(f"\033[91m⛔ Circuit breaker open: {reason}, pausing LLM traffic for {self.cooldown:.0f}s\033[0m")
+            # A failed probe after this cooldown re-opens for longer
+            self.cooldown = min(self.max_cooldown, self.cooldown * 2)
+
+
+class RetryPolicy:
+    """One retry policy for every LLM call site.
+
+    - per-call budget: `max_retries` (callers may pass their own)
+    - per-run budget: at most `run_budget` retries in total across all calls
+    - exponential backoff with full jitter, honouring retry-after on throttles
+    - FATAL errors are raised immediately, never retried
+    - a shared CircuitBreaker pauses traffic during provider outages
+    """
+
+    def __init__(self, max_retries: int = 3, run_budget: int = 200, base_delay: float = 1.0,
+                 max_delay: float = 60.0, breaker: Optional[CircuitBreaker] = None):
+        self._lock = threading.Lock()
+        self.max_retries = max_retries
+        self.run_budget = run_budget
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker = breaker or CircuitBreaker()
+        self.retries_used = 0
+        self.retries_by_stage: Dict[str, int] = {}
+
+    def backoff_delay(self, attempt: int, error: Exception, kind: str) -> float:
+        """Full-jitter exponential backoff; throttles wait at least the provider's retry-after"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        if kind == THROTTLE:
+            retry_after = error_retry_after(error)
+            if retry_after is not None:
+                delay = max(delay, retry_after)
+        return delay
+
+    def _take_budget(self, stage: str) -> bool:
+        with self._lock:
+            if self.retries_used >= self.run_budget:
+                return False
+            self.retries_used += 1
+            self.retries_by_stage[stage] = self.retries_by_stage.get(stage, 0) + 1
+            return True
+
+    def _on_error(self, error: Exception, attempt: int, retries: int, label: str, stage: str,
+                  breaker: bool = True) -> float:
+        """Decide what to do after a failed attempt: raise, or return the delay before retrying"""
+        kind = classify_error(error)
+        if breaker and is_outage_error(error, kind):
+            self.breaker.record_failure()
+        if kind == FATAL or attempt >= retries:
+            raise error
+        if not self._take_budget(stage):
+            raise RetryBudgetExceeded(f"Run retry budget of {self.run_budget} exhausted: {str(error)}") from error
+
+        delay = self.backoff_delay(attempt, error, kind)
+        prefix = f"{label}: " if label else ""
+        print(f"\033[93m⚠️  {prefix}{kind} error: {str(error)[:50]}..., retry {attempt + 1}/{retries} in {delay:.1f}s\033[0m")
+        return delay
+
+    async def call(self, func: Callable[[], Awaitable[Any]], max_retries: Optional[int] = None,
+                   label: str = "", stage: str = "default", breaker: bool = True) -> Any:
+        """Await func() with retries; sleeping never blocks a thread.
+
+        With breaker=False func() runs outside the circuit breaker: for work
+        above the LLM calls (e.g. a whole joke), whose failures are not
+        provider outages. Retries still draw on the run budget.
+        """
+        retries = self.max_retries if max_retries is None else max_retries
+        for attempt in range(retries + 1):
+            probe = await self.breaker.wait_until_closed() if breaker else False
+            try:
+                result = await func()
+            except Exception as e:
+                delay = self._on_error(e, attempt, retries, label, stage, breaker)
+            else:
+                if breaker:
+                    self.breaker.record_success()
+                return result
+            finally:
+                if probe:
+                    self.breaker.end_probe()
+            await asyncio.sleep(delay)
+
+    def call_blocking(self, func: Callable[[], Any], max_retries: Optional[int] = None, label: str = "",
+                      stage: str = "default") -> Any:
+        """Synchronous variant of call() for the sync client API"""
+        retries = self.max_retries if max_retries is None else max_retries
+        for attempt in range(retries + 1):
+            probe = self.breaker.wait_until_closed_blocking()
+            try:
+                result = func()
+            except Exception as e:
+                delay = self._on_error(e, attempt, retries, label, stage)
+            else:
+                self.breaker.record_success()
+                return result
+            finally:
+                if probe:
+                    self.breaker.end_probe()
+            time.sleep(delay)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "retries_used": self.retries_used,
+                "run_budget": self.run_budget,
+                "retries_by_stage": dict(self.retries_by_stage),
+                "circuit_opened": self.breaker.times_opened
+            }
@@ -0,0 +1,125 @@
+"""Streamed completions that stop as soon as the required DSPy output fields have arrived"""
+
+import contextvars
+import re
+from typing import Any, AsyncIterator, Dict, Optional, Sequence, Tuple
+
+import dspy
+import litellm
+
+from utilities.lm_response import completion_response
+from utilities.rate_governor import estimate_tokens
+
+
+# (required output fields, all output fields) of the predictor call running in this task, set by
+# ClaudeClient.apredict in streaming mode. None = wait for the complete response.
+early_exit_fields: contextvars.ContextVar[Optional[Tuple[Tuple[str, ...], Tuple[str, ...]]]] = \
+    contextvars.ContextVar("llm_early_exit_fields", default=None)
+
+# Output fields that only explain a decision; streaming mode skips them unless reasoning is kept
+REASONING_FIELDS = ("reasoning",)
+
+
+def is_reasoning_field(name: str) -> bool:
+    """reasoning, or a per-decision explanation such as intent_reasoning (CombinedAdmissibilitySignature)"""
+    return name in REASONING_FIELDS or name.endswith("_reasoning")
+
+# ChatAdapter section header, at the start of a line
+FIELD_HEADER = re.compile(r"^\s*\[\[ ## (\w+) ## \]\]", re.MULTILINE)
+
+
+def completed_fields(text: str) -> Dict[str, int]:
+    """Output fields whose value is complete in a partial ChatAdapter completion -> end offset of the value.
+
+    A value is complete once the next section header (another field or
+    `[[ ## completed ## ]]`) has started.
+    """
+    headers = list(FIELD_HEADER.finditer(text))
+    return {current.group(1): following.start() for current, following in zip(headers, headers[1:])}
+
+
+def cut_completion(text: str, required: Sequence[str], outputs: Sequence[str]) -> Optional[str]:
+    """The completion truncated after the last required field, or None while one is still missing.
+
+    Output fields that were not received are added empty so the adapter
+    still finds every field.
+    """
+    complete = completed_fields(text)
+    if not required or any(name not in complete for name in required):
+        return None
+    cut = text[:max(complete[name] for name in required)].rstrip()
+    present = {match.group(1) for match in FIELD_HEADER.finditer(cut)}
+    missing = [f"[[ ## {name} ## ]]\n" for name in outputs if name not in present]
+    return "\n\n".join([cut] + missing + ["[[ ## completed ## ]]"])
+
+
+async def _litellm_stream(lm: dspy.LM, prompt: Optional[str], messages: Optional[list], kwargs: Dict[str, Any],
+                          meta: Dict[str, Any]) -> AsyncIterator[str]:
+    response = await litellm.acompletion(
+        model=lm.model,
+        messages=messages or [{"role": "user", "content": prompt}],
+        stream=True,
+        stream_options={"include_usage": True},
+        **{**lm.kwargs, **kwargs}
+    )
+    meta["headers"] = (getattr(response, "_hidden_params", None) or {}).get("additional_headers")
+    try:
+        async for chunk in response:
+            if getattr(chunk, "usage", None):
+                meta["usage"] = dict(chunk.usage)
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    finally:
+        await response.aclose()
+
+
+def supports_streaming(lm: dspy.BaseLM) -> bool:
+    """litellm-backed LMs, or test doubles with their own astream() (utilities.mock_lm.MockLM)"""
+    return hasattr(lm, "astream") or isinstance(lm, dspy.LM)
+
+
+async def stream_until_fields(lm: dspy.BaseLM, required: Sequence[str], outputs: Sequence[str],
+                              prompt: Optional[str] = None, messages: Optional[list] = None, **kwargs) -> Any:
+    """Stream a completion and cancel it once every required output field is complete.
+
+    Returns an OpenAI-format response like LM.aforward(). Output tokens of a
+    cancelled stream are estimated from the text received.
+    """
+    meta: Dict[str, Any] = {}
+    if hasattr(lm, "astream"):
+        stream = lm.astream(prompt=prompt, messages=messages, meta=meta, **kwargs)
+    else:
+        stream = _litellm_stream(lm, prompt, messages, kwargs, meta)
+
+    text, cancelled = "", False
+    try:
+        async for chunk in stream:
+            text += chunk
+            cut = cut_completion(text, required, outputs)
+            if cut is not None:
+                text, cancelled = cut, True
+                break
+    finally:
+        await stream.aclose()
+
+    usage = dict(meta.get("usage") or {"prompt_tokens": estimate_tokens(prompt, messages)})
+    if cancelled or "completion_tokens" not in usage:
+        usage["completion_tokens"] = max(1, len(text) // 4)  # Output is billed up to the cancellation
+    response = completion_response(text, usage, lm.model, meta.get("headers"))
+    if hasattr(lm, "price_multiplier"):
+        response._hidden_params["price_multiplier"] = lm.price_multiplier
+    return response
+
+
+def add_streaming_arguments(parser):
+    """--stream / --keep-reasoning options shared by the generator and judge CLIs"""
+    parser.add_argument(
+        '--stream',
+        action='store_true',
+        help='Stream LLM responses and stop as soon as the decision fields arrived (skips trailing reasoning)'
+    )
+    parser.add_argument(
+        '--keep-reasoning',
+        action='store_true',
+        help='With --stream, still wait for reasoning fields (for verbose logs)'
+    )
@@ -0,0 +1,289 @@
+"""Structured output: typed fields enforced by JSON schema (tool use) and local repair of near-miss answers
+
+Every predictor call goes through StructuredOutputAdapter (installed by
+ClaudeClient). For LMs flagged `structured_output` (--structured-output) it
+sends the signature's output fields as a JSON schema, which litellm turns into
+forced tool use for Anthropic and response_format for OpenAI-compatible
+backends; other LMs keep the prompt-cached chat layout. Either way, an answer
+that does not parse is repaired locally before the caller's retry policy
+re-prompts the LLM:
+
+    [[ ## score ## ]] / ## Score / **Score:** / Score:   -> score section
+    "4/5", "Score: 4", "4."                              -> 4 (int)
+    "True.", "yes", "PASS", "no issues, passes"          -> True (bool)
+    "Joke A"                                             -> "joke_a" (Literal)
+    a whole-JSON answer, a list with a trailing comma     -> parsed with json_repair
+
+Only answers missing a decision field, or with a value that cannot be read
+at all, still cost a full re-prompt. Counts are in repair_stats().
+"""
+
+import json
+import logging
+import re
+import threading
+import typing
+from collections import Counter
+from typing import Any, Dict, List, Literal, Optional, Type
+
+import dspy
+import json_repair
+import litellm
+from dspy.adapters.json_adapter import _get_structured_outputs_response_format
+from dspy.adapters.utils import parse_value
+from pydantic import TypeAdapter
+
+from utilities.prompt_caching import PromptCachingAdapter
+from utilities.streaming import is_reasoning_field
+
+logger = logging.getLogger(__name__)
+
+
+# Section headers LLMs use instead of "[[ ## name ## ]]": markdown headings, bold labels and plain "name:" lines
+SECTION_HEADER = re.compile(
+    r"^\s*(?:\[\[\s*#*\s*([A-Za-z][\w ]*?)\s*#*\s*\]\]"
+    r"|#{1,6}\s*([A-Za-z][\w ]*)#*\s*(?::|$)"
+    r"|\*\*\s*([A-Za-z][\w ]*?)\s*:?\s*\*\*\s*:?"
+    r"|([A-Za-z][\w ]*?)\s*:)\s*(?P<rest>.*)$"
+)
+NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+# Verdict words outrank yes/no, which also open unrelated phrases ("no issues, passes")
+BOOLEANS = {"true": True, "pass": True, "passes": True, "passed": True,
+            "false": False, "fail": False, "fails": False, "failed": False}
+ANSWERS = {"yes": True, "no": False}
+
+
+class RepairStats:
+    """Thread-safe counts of answers repaired locally vs. given up on (and re-prompted), per signature"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.repaired: Counter = Counter()
+        self.unrepairable: Counter = Counter()
+
+    def record(self, signature_name: str, repaired: bool):
+        with self._lock:
+            (self.repaired if repaired else self.unrepairable)[signature_name] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"repaired": dict(self.repaired), "unrepairable": dict(self.unrepairable)}
+
+
+REPAIR_STATS = RepairStats()
+
+
+def repair_stats() -> dict:
+    return REPAIR_STATS.snapshot()
+
+
+def _normalize_name(name: str) -> str:
+    return "_".join(name.lower().split())
+
+
+def _strip(text: str) -> str:
+    """Drop code fences, surrounding quotes/markup and trailing punctuation"""
+    text = re.sub(r"^```\w*\s*|\s*```$", "", text.strip())
+    return text.strip().strip("*`'\"").strip().rstrip(".,;!")
+
+
+def _json_segment(text: str) -> Optional[str]:
+    """The outermost [...] or {...} in a text, whichever starts first"""
+    starts = [i for i in (text.find("["), text.find("{")) if i >= 0]
+    if not starts:
+        return None
+    start = min(starts)
+    end = text.rfind("]" if text[start] == "[" else "}")
+    return text[start:end + 1] if end > start else text[start:]
+
+
+def _read_bool(text: str) -> Optional[bool]:
+    """The first verdict word in a text (else the first yes/no), flipped when "not" or "n't" precedes it"""
+    lowered = text.lower()
+    for words in (BOOLEANS, ANSWERS):
+        match = re.search(r"(\bnot\s+|n't\s+)?\b(" + "|".join(words) + r")\b", lowered)
+        if match:
+            return words[match.group(2)] != bool(match.group(1))
+    return None
+
+
+def repair_value(text: str, annotation: Any) -> Any:
+    """Best-effort reading of a near-miss field value as `annotation`; raises ValueError if hopeless"""
+    cleaned = _strip(text)
+    origin = typing.get_origin(annotation)
+    if annotation is str:
+        return cleaned
+    if annotation is bool:
+        verdict = _read_bool(cleaned)
+        if verdict is not None:
+            return verdict
+    elif annotation in (int, float):
+        match = NUMBER.search(cleaned)
+        if match:
+            number = float(match.group(0))
+            return int(round(number)) if annotation is int else number
+    elif origin is Literal:
+        normalized = _normalize_name(cleaned)
+        options = [option for option in typing.get_args(annotation) if _normalize_name(str(option)) in normalized]
+        if len(options) == 1:
+            return options[0]
+    else:
+        segment = _json_segment(text)
+        if segment is not None:
+            value = json_repair.loads(segment)
+            if origin in (list, List) and isinstance(value, dict) and len(value) == 1:
+                value = next(iter(value.values()))  # {"items": [...]} wrapper
+            if origin in (list, List) and isinstance(value, dict):
+                value = [value]  # A single item without the list
+            return TypeAdapter(annotation).validate_python(value)
+        if origin in (list, List) and typing.get_args(annotation) in ((str,), ()):
+            items = [re.sub(r"^\s*(?:[-*•]|\d+[.)])\s*", "", item).strip() for item in re.split(r"[,;\n]", text)]
+            items = [_strip(item) for item in items if item.strip()]
+            if items:
+                return items
+    raise ValueError(f"Cannot read {text[:80]!r} as {annotation}")
+
+
+def _coerce(value: Any, annotation: Any) -> Any:
+    """A raw field value as `annotation`: DSPy's own parsing first, then repair_value()"""
+    try:
+        return parse_value(value, annotation)
+    except Exception:
+        return repair_value(value if isinstance(value, str) else json.dumps(value), annotation)
+
+
+def _sections(signature: Type[dspy.Signature], completion: str) -> Dict[str, Any]:
+    """Raw output field values found in a completion, by header lines, else in a whole-JSON answer"""
+    names = {_normalize_name(name): name for name in signature.output_fields}
+    sections: Dict[str, List[str]] = {}
+    current = None
+    for line in completion.splitlines():
+        match = SECTION_HEADER.match(line)
+        header = next((group for group in match.groups()[:4] if group), None) if match else None
+        if header is not None and _normalize_name(header) == "completed":
+            current = None
+        elif header is not None and _normalize_name(header) in names:
+            current = names[_normalize_name(header)]
+            sections[current] = [match.group("rest")]
+        elif current is not None:
+            sections[current].append(line)
+    if sections:
+        return {name: "\n".join(lines).strip() for name, lines in sections.items()}
+
+    segment = _json_segment(completion)
+    data = json_repair.loads(segment) if segment and segment.startswith("{") else None
+    if isinstance(data, dict):
+        return {names[_normalize_name(key)]: value for key, value in data.items()
+                if isinstance(key, str) and _normalize_name(key) in names}
+    return {}
+
+
+def repair_completion(signature: Type[dspy.Signature], completion: str) -> Optional[Dict[str, Any]]:
+    """Output fields recovered from a completion the adapter could not parse, None if some are missing.
+
+    Missing reasoning fields are filled with "" (they are never decisions);
+    every other field must be present and readable as its annotation.
+    """
+    raw = _sections(signature, completion)
+    fields = {}
+    for name, field in signature.output_fields.items():
+        value = raw.get(name)
+        if value is None or value == "":
+            if not is_reasoning_field(name):
+                return None
+            fields[name] = ""
+            continue
+        try:
+            fields[name] = _coerce(value, field.annotation)
+        except Exception:
+            return None
+    return fields
+
+
+class RepairingParseMixin:
+    """parse() that falls back to repair_completion() when the adapter's strict parse fails"""
+
+    def strict_parse(self, signature: Type[dspy.Signature], completion: str) -> Dict[str, Any]:
+        return super().parse(signature, completion)
+
+    def parse(self, signature: Type[dspy.Signature], completion: str) -> Dict[str, Any]:
+        try:
+            return self.strict_parse(signature, completion)
+        except Exception:
+            fields = repair_completion(signature, completion)
+            REPAIR_STATS.record(signature.__name__, fields is not None)
+            if fields is None:
+                raise
+            return fields
+
+
+class RepairingChatAdapter(RepairingParseMixin, PromptCachingAdapter):
+    """Prompt-cached chat layout with local repair of near-miss answers"""
+
+
+class SchemaJSONAdapter(RepairingParseMixin, PromptCachingAdapter, dspy.JSONAdapter):
+    """Prompt-cached JSON layout with the output fields sent as a JSON schema.
+
+    DSPy's JSONAdapter only requests structured output on the sync path;
+    this sets response_format for the async path (Predict.acall) too.
+    Models without response_format support get the JSON layout alone.
+    """
+
+    def strict_parse(self, signature: Type[dspy.Signature], completion: str) -> Dict[str, Any]:
+        # dspy.Adapter.__init_subclass__ pins inherited parse() on every subclass, so the parse()
+        # found after PromptCachingAdapter in the MRO is ChatAdapter's
+        return dspy.JSONAdapter.parse(self, signature, completion)
+
+    def _response_format(self, lm: dspy.BaseLM, signature: Type[dspy.Signature]) -> Optional[Any]:
+        model = getattr(lm, "model", "") or ""
+        provider = model.split("/", 1)[0] if "/" in model else "anthropic"
+        try:
+            params = litellm.get_supported_openai_params(model=model, custom_llm_provider=provider)
+        except Exception:
+            params = None
+        if not params or "response_format" not in params:
+            return None
+        if any(typing.get_origin(field.annotation) is dict for field in signature.output_fields.values()):
+            return {"type": "json_object"}  # Schemas need explicit properties
+        try:
+            return _get_structured_outputs_response_format(signature)
+        except Exception:
+            logger.warning("No JSON schema for %s, using JSON mode", signature.__name__)
+            return {"type": "json_object"}
+
+    async def acall(self, lm, lm_kwargs, signature, demos, inputs):
+        if "response_format" not in lm_kwargs:
+            response_format = self._response_format(lm, signature)
+            if response_format is not None:
+                lm_kwargs = {**lm_kwargs, "response_format": response_format}
+        return await super().acall(lm, lm_kwargs, signature, demos, inputs)
+
+
+class StructuredOutputAdapter(RepairingChatAdapter):
+    """Process-wide adapter choosing the layout per LM: JSON schema for LMs flagged `structured_output`.
+
+    Predictors take the adapter from DSPy's global settings, so the choice is
+    made per call from the LM handle passed to it; clients with and without
+    --structured-output can share a process.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.schema_adapter = SchemaJSONAdapter()
+
+    def __call__(self, lm, lm_kwargs, signature, demos, inputs):
+        if getattr(lm, "structured_output", False):
+            return self.schema_adapter(lm, lm_kwargs, signature, demos, inputs)
+        return super().__call__(lm, lm_kwargs, signature, demos, inputs)
+
+    async def acall(self, lm, lm_kwargs, signature, demos, inputs):
+        if getattr(lm, "structured_output", False):
+            return await self.schema_adapter.acall(lm, lm_kwargs, signature, demos, inputs)
+        return await super().acall(lm, lm_kwargs, signature, demos, inputs)
+
+
+def add_structured_output_arguments(parser):
+    """--structured-output option shared by the generator and judge CLIs"""
+    parser.add_argument('--structured-output', action='store_true',
+                        help='Request JSON-schema (tool use) answers instead of the chat layout; '
+                             'disables streaming early exit')
@@ -0,0 +1,197 @@
+"""Per-stage token, cost and latency accounting for LLM calls"""
+
+import contextvars
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+
+# Stage of the LLM call currently running in this task (set by ClaudeClient.apredict)
+current_stage: contextvars.ContextVar[str] = contextvars.ContextVar("llm_stage", default="default")
+
+# USD per million tokens: (input, output). Cache writes cost 1.25x input, cache reads 0.1x input.
+PRICES_PER_MTOK = {
+    "claude-3-haiku": (0.25, 1.25),
+    "claude-3-5-haiku": (0.80, 4.00),
+    "claude-3.5-haiku": (0.80, 4.00),
+    "claude-3-5-sonnet": (3.00, 15.00),
+    "claude-3.5-sonnet": (3.00, 15.00),
+    "claude-3-sonnet": (3.00, 15.00),
+    "claude-3-opus": (15.00, 75.00),
+}
+CACHE_WRITE_MULTIPLIER = 1.25
+CACHE_READ_MULTIPLIER = 0.1
+
+USAGE_REPORT_FILENAME = "run_usage.json"
+
+
+def model_prices(model: str) -> Optional[tuple]:
+    """(input, output) USD per million tokens for a model name, None if unknown"""
+    name = model.rsplit("/", 1)[-1]  # Drop provider prefixes (anthropic/, openrouter/anthropic/)
+    for prefix in sorted(PRICES_PER_MTOK, key=len, reverse=True):
+        if name.startswith(prefix):
+            return PRICES_PER_MTOK[prefix]
+    return None
+
+
+def response_usage(response: Any) -> Dict[str, int]:
+    """Token counts from a litellm response, including prompt cache reads and writes"""
+    usage = getattr(response, "usage", None)
+    if usage is None and isinstance(response, dict):
+        usage = response.get("usage")
+    if not usage:
+        return {}
+    usage = usage if isinstance(usage, dict) else dict(usage)
+    return {
+        "input_tokens": int(usage.get("prompt_tokens") or 0),
+        "output_tokens": int(usage.get("completion_tokens") or 0),
+        "cache_write_tokens": int(usage.get("cache_creation_input_tokens") or 0),
+        "cache_read_tokens": int(usage.get("cache_read_input_tokens") or 0)
+    }
+
+
+def _empty_stage() -> Dict[str, Any]:
+    return {
+        "calls": 0,
+        "errors": 0,
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "cache_write_tokens": 0,
+        "cache_read_tokens": 0,
+        "cost_usd": 0.0,
+        "latency_seconds": 0.0,
+        "max_latency_seconds": 0.0,
+        "queue_seconds": 0.0
+    }
+
+
+class UsageTracker:
+    """Accumulates per-stage usage of every LLM request made by one client"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages: Dict[str, Dict[str, Any]] = {}
+        self.unpriced_models = set()
+        self.started_at = datetime.now()
+
+    def record_call(self, model: str, response: Any = None, latency: float = 0.0, queue_time: float = 0.0,
+                    error: Optional[BaseException] = None):
+        """Account one API request under the current stage"""
+        stage = current_stage.get()
+        tokens = response_usage(response) if response is not None else {}
+        # Replayed responses (utilities.cassette) are billed as the model that originally answered
+        model = (getattr(response, "_hidden_params", None) or {}).get("usage_model") or model
+        prices = model_prices(model)
+
+        with self._lock:
+            counters = self._stages.setdefault(stage, _empty_stage())
+            counters["calls"] += 1
+            if error is not None:
+                counters["errors"] += 1
+            for name, value in tokens.items():
+                counters[name] += value
+            counters["latency_seconds"] += latency
+            counters["max_latency_seconds"] = max(counters["max_latency_seconds"], latency)
+            counters["queue_seconds"] += queue_time
+
+            # e.g. 0.5 for message-batch results, 0 for self-hosted models
+            multiplier = (getattr(response, "_hidden_params", None) or {}).get("price_multiplier", 1.0)
+            if multiplier == 0:
+                return
+            if prices is None:
+                if tokens:
+                    self.unpriced_models.add(model)
+                return
+            input_price, output_price = prices
+            # litellm's prompt_tokens already include cache reads and writes; bill those at their own rates
+            uncached_input = max(0, tokens.get("input_tokens", 0) - tokens.get("cache_write_tokens", 0)
+                                 - tokens.get("cache_read_tokens", 0))
+            counters["cost_usd"] += (
+                uncached_input * input_price
+                + tokens.get("cache_write_tokens", 0) * input_price * CACHE_WRITE_MULTIPLIER
+                + tokens.get("cache_read_tokens", 0) * input_price * CACHE_READ_MULTIPLIER
+                + tokens.get("output_tokens", 0) * output_price
+            ) * multiplier / 1_000_000
+
+    def stages(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {stage: dict(counters) for stage, counters in self._stages.items()}
+
+    def report(self, cache_stats: Optional[Dict[str, Dict[str, int]]] = None,
+               retries: Optional[Dict[str, int]] = None, coalesced: Optional[Dict[str, int]] = None,
+               extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Machine-readable summary: per-stage counters plus run totals"""
+        stages = self.stages()
+        cache_stats = cache_stats or {}
+        retries = retries or {}
+        coalesced = coalesced or {}
+
+        for stage in set(cache_stats) | set(retries) | set(coalesced):
+            stages.setdefault(stage, _empty_stage())
+        for stage, counters in stages.items():
+            counters["cache_hits"] = cache_stats.get(stage, {}).get("hits", 0)
+            counters["cache_misses"] = cache_stats.get(stage, {}).get("misses", 0)
+            counters["retries"] = retries.get(stage, 0)
+            counters["coalesced"] = coalesced.get(stage, 0)
+            counters["mean_latency_seconds"] = (counters["latency_seconds"] / counters["calls"]
+                                                if counters["calls"] else 0.0)
+
+        totals = _empty_stage()
+        for counters in stages.values():
+            for name in totals:
+                if name == "max_latency_seconds":
+                    totals[name] = max(totals[name], counters[name])
+                else:
+                    totals[name] += counters[name]
+        for name in ("cache_hits", "cache_misses", "retries", "coalesced"):
+            totals[name] = sum(counters[name] for counters in stages.values())
+        totals["mean_latency_seconds"] = totals["latency_seconds"] / totals["calls"] if totals["calls"] else 0.0
+
+        for counters in list(stages.values()) + [totals]:
+            for name in ("cost_usd", "latency_seconds", "max_latency_seconds", "queue_seconds",
+                         "mean_latency_seconds"):
+                if name in counters:
+                    counters[name] = round(counters[name], 6 if name == "cost_usd" else 3)
+
+        report = {
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "finished_at": datetime.now().isoformat(timespec="seconds"),
+            "stages": dict(sorted(stages.items())),
+            "totals": totals,
+            "unpriced_models": sorted(self.unpriced_models)
+        }
+        report.update(extra or {})
+        return report
+
+    @staticmethod
+    def since(report: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, Any]:
+        """The part of a report made after an earlier report of the same tracker (e.g. one judge run
+        inside a pipeline run). Max latencies cannot be split and stay the process-wide maxima."""
+        def subtract(counters: Dict[str, Any], before: Dict[str, Any]) -> Dict[str, Any]:
+            counters = dict(counters)
+            for name, value in counters.items():
+                if name not in ("max_latency_seconds", "mean_latency_seconds") and isinstance(value, (int, float)):
+                    value -= before.get(name, 0)
+                    counters[name] = round(value, 6) if isinstance(value, float) else value
+            counters["mean_latency_seconds"] = (round(counters["latency_seconds"] / counters["calls"], 3)
+                                                if counters.get("calls") else 0.0)
+            return counters
+
+        stages = {}
+        for stage, counters in report["stages"].items():
+            counters = subtract(counters, baseline["stages"].get(stage, {}))
+            if any(counters.get(name) for name in ("calls", "cache_hits", "cache_misses", "retries", "coalesced")):
+                stages[stage] = counters
+        return dict(report, started_at=baseline["finished_at"], stages=stages,
+                    totals=subtract(report["totals"], baseline["totals"]))
+
+    @staticmethod
+    def write_report(report: Dict[str, Any], directory: str) -> str:
+        """Write a report as run_usage.json in the given (log) directory"""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, USAGE_REPORT_FILENAME)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        return path
@@ -27,6 +27,25 @@ def get_project_id_from_file(service_account_path: str) -> str:
     except (json.JSONDecodeError, ValueError, KeyError) as e:
         raise RuntimeError(f"Error reading project_id from {service_account_path}: {e}")
 
+_initialized = {}  # (project, location) -> credentials passed to vertexai.init
+_models = {}  # (project, location, model name) -> GenerativeModel
+
+
+def _get_model(project_id: str, location: str, credentials, model_name: str) -> GenerativeModel:
+    """GenerativeModel handle, initializing Vertex AI only when the project, location or credentials change"""
+    if _initialized.get((project_id, location)) is not credentials:
+        print(f"Initializing Vertex AI for project: {project_id}, location: {location}")
+        vertexai.init(project=project_id, location=location, credentials=credentials)
+        _initialized.clear()
+        _models.clear()
+        _initialized[(project_id, location)] = credentials
+    key = (project_id, location, model_name)
+    if key not in _models:
+        print(f"Loading model: {model_name}")
+        _models[key] = GenerativeModel(model_name)
+    return _models[key]
+
+
 def generate_text_vertexai(
     project_id: str,
     location: str,
@@ -52,12 +71,8 @@ def generate_text_vertexai(
         The generated text from the model. Returns an empty string on errors
         where no candidate is available. Raises exceptions for setup/auth errors.
     """
-    print(f"Initializing Vertex AI for project: {project_id}, location: {location}")
     try:
-        vertexai.init(project=project_id, location=location, credentials=credentials)
-
-        print(f"Loading model: {model_name}")
-        model = GenerativeModel(model_name)
+        model = _get_model(project_id, location, credentials, model_name)
 
         generation_config = GenerationConfig(
             temperature=temperature,